@@ -0,0 +1,291 @@
+## Asset loading ##
+
+## graphics are only decoded the first time something asks for them, and the
+## decoded pixels are kept on disk (c.ASSET_CACHE_DIR) as raw buffers, so the
+## next start just reads the bytes back instead of decoding the png / jpg again
+
+## a cached image is thrown away when its source file changes - the size and
+## mtime are checked first, and only if they differ is the file hashed
+
+## several processes can fill the cache at once (batch.py's workers all start
+## cold) - every write goes to a temp file of its own and is renamed into
+## place, and a write that fails anyway just leaves that image uncached
+
+## python assets.py times a cold start (empty cache) against a warm one
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import pygame as pg
+import constants as c
+from tools import convert_image
+
+
+def scan(directory, accept):
+    '''
+    the asset manifest - name -> path of every file in directory with an accepted
+    extension. nothing is opened, so this is cheap enough to do at import time
+    '''
+    found = {}
+    for filename in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() in accept:
+            found[name] = os.path.join(directory, filename)
+    return found
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def write_atomic(path, data):
+    '''
+    writes data (bytes) to path through a temp file no other writer is using,
+    so readers only ever see a whole file
+    '''
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ImageCache:
+    '''
+    decoded pixels on disk, one .raw file per image plus an index.json
+    holding where each came from and how to read it back
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.index = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def load_index(self):
+        if self.index is None:
+            try:
+                with open(self.index_path) as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = {}
+        return self.index
+
+    def save_index(self, names):
+        '''
+        writes the entries for names into the index on disk - merged with
+        whatever other processes have written there since it was read
+        :return: False if it couldn't be written
+        '''
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        for name in names:
+            index[name] = self.index[name]
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_atomic(self.index_path, json.dumps(index, indent=1, sort_keys=True).encode())
+        except OSError:
+            return False
+        return True
+
+    def entry(self, name, source):
+        '''
+        :return: the index entry for name if it still matches source, otherwise None
+        '''
+        entry = self.load_index().get(name)
+        if entry is None or entry['source'] != source:
+            return None
+
+        stat = os.stat(source)
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry
+
+        # touched but maybe not changed - only trust the hash
+        if entry['size'] == stat.st_size and entry['sha1'] == file_hash(source):
+            entry['mtime'] = stat.st_mtime_ns
+            self.save_index([name])
+            return entry
+        return None
+
+    def get(self, name, source):
+        entry = self.entry(name, source)
+        if entry is not None:
+            try:
+                with open(os.path.join(self.directory, name + ".raw"), 'rb') as f:
+                    data = f.read()
+                image = pg.image.frombuffer(data, tuple(entry['dimensions']), entry['format'])
+                self.hits += 1
+                return image
+            except (OSError, ValueError):
+                pass
+
+        self.misses += 1
+        image = pg.image.load(source)
+        self.put(name, source, image)
+        return image
+
+    def put(self, name, source, image):
+        '''
+        :return: False if the image couldn't be cached - it is just decoded again next time
+        '''
+        # keep alpha only for images that have it, same split as convert_image
+        fmt = 'RGBA' if image.get_alpha() else 'RGB'
+        stat = os.stat(source)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_atomic(os.path.join(self.directory, name + ".raw"), pg.image.tostring(image, fmt))
+        except OSError:
+            return False
+
+        self.load_index()[name] = {
+            'source': source,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'sha1': file_hash(source),
+            'dimensions': list(image.get_size()),
+            'format': fmt,
+        }
+        return self.save_index([name])
+
+
+class ImageLibrary:
+    '''
+    setup.GFX - looks like a dict of name -> surface, but each image is only
+    loaded (from the cache if possible) when it is first looked up
+    images are converted for fast blitting when a display has been set up
+    with use_atlas, images packed into the texture atlas (atlas.py) are
+    handed out as subsurfaces of it
+    '''
+
+    def __init__(self, directory, cache_directory=None, accept=(".png", ".jpg", ".bmp"), use_atlas=False):
+        self.directory = directory
+        self.accept = accept
+        self.cache = ImageCache(cache_directory) if cache_directory else None
+        self.use_atlas = use_atlas
+        self.manifest = None
+        self.atlas_rects = None
+        self.images = {}
+        self.masks = {}
+
+    def names(self):
+        if self.manifest is None:
+            self.manifest = scan(self.directory, self.accept)
+            self.manifest.pop(c.ATLAS_NAME, None)
+        return self.manifest
+
+    def atlas(self):
+        '''
+        :return: name -> rect of the images in the atlas, empty if it isn't being used
+        '''
+        if self.atlas_rects is None:
+            self.atlas_rects = {}
+            if self.use_atlas:
+                import atlas
+                cache_directory = self.cache.directory if self.cache is not None else None
+                index = atlas.load_index(self.directory, cache_directory)
+                if index is not None:
+                    self.atlas_rects = index['rects']
+        return self.atlas_rects
+
+    def load_file(self, name, source):
+        if self.cache is not None:
+            image = self.cache.get(name, source)
+        else:
+            image = pg.image.load(source)
+
+        if pg.display.get_surface() is not None:
+            image = convert_image(image)
+        return image
+
+    def load(self, name):
+        rect = self.atlas().get(name)
+        if rect is not None:
+            sheet = self.images.get(c.ATLAS_NAME)
+            if sheet is None:
+                import atlas
+                sheet = self.load_file(c.ATLAS_NAME, atlas.image_path(self.directory))
+                self.images[c.ATLAS_NAME] = sheet
+            return sheet.subsurface(pg.Rect(rect))
+
+        return self.load_file(name, self.names()[name])
+
+    def __getitem__(self, name):
+        image = self.images.get(name)
+        if image is None:
+            image = self.load(name)
+            self.images[name] = image
+        return image
+
+    def mask(self, name):
+        '''
+        :return: collision mask of the opaque pixels of an image, made once and kept
+        '''
+        mask = self.masks.get(name)
+        if mask is None:
+            mask = pg.mask.from_surface(self[name])
+            self.masks[name] = mask
+        return mask
+
+    def __contains__(self, name):
+        return name in self.names()
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __len__(self):
+        return len(self.names())
+
+    def keys(self):
+        return self.names().keys()
+
+    def load_all(self):
+        for name in self.names():
+            self[name]
+
+
+## startup timing ##
+
+def time_startup(directory, cache_directory, use_atlas=False):
+    '''
+    :return: (cold, warm) seconds to load every image, with an empty cache and then a full one
+    '''
+    for filename in os.listdir(cache_directory) if os.path.isdir(cache_directory) else ():
+        os.remove(os.path.join(cache_directory, filename))
+
+    start = time.perf_counter()
+    ImageLibrary(directory, cache_directory, use_atlas=use_atlas).load_all()
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ImageLibrary(directory, cache_directory, use_atlas=use_atlas).load_all()
+    warm = time.perf_counter() - start
+
+    return cold, warm
+
+
+if __name__ == "__main__":
+    # images are converted just like in the game, so a display is needed
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pg.display.set_mode(c.SCREEN_SIZE)
+
+    for use_atlas in (False, True):
+        cold, warm = time_startup(os.path.join("resources", "graphics"), c.ASSET_CACHE_DIR, use_atlas)
+        label = "atlas" if use_atlas else "separate images"
+        print("{}: cold start {:.1f} ms, warm start {:.1f} ms".format(label, cold * 1000, warm * 1000))
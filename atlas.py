@@ -0,0 +1,179 @@
+## Texture atlas ##
+
+## every sprite image with alpha (explosions, enemy, ufo, fireball, asteroid)
+## is packed into one image, resources/graphics/atlas.png, with the rect of
+## each one kept next to it in atlas.json. setup.GFX then hands out
+## subsurfaces of the atlas instead of loading each file on its own
+
+## images without alpha (the background) are left out, so they still go
+## through convert() while the atlas goes through convert_alpha()
+
+## the atlas is only used while it matches the images it was built from -
+## rebuild it with python atlas.py after changing any of them. atlas.json only
+## holds the size and hash of each source, so it stays the same on every
+## checkout and is never written while the game runs. which sources have been
+## hashed since they last changed (their mtime) is kept in the image cache
+## (c.ASSET_CACHE_DIR), so a source is hashed only when its mtime has changed
+
+import json
+import os
+
+import pygame as pg
+import constants as c
+import assets
+
+
+ACCEPT = (".png", ".jpg", ".bmp")
+
+
+def index_path(directory):
+    return os.path.join(directory, c.ATLAS_NAME + ".json")
+
+
+def image_path(directory):
+    return os.path.join(directory, c.ATLAS_NAME + ".png")
+
+
+def sources(directory):
+    # every image in the directory except the atlas itself
+    found = assets.scan(directory, ACCEPT)
+    found.pop(c.ATLAS_NAME, None)
+    return found
+
+
+def pack(sizes, padding=1):
+    '''
+    shelf packing - tallest images first, left to right along a shelf,
+    starting a new shelf below when the row is full
+    :param sizes: name -> (width, height)
+    :return: (width, height) of the atlas and name -> (x, y)
+    '''
+    area = sum((w + padding) * (h + padding) for w, h in sizes.values())
+    width = max(max(w for w, h in sizes.values()) + padding, int(area ** 0.5) + 1)
+
+    positions = {}
+    x = y = shelf_height = 0
+    for name in sorted(sizes, key=lambda n: (-sizes[n][1], n)):
+        w, h = sizes[name]
+        if x + w > width:
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        positions[name] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+
+    return (width, y + shelf_height), positions
+
+
+def build(directory, padding=1):
+    '''
+    packs every image with alpha in directory into the atlas and writes it out
+    :return: the atlas index
+    '''
+    images = {}
+    files = {}
+    for name, path in sources(directory).items():
+        image = pg.image.load(path)
+        if image.get_alpha():
+            images[name] = image
+            files[name] = path
+
+    size, positions = pack(dict((name, image.get_size()) for name, image in images.items()), padding)
+
+    surface = pg.Surface(size, pg.SRCALPHA)
+    rects = {}
+    for name, image in images.items():
+        # added onto a fully transparent surface, the pixels are copied as they are
+        rect = surface.blit(image, positions[name], special_flags=pg.BLEND_RGBA_ADD)
+        rects[name] = [rect.x, rect.y, rect.w, rect.h]
+
+    pg.image.save(surface, image_path(directory))
+
+    index = {
+        'rects': rects,
+        'sources': dict((name, {
+            'file': os.path.basename(path),
+            'size': os.stat(path).st_size,
+            'sha1': assets.file_hash(path),
+        }) for name, path in files.items()),
+    }
+    assets.write_atomic(index_path(directory), json.dumps(index, indent=1, sort_keys=True).encode())
+    return index
+
+
+def checked_path(cache_directory):
+    return os.path.join(cache_directory, c.ATLAS_NAME + "_sources.json")
+
+
+def load_checked(cache_directory):
+    '''
+    :return: file -> [size, mtime, sha1] of sources that were last seen matching their hash
+    '''
+    if cache_directory is None:
+        return {}
+    try:
+        with open(checked_path(cache_directory)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checked(cache_directory, checked):
+    '''
+    :return: False if it couldn't be written - the sources are just hashed again next time
+    '''
+    if cache_directory is None:
+        return False
+    try:
+        os.makedirs(cache_directory, exist_ok=True)
+        assets.write_atomic(checked_path(cache_directory), json.dumps(checked, indent=1, sort_keys=True).encode())
+    except OSError:
+        return False
+    return True
+
+
+def load_index(directory, cache_directory=None):
+    '''
+    :param cache_directory: where to remember which sources have already been hashed,
+    without one every source is hashed
+    :return: the atlas index, or None if there is no atlas or it is out of date
+    '''
+    try:
+        with open(index_path(directory)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not os.path.exists(image_path(directory)):
+        return None
+
+    checked = load_checked(cache_directory)
+    hashed = False
+    for name, source in index['sources'].items():
+        path = os.path.join(directory, source['file'])
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size != source['size']:
+            return None
+        if checked.get(path) == [stat.st_size, stat.st_mtime_ns, source['sha1']]:
+            continue
+
+        # new or touched since it was last checked - only trust the hash
+        if assets.file_hash(path) != source['sha1']:
+            return None
+        checked[path] = [stat.st_size, stat.st_mtime_ns, source['sha1']]
+        hashed = True
+
+    # so the next start doesn't hash them again
+    if hashed:
+        save_checked(cache_directory, checked)
+    return index
+
+
+if __name__ == "__main__":
+    directory = os.path.join("resources", "graphics")
+    index = build(directory)
+    print("packed {} images into {}".format(len(index['rects']), image_path(directory)))
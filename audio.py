@@ -0,0 +1,186 @@
+## Sound ##
+
+## every effect is decoded into memory when the game starts, so playing one
+## mid frame only hands a buffer to SDL's mixer thread - nothing is read or
+## decoded while playing. music is streamed from disk by pg.mixer.music
+
+## effects play on c.SOUND_CHANNELS mixer channels kept just for them. when
+## every one is busy, a new effect takes over the channel playing the least
+## important (see c.SOUND_PRIORITIES), oldest effect - unless everything
+## playing matters more, then the new one is dropped. a burst of shots can
+## never cut off the spaceship blowing up
+
+## effects are files in c.SOUND_DIR named after the effect. any effect without
+## a file is made up when the game starts - a falling blip for shots, bursts of
+## noise for explosions
+
+## nothing happens until start() - headless runs never touch the mixer, and
+## play() does nothing before then
+
+import os
+import time
+
+import numpy as np
+import pygame as pg
+import constants as c
+from tools import load_all_sfx
+
+
+## Made up effects ##
+
+def blip(rate, seconds, start, end):
+    # a square wave sliding from start to end Hz, fading out
+    t = np.arange(int(rate * seconds)) / float(rate)
+    frequency = np.linspace(start, end, len(t))
+    phase = np.cumsum(frequency) / rate
+    wave = np.where(phase % 1.0 < 0.5, 1.0, -1.0)
+    return wave * np.linspace(1.0, 0.0, len(t)) ** 2
+
+
+def noise(rate, seconds, smoothing, seed):
+    # white noise with the top taken off, dying away
+    samples = np.random.RandomState(seed).uniform(-1.0, 1.0, int(rate * seconds))
+    kernel = np.ones(smoothing) / smoothing
+    samples = np.convolve(samples, kernel, mode='same')
+    samples /= max(1e-6, np.abs(samples).max())
+    return samples * np.exp(-np.linspace(0.0, 5.0, len(samples)))
+
+
+SYNTHS = {
+    'shoot': lambda rate: 0.3 * blip(rate, 0.12, 1400, 500),
+    'enemy_explosion': lambda rate: 0.6 * noise(rate, 0.35, 8, 1),
+    'player_explosion': lambda rate: noise(rate, 1.2, 24, 2),
+}
+
+
+def synthesize(name):
+    '''
+    :return: a Sound for the effect, in the mixer's format
+    '''
+    rate, size, channels = pg.mixer.get_init()
+    samples = SYNTHS[name](rate)
+    if size < 0:
+        dtype = np.int16 if abs(size) == 16 else np.int8
+        samples = samples * np.iinfo(dtype).max
+    else:
+        dtype = np.uint16 if size == 16 else np.uint8
+        samples = (samples + 1.0) * (np.iinfo(dtype).max // 2)
+    samples = samples.astype(dtype)
+    if channels > 1:
+        samples = np.repeat(samples[:, None], channels, axis=1)
+    return pg.sndarray.make_sound(np.ascontiguousarray(samples))
+
+
+## Mixer ##
+
+class Audio:
+
+    ''' setup.AUDIO - the effects and the channels they play on '''
+
+    def __init__(self, directory=c.SOUND_DIR, priorities=c.SOUND_PRIORITIES):
+        self.directory = directory
+        self.priorities = priorities
+
+        self.started = False
+        self.sounds = {}
+        self.channels = []
+        # (priority, order) of what each channel was last given
+        self.voices = []
+        self.order = 0
+
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def start(self, channels=c.SOUND_CHANNELS):
+        '''
+        opens the mixer and decodes every effect
+        :return: False if there is no audio device - the game carries on silent
+        '''
+        if self.started:
+            return True
+        try:
+            # pg.init may already have opened it with the default buffer size
+            pg.mixer.quit()
+            pg.mixer.init(c.SOUND_FREQUENCY, -16, 2, c.SOUND_BUFFER)
+        except pg.error:
+            return False
+
+        # reserved channels are left alone by Sound.play, they are only ever used here
+        pg.mixer.set_num_channels(max(pg.mixer.get_num_channels(), channels))
+        pg.mixer.set_reserved(channels)
+        self.channels = [pg.mixer.Channel(i) for i in range(channels)]
+        self.voices = [(0, 0)] * channels
+
+        start = time.perf_counter()
+        self.sounds = load_all_sfx(self.directory)
+        for name in self.priorities:
+            if name not in self.sounds:
+                self.sounds[name] = synthesize(name)
+        for sound in self.sounds.values():
+            sound.set_volume(c.SOUND_VOLUME)
+        self.load_time = time.perf_counter() - start
+
+        self.started = True
+        return True
+
+    def play(self, name):
+        '''
+        plays an effect on a free channel, or one taken from a less important effect
+        :return: the channel, None if nothing was played
+        '''
+        if not self.started:
+            return None
+        priority = self.priorities.get(name, 0)
+
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                break
+        else:
+            # the least important, then oldest
+            i = min(range(len(self.voices)), key=self.voices.__getitem__)
+            if self.voices[i][0] > priority:
+                self.dropped += 1
+                return None
+            self.stolen += 1
+
+        channel = self.channels[i]
+        channel.play(self.sounds[name])
+        self.order += 1
+        self.voices[i] = (priority, self.order)
+        self.played += 1
+        return channel
+
+    def play_music(self, path=c.MUSIC_FILE):
+        ''' streams path over and over, if it is there '''
+        if not self.started or not os.path.exists(path):
+            return False
+        pg.mixer.music.load(path)
+        pg.mixer.music.set_volume(c.MUSIC_VOLUME)
+        pg.mixer.music.play(-1)
+        return True
+
+    def stop(self):
+        if not self.started:
+            return
+        pg.mixer.music.stop()
+        pg.mixer.stop()
+        pg.mixer.quit()
+        self.started = False
+
+
+if __name__ == "__main__":
+    # python audio.py - start up time and how long a burst of effects takes to start
+    audio = Audio()
+    if not audio.start():
+        raise SystemExit(1)
+    print("{} effects loaded in {:.1f}ms".format(len(audio.sounds), audio.load_time * 1000))
+
+    names = sorted(audio.priorities)
+    start = time.perf_counter()
+    for i in range(1000):
+        audio.play(names[i % len(names)])
+    elapsed = time.perf_counter() - start
+    print("1000 plays in {:.2f}ms ({:.1f}us each) - {} stolen, {} dropped".format(
+        elapsed * 1000, elapsed * 1e6 / 1000, audio.stolen, audio.dropped))
+    audio.stop()
@@ -0,0 +1,251 @@
+## Batch simulation ##
+
+## plays lots of seeded games headless across every core, with a scripted
+## player, and reports how long games last, what they score and how fast
+## enemies die - for tuning the difficulty (SPEED_UP_SCORES, HOMING_SCORE,
+## the MOV_X_* / MOV_Y_* speeds...) without playing it by hand
+
+## python batch.py                                   1000 games with the dodge player
+## python batch.py --games 5000 --policy random      more games, a different player
+## python batch.py --set HOMING_SCORE=500            try a different constants setting
+## python batch.py --out report.json                 keep the full report
+
+## every game is seeded, so the same settings always give the same report,
+## whatever the number of processes
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+import constants as c
+import setup as s
+import invaders
+from bench import apply_settings, parse_setting, percentile
+
+
+## Policies ##
+
+## a policy is called before every tick with (game, t, rng) and sets the
+## spaceship's keys, as Game.handle_events would. it shoots through fire()
+## so the firing cooldown still applies
+
+def fire(game):
+    if game.tick - game.last_shot_tick >= c.FIRING_COOLDOWN:
+        game.last_shot_tick = game.tick
+        game.spaceship.shoot = True
+        return True
+    return False
+
+
+def hold(game, left=False, right=False):
+    game.spaceship.left_key_detected = left
+    game.spaceship.right_key_detected = right
+
+
+def idle(game, t, rng):
+    return False
+
+
+def sweep(game, t, rng):
+    # back and forth across the screen, shooting all the time
+    hold(game, left=(t // 60) % 2 == 0, right=(t // 60) % 2 == 1)
+    return fire(game)
+
+
+def random_keys(game, t, rng):
+    # change direction every now and then, shoot now and then
+    if rng.random() < 0.02:
+        direction = rng.randrange(3)
+        hold(game, left=direction == 1, right=direction == 2)
+    return rng.random() < 0.2 and fire(game)
+
+
+def dodge(game, t, rng):
+    # step out from under the nearest fireball above, otherwise chase the nearest enemy
+    ship = game.spaceship.rect
+    threats = [fireball.rect for fireball in game.enemies.fireballs
+               if fireball.rect.bottom < ship.bottom and abs(fireball.rect.centerx - ship.centerx) < ship.width]
+    if threats:
+        threat = max(threats, key=lambda rect: rect.bottom)
+        away_left = threat.centerx >= ship.centerx
+        # no room to step away - go the other way
+        if away_left and ship.left <= 0 or not away_left and ship.right >= c.SCREEN_WIDTH:
+            away_left = not away_left
+        hold(game, left=away_left, right=not away_left)
+    elif game.enemies.group:
+        target = min(game.enemies.group, key=lambda enemy: abs(enemy.rect.centerx - ship.centerx)).rect
+        hold(game, left=target.centerx < ship.centerx - c.MOVE_INCREMENT,
+             right=target.centerx > ship.centerx + c.MOVE_INCREMENT)
+    return fire(game)
+
+
+POLICIES = {
+    'idle': idle,
+    'sweep': sweep,
+    'random': random_keys,
+    'dodge': dodge,
+}
+
+
+## Playing ##
+
+def play_game(seed, policy, max_ticks):
+    '''
+    plays one game to the end, or to max_ticks
+    :return: dict of the seed, score, kills, shots, ticks survived and whether the game was lost
+    '''
+    game = invaders.Game({'highscore': 0, 'score': 0, 'seed': seed})
+    manager = invaders.SceneManager(game)
+    # the policy gets its own random numbers, so it can't change the game's
+    rng = random.Random(seed)
+
+    shots = 0
+    for t in range(max_ticks):
+        if manager.scene is not game:
+            break
+        if not game.game_over and policy(game, t, rng):
+            shots += 1
+        manager.step()
+
+    return {
+        'seed': seed,
+        'score': game.SCORE,
+        'kills': game.SCORE // c.KILL_SCORE,
+        'shots': shots,
+        'ticks': game.death_tick if game.game_over else game.tick,
+        'lost': game.game_over,
+    }
+
+
+def setup_worker(settings):
+    apply_settings(settings)
+    s.start_headless()
+
+
+def play_games(job):
+    seeds, policy, max_ticks = job
+    return [play_game(seed, POLICIES[policy], max_ticks) for seed in seeds]
+
+
+def simulate(games, policy='dodge', max_ticks=36000, settings=None, processes=None, first_seed=0):
+    '''
+    :param games: how many games to play, seeded first_seed, first_seed + 1...
+    :param policy: name of the player in POLICIES
+    :param max_ticks: games still going after this many ticks are stopped
+    :param settings: dict of constants to override in every process
+    :param processes: defaults to one per core
+    :return: the result of every game, in seed order
+    '''
+    settings = settings or {}
+    processes = processes or multiprocessing.cpu_count()
+    seeds = list(range(first_seed, first_seed + games))
+
+    # a handful of jobs per process keeps every core busy to the end without
+    # paying for a round trip per game
+    size = max(1, games // (processes * 8))
+    jobs = [(seeds[i:i + size], policy, max_ticks) for i in range(0, games, size)]
+
+    if processes == 1:
+        setup_worker(settings)
+        batches = map(play_games, jobs)
+        return [result for batch in batches for result in batch]
+
+    with multiprocessing.Pool(processes, setup_worker, (settings,)) as pool:
+        batches = pool.map(play_games, jobs)
+    return [result for batch in batches for result in batch]
+
+
+## Reporting ##
+
+def distribution(values):
+    values = list(values)
+    return {
+        'mean': sum(values) / float(len(values)),
+        'min': min(values),
+        'p10': percentile(values, 0.1),
+        'p50': percentile(values, 0.5),
+        'p90': percentile(values, 0.9),
+        'max': max(values),
+    }
+
+
+def histogram(values, width):
+    counts = {}
+    for value in values:
+        low = value // width * width
+        counts[low] = counts.get(low, 0) + 1
+    return [[low, counts[low]] for low in sorted(counts)]
+
+
+def report(results):
+    '''
+    :return: survival time, score and kill rate figures for a list of play_game results
+    '''
+    seconds = [result['ticks'] / c.FPS for result in results]
+    minutes_played = sum(seconds) / 60.0
+    kills = sum(result['kills'] for result in results)
+    shots = sum(result['shots'] for result in results)
+    return {
+        'games': len(results),
+        'lost': sum(result['lost'] for result in results) / float(len(results)),
+        'survival_seconds': distribution(seconds),
+        'score': distribution(result['score'] for result in results),
+        'score_histogram': histogram((result['score'] for result in results), 5 * c.KILL_SCORE),
+        'kills_per_minute': kills / minutes_played if minutes_played else 0.0,
+        'hit_rate': kills / float(shots) if shots else 0.0,
+    }
+
+
+def print_report(summary):
+    print("{} games, {:.0%} lost".format(summary['games'], summary['lost']))
+    for name, unit in (('survival_seconds', "s"), ('score', "")):
+        figures = summary[name]
+        print("{:<18} mean {:>8.1f}{unit}  p10 {:>7}{unit}  p50 {:>7}{unit}  p90 {:>7}{unit}  max {:>7}{unit}".format(
+            name, figures['mean'], *("{:.0f}".format(figures[key]) for key in ('p10', 'p50', 'p90', 'max')), unit=unit))
+    print("kills per minute   {:.1f}".format(summary['kills_per_minute']))
+    print("hit rate           {:.0%}".format(summary['hit_rate']))
+    print("score histogram")
+    most = max(count for low, count in summary['score_histogram'])
+    for low, count in summary['score_histogram']:
+        print("  {:>6} {:>6} {}".format(low, count, "#" * max(1, 40 * count // most)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="play lots of seeded games headless and report on them")
+    parser.add_argument('--games', type=int, default=1000, help="how many games to play")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='dodge', help="the scripted player")
+    parser.add_argument('--max-ticks', type=int, default=36000, help="stop games still going after this long")
+    parser.add_argument('--processes', type=int, help="defaults to one per core")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    parser.add_argument('--set', action='append', default=[], metavar="NAME=VALUE", help="override a constant")
+    parser.add_argument('--out', help="write the report and every game's result here as json")
+    args = parser.parse_args(argv)
+
+    settings = dict(parse_setting(text) for text in args.set)
+    # the report needs the same constants the games were played with
+    try:
+        apply_settings(settings)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    results = simulate(args.games, args.policy, args.max_ticks, settings, args.processes, args.seed)
+    elapsed = time.perf_counter() - start
+
+    summary = report(results)
+    print_report(summary)
+    ticks = sum(result['ticks'] for result in results)
+    print("{:.1f}s, {:.0f} games/sec, {:.0f} ticks/sec".format(elapsed, len(results) / elapsed, ticks / elapsed))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'settings': settings, 'policy': args.policy, 'max_ticks': args.max_ticks,
+                       'report': summary, 'results': results}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+## Benchmarks ##
+
+## runs the game headless through scripted scenarios at growing sprite counts
+## and reports ticks per second, per tick latency percentiles and peak memory
+## for each. results go to a json file which later runs can be checked against
+
+## python bench.py                                  run everything
+## python bench.py --scenario fireballs --render    one scenario, timing Game.render too
+##                                                   (opens a window, on SDL's dummy driver by default)
+## python bench.py --baseline old.json              flag anything slower than old.json
+## python bench.py --set USE_ENTITY_STORE=True      try a different constants setting
+##                                                   (ones only read at import are refused, see READ_AT_IMPORT)
+
+## the spaceship can't die while benchmarking - it is put straight back,
+## so every scenario runs for the full number of ticks
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pygame as pg
+import constants as c
+import setup as s
+import sprites
+import invaders
+
+
+## Scenarios ##
+
+## each scenario has a setup(game, n) run once and a tick(game, t, n) run
+## before every update to keep the load up, and the values of n to run at
+
+def fill_enemies(game, n):
+    # a tight grid across the top of the screen - overlapping is fine here
+    step = c.ENEMY_WIDTH // 4
+    columns = (c.SCREEN_WIDTH - c.ENEMY_WIDTH) // step - 4
+    formation = {'kind': 'grid', 'rows': (n + columns - 1) // columns, 'columns': min(n, columns),
+                 'x': 2 * step, 'dx': step, 'dy': step}
+    game.enemies = sprites.EnemyGroup(game.SCORE, game.spaceship, game.rng, formation)
+
+
+def top_up_fireballs(game, n):
+    while len(game.enemies.fireballs) < n:
+        fireball = sprites.FIREBALLS.acquire()
+        fireball.update_pos(game.rng.randrange(c.SCREEN_WIDTH), game.rng.randrange(c.SCREEN_HEIGHT // 2))
+        game.enemies.fireballs.add(fireball)
+
+
+def top_up_explosions(game, n):
+    while len(game.generic_container) < n:
+        explosion = sprites.EXPLOSIONS.acquire()
+        explosion.set_position(game.rng.randrange(c.SCREEN_WIDTH), game.rng.randrange(c.SCREEN_HEIGHT))
+        game.generic_container.add(explosion)
+
+
+def top_up_near_misses(game, n):
+    # all overlapping the spaceship's rect, so every one needs the full collision test
+    ship = game.spaceship.rect
+    while len(game.enemies.fireballs) < n:
+        fireball = sprites.FIREBALLS.acquire()
+        fireball.update_pos(game.rng.randrange(ship.left - fireball.rect.width + 1, ship.right),
+                            game.rng.randrange(ship.top - fireball.rect.height + 1, ship.bottom))
+        game.enemies.fireballs.add(fireball)
+
+
+def shoot(game):
+    if game.tick - game.last_shot_tick >= c.FIRING_COOLDOWN:
+        game.last_shot_tick = game.tick
+        game.spaceship.shoot = True
+
+
+def nothing(*args):
+    pass
+
+
+SCENARIOS = {
+    # the first wave, nobody touching anything
+    'idle': {
+        'setup': nothing,
+        'tick': nothing,
+        'scales': [1],
+    },
+    # shooting as fast as the cooldown allows, sweeping left and right
+    'max_firing': {
+        'setup': nothing,
+        'tick': lambda game, t, n: (shoot(game), setattr(game.spaceship, 'left_key_detected', (t // 60) % 2 == 0),
+                                    setattr(game.spaceship, 'right_key_detected', (t // 60) % 2 == 1)),
+        'scales': [1],
+    },
+    # n enemies, each shooting as normal
+    'enemies': {
+        'setup': lambda game, n: fill_enemies(game, n),
+        'tick': lambda game, t, n: shoot(game),
+        'scales': [4, 16, 64, 256],
+    },
+    # n enemies with 4n fireballs kept on screen
+    'fireballs': {
+        'setup': lambda game, n: fill_enemies(game, n),
+        'tick': lambda game, t, n: (shoot(game), top_up_fireballs(game, 4 * n)),
+        'scales': [4, 16, 64, 256],
+    },
+    # n fireballs on top of the spaceship - compare with --set USE_COLLISION_MASKS=False
+    'near_misses': {
+        'setup': nothing,
+        'tick': lambda game, t, n: top_up_near_misses(game, n),
+        'scales': [4, 16, 64],
+    },
+    # n explosions going off at all times
+    'explosions': {
+        'setup': nothing,
+        'tick': lambda game, t, n: top_up_explosions(game, n),
+        'scales': [8, 32, 128, 512],
+    },
+}
+
+
+## Running ##
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(scenario, n, ticks, render=False, seed=0):
+    '''
+    :return: the update (and render) time of every tick, in seconds
+    '''
+    game = invaders.Game({'highscore': 0, 'score': 0, 'seed': seed})
+    invaders.SceneManager(game)
+    surface = pg.Surface(c.SCREEN_SIZE).convert() if render else None
+    scenario['setup'](game, n)
+
+    update_times = []
+    render_times = []
+    for t in range(ticks):
+        scenario['tick'](game, t, n)
+
+        start = time.perf_counter()
+        game.update()
+        update_times.append(time.perf_counter() - start)
+
+        if render:
+            start = time.perf_counter()
+            game.render(surface)
+            render_times.append(time.perf_counter() - start)
+
+        # keep the spaceship alive
+        if game.game_over:
+            game.game_over = False
+            game.spaceship_sprites.add(game.spaceship)
+
+    return update_times, render_times
+
+
+def measure(name, n, ticks, render=False):
+    scenario = SCENARIOS[name]
+
+    update_times, render_times = run(scenario, n, ticks, render)
+
+    # memory is measured on a separate run, tracemalloc slows everything down
+    tracemalloc.start()
+    run(scenario, n, ticks, render)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total = sum(update_times) + sum(render_times)
+    result = {
+        'scenario': name,
+        'n': n,
+        'ticks': ticks,
+        'ticks_per_sec': ticks / total if total else 0.0,
+        'update_us': dict((key, percentile(update_times, q) * 1e6) for key, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))),
+        'peak_memory_kb': peak / 1024.0,
+    }
+    if render:
+        result['render_us'] = dict((key, percentile(render_times, q) * 1e6) for key, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)))
+    return result
+
+
+def key(result):
+    return "{}/{}".format(result['scenario'], result['n'])
+
+
+def compare(results, baseline, tolerance):
+    '''
+    :return: the results more than tolerance slower (in ticks/sec) than the baseline
+    '''
+    old = dict((key(result), result) for result in baseline['results'])
+    slower = []
+    for result in results:
+        before = old.get(key(result))
+        if before is None or not before['ticks_per_sec']:
+            continue
+        ratio = result['ticks_per_sec'] / before['ticks_per_sec']
+        result['vs_baseline'] = ratio
+        if ratio < 1.0 - tolerance:
+            slower.append(result)
+    return slower
+
+
+# constants only read when the modules using them are imported, or that
+# other constants are worked out from - setting them afterwards would do nothing
+READ_AT_IMPORT = (
+    'SCREEN_WIDTH', 'SCREEN_HEIGHT', 'SCREEN_SIZE', 'ORIGIN', 'ENEMY_WIDTH', 'ENEMY_HEIGHT',
+    'ASSET_CACHE_DIR', 'USE_TEXTURE_ATLAS', 'TEXT_CACHE_SIZE', 'SOUND_DIR', 'SCORE_DB',
+    'TELEMETRY_DIR', 'TELEMETRY_FORMAT', 'ENV_ENEMY_SLOTS', 'ENV_FIREBALL_SLOTS',
+)
+
+
+def apply_settings(settings):
+    '''
+    overrides constants for this process
+    :param settings: name -> value
+    raises ValueError for names that aren't constants, or that can't be changed once imported
+    '''
+    for name in settings:
+        if not hasattr(c, name):
+            raise ValueError("{} is not a constant".format(name))
+        if name in READ_AT_IMPORT:
+            raise ValueError("{} is only read at import, setting it would change nothing".format(name))
+    for name, value in settings.items():
+        setattr(c, name, value)
+
+
+def parse_setting(text):
+    name, value = text.split('=', 1)
+    try:
+        value = json.loads(value.lower() if value in ('True', 'False') else value)
+    except ValueError:
+        pass
+    return name, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the game loop")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="only run these (repeatable)")
+    parser.add_argument('--ticks', type=int, default=600, help="ticks per run")
+    parser.add_argument('--render', action='store_true', help="time Game.render onto an off screen surface as well")
+    parser.add_argument('--out', default="bench_results.json", help="where to write the results")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="how much slower than the baseline counts as a regression")
+    parser.add_argument('--set', action='append', default=[], metavar="NAME=VALUE", help="override a constant")
+    args = parser.parse_args(argv)
+
+    settings = dict(parse_setting(text) for text in args.set)
+    try:
+        apply_settings(settings)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.render:
+        # rendering needs images converted to the display format like in the
+        # game, so open a window - on the dummy driver unless told otherwise
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        s.start()
+    else:
+        s.start_headless()
+
+    results = []
+    for name in args.scenario or sorted(SCENARIOS):
+        for n in SCENARIOS[name]['scales']:
+            result = measure(name, n, args.ticks, args.render)
+            results.append(result)
+            line = "{:<24} {:>10.0f} ticks/s   update p50 {:>8.1f}us  p99 {:>8.1f}us".format(
+                key(result), result['ticks_per_sec'], result['update_us']['p50'], result['update_us']['p99'])
+            if args.render:
+                line += "   render p50 {:>8.1f}us  p99 {:>8.1f}us".format(result['render_us']['p50'], result['render_us']['p99'])
+            print(line + "   peak {:>8.0f} KB".format(result['peak_memory_kb']))
+
+    slower = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for result in slower:
+            print("REGRESSION {}: {:.0%} of baseline ticks/s".format(key(result), result['vs_baseline']))
+
+    with open(args.out, 'w') as f:
+        json.dump({'settings': settings, 'ticks': args.ticks, 'render': args.render, 'results': results}, f, indent=1)
+
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+## Collision broadphase ##
+
+## a uniform grid (spatial hash) over the playfield, so that a sprite is only
+## rect tested against the sprites sharing a grid cell with it instead of
+## every sprite in the other group
+
+## turned off with c.USE_SPATIAL_HASH = False, which goes back to testing
+## every pair with pg.sprite.spritecollideany
+
+## with c.USE_COLLISION_MASKS, a pair whose rects overlap is then checked
+## pixel by pixel against the masks the sprites got from setup.GFX.mask
+
+import pygame as pg
+import constants as c
+
+
+class SpatialHash:
+    '''
+    sprites are bucketed by the grid cells their rects overlap
+    the grid is cheap to rebuild, so it is just rebuilt every tick
+    '''
+
+    def __init__(self, cell_size=None):
+        '''
+        :param cell_size: defaults to c.COLLISION_CELL_SIZE as it is when the grid is made
+        '''
+        self.cell_size = cell_size if cell_size is not None else c.COLLISION_CELL_SIZE
+        self.cells = {}
+        # insertion order of each sprite, so results come back in group order
+        self.order = {}
+
+        # how far every sprite has moved since the grid was built - when a
+        # whole group moves together the grid can just be shifted along
+        self.offset_x = 0
+        self.offset_y = 0
+
+    def clear(self):
+        self.cells.clear()
+        self.order.clear()
+        self.offset_x = 0
+        self.offset_y = 0
+
+    def move(self, dx, dy):
+        self.offset_x += dx
+        self.offset_y += dy
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        left = rect.left // size
+        right = max(rect.right - 1, rect.left) // size
+        top = rect.top // size
+        bottom = max(rect.bottom - 1, rect.top) // size
+        return left, right, top, bottom
+
+    def insert(self, sprite):
+        self.order[sprite] = len(self.order)
+        left, right, top, bottom = self.cell_range(sprite.rect)
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    self.cells[(cx, cy)] = [sprite]
+                else:
+                    cell.append(sprite)
+
+    def build(self, group):
+        self.clear()
+        for sprite in group:
+            self.insert(sprite)
+
+    def query(self, rect):
+        '''
+        :param rect: area to look in
+        :return: sprites sharing a cell with rect, in the order they were inserted
+        these are only candidates - they still need the rect test
+        '''
+        if self.offset_x or self.offset_y:
+            rect = rect.move(-self.offset_x, -self.offset_y)
+        left, right, top, bottom = self.cell_range(rect)
+
+        # the common case, everything is inside one cell
+        if left == right and top == bottom:
+            return list(self.cells.get((left, top), ()))
+
+        found = set()
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                found.update(self.cells.get((cx, cy), ()))
+        return sorted(found, key=self.order.__getitem__)
+
+
+def collide_mask(sprite, other):
+    '''
+    rect test first, the masks are only compared when the rects overlap
+    sprites without a mask collide on their rect
+    '''
+    if not sprite.rect.colliderect(other.rect):
+        return False
+    mask = getattr(sprite, 'mask', None)
+    other_mask = getattr(other, 'mask', None)
+    if mask is None or other_mask is None:
+        return True
+    offset = (other.rect.x - sprite.rect.x, other.rect.y - sprite.rect.y)
+    return mask.overlap(other_mask, offset) is not None
+
+
+def spritecollideany(sprite, group, grid=None):
+    '''
+    same as pg.sprite.spritecollideany, but only tests the candidates the
+    grid gives back. the grid has to have been built from group - sprites
+    removed from the group since then are skipped
+    '''
+    if grid is None:
+        return pg.sprite.spritecollideany(sprite, group, collide_mask if c.USE_COLLISION_MASKS else None)
+
+    if c.USE_COLLISION_MASKS:
+        for other in grid.query(sprite.rect):
+            if other in group and collide_mask(sprite, other):
+                return other
+        return None
+
+    rect = sprite.rect
+    for other in grid.query(rect):
+        if other in group and rect.colliderect(other.rect):
+            return other
+    return None
+
+
+if __name__ == "__main__":
+    # python collision.py - what the mask test costs over rect only, per spaceship / fireball check
+    import random
+    import timeit
+    import setup as s
+    import sprites
+
+    s.start_headless()
+    spaceship = sprites.Spaceship()
+    ship = spaceship.rect
+    rng = random.Random(0)
+    cases = (
+        ("far apart", lambda fireball: (rng.randrange(c.SCREEN_WIDTH), rng.randrange(ship.top // 2))),
+        ("rects overlap", lambda fireball: (rng.randrange(ship.left - fireball.rect.width + 1, ship.right),
+                                            rng.randrange(ship.top - fireball.rect.height + 1, ship.bottom))),
+    )
+    for name, place in cases:
+        fireballs = []
+        for _ in range(1000):
+            fireball = sprites.Fireball()
+            fireball.update_pos(*place(fireball))
+            fireballs.append(pg.sprite.GroupSingle(fireball))
+        for masks in (False, True):
+            c.USE_COLLISION_MASKS = masks
+            hits = sum(1 for group in fireballs if spritecollideany(group.sprite, pg.sprite.GroupSingle(spaceship)))
+            seconds = min(timeit.repeat(lambda: [spritecollideany(spaceship, group) for group in fireballs],
+                                        number=20, repeat=5))
+            print("{:<14} {:<10} {:>6.2f}us per check, {:>4} of 1000 hit".format(
+                name, "masks" if masks else "rect only", seconds / 20 / len(fireballs) * 1e6, hits))
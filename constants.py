@@ -6,12 +6,72 @@
 ## but are instead provided as constants that are used by other classes
 
 
+import os
+
 ## PYGAME DISPLAY STUFF ##
 
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 700
 SCREEN_SIZE = (SCREEN_WIDTH, SCREEN_HEIGHT)
 
+## the game is always played at SCREEN_SIZE, and scaled to fit the window (viewport.py)
+## None opens the window at SCREEN_SIZE, with no scaling at all
+WINDOW_SIZE = None
+## fill the whole display - the window size is ignored
+FULLSCREEN = False
+## let the window be resized while playing
+RESIZABLE_WINDOW = True
+## scale by any factor with filtering, rather than by whole numbers only
+SMOOTH_SCALING = False
+## draw scaled copies of each image (made once) rather than scaling the frame
+SCALE_SPRITES = True
+
+## ASSETS ##
+
+## decoded images are kept here so later starts skip decoding (assets.py)
+## set to None to always decode from the source files
+ASSET_CACHE_DIR = os.path.join("resources", "cache")
+
+## hand out sprite images from the packed texture atlas (atlas.py)
+USE_TEXTURE_ATLAS = True
+ATLAS_NAME = "atlas"
+
+## HIGH SCORES ##
+
+## every finished game is saved here, for the leaderboard (scores.py)
+SCORE_DB = os.path.join("resources", "scores.sqlite3")
+## name runs are saved under unless --player is given
+PLAYER_NAME = "player"
+## the writer waits this long for more finished games to save in one go
+SCORE_FLUSH_SECONDS = 1.0
+SCORE_BATCH_SIZE = 32
+## best runs kept in memory for the leaderboard
+LEADERBOARD_SIZE = 10
+
+## SOUND ##
+
+## play sound effects and music at all (audio.py)
+SOUND = True
+## effects are loaded from here, one file per effect named after it - an
+## effect with no file is made up when the game starts
+SOUND_DIR = os.path.join("resources", "sounds")
+## music is streamed from this file while playing, if it is there
+MUSIC_FILE = os.path.join("resources", "music", "theme.ogg")
+SOUND_FREQUENCY = 44100
+## samples per mixer buffer - smaller starts sounds sooner, too small crackles
+SOUND_BUFFER = 512
+## mixer channels kept for effects - when all are busy a new effect takes over
+## the one playing the least important, oldest effect
+SOUND_CHANNELS = 8
+## effect -> priority, higher ones are never cut off by lower ones
+SOUND_PRIORITIES = {
+    'player_explosion': 3,
+    'enemy_explosion': 2,
+    'shoot': 1,
+}
+SOUND_VOLUME = 0.5
+MUSIC_VOLUME = 0.4
+
 ## SCORE INFO ##
 
 SCORE_FONT_SIZE = 15
@@ -22,12 +82,41 @@ SCORE_LOCATIONY = 10
 HIGHSCORE_LOCATIONX = 20
 HIGHSCORE_LOCATIONY = 10
 
+## how many rendered text surfaces are kept around (tools.TextCache)
+TEXT_CACHE_SIZE = 256
+## build score numbers out of pre-rendered digits instead of rendering them
+SCORE_GLYPH_STRIP = False
+
 CAPTION = "INVADERS"
 
 ## FRAME RATE ##
 
+## the simulation always runs at FPS ticks a second, however fast frames are drawn
 FPS = 60.0
 
+## frames drawn per second (0 for no cap) - frames in between ticks are interpolated
+RENDER_FPS = 60.0
+
+## when drawing falls behind, at most this many ticks are run before the next frame
+## and any time still owed after that is dropped
+MAX_STEPS_PER_FRAME = 5
+
+## sprites that moved further than this in a tick (e.g. respawned) are drawn
+## where they are rather than interpolated
+INTERPOLATION_MAX_JUMP = 64
+
+
+## TIMERS ##
+
+## all in simulation ticks, so games play the same at any frame rate
+
+## ticks between spaceship shots
+FIRING_COOLDOWN = 22
+## ticks to wait after dying (for the explosion) before the end screen
+DEATH_PERIOD = 25
+## ticks each explosion image is shown for
+EXPLOSION_FRAME_TICKS = 4
+
 
 ## COLORS ##
 
@@ -69,6 +158,10 @@ ENEMY_VERT_DIST = ENEMY_HEIGHT / 5
 
 NUM_ENEMIES = 4
 
+## how each wave is laid out - see formations.py
+## e.g. {'kind': 'grid', 'rows': 5, 'columns': 12, 'dx': 40, 'dy': 30}
+FORMATION = {'kind': 'classic'}
+
 INIT_MOV_X = 2
 INIT_MOV_Y = 20
 
@@ -80,6 +173,12 @@ MOV_Y_200 = 20
 MOV_Y_400 = 35
 MOV_Y_600 = 35
 
+## scores at which waves move up to the _200, _400 and _600 speeds above
+SPEED_UP_SCORES = (200, 400, 600)
+
+## fireballs home in on the spaceship from this score on
+HOMING_SCORE = 300
+
 
 ## ENEMY PROJECTILE - FIREBALL STUFF ##
 
@@ -92,3 +191,99 @@ FIREBALL_MAX_YSPEED = 8
 ## ENEMY KILL SCORE ##
 KILL_SCORE = 20
 
+## ENTITY STORE ##
+
+## move fireballs, projectiles and enemies a whole group at a time with numpy
+## arrays (entities.py) instead of one sprite at a time
+USE_ENTITY_STORE = False
+
+## COLLISIONS ##
+
+## only test sprites against the ones near them using a grid (collision.py)
+## set to False to go back to testing every pair
+USE_SPATIAL_HASH = True
+COLLISION_CELL_SIZE = 100
+## sprites whose rects overlap only collide if their opaque pixels do too
+## set to False for rect only collisions
+USE_COLLISION_MASKS = True
+
+## RENDERING ##
+
+## only redraw and push the parts of the screen that changed (render.py)
+USE_DIRTY_RECTS = True
+## redraw everything once more than this fraction of the screen has changed
+DIRTY_RECT_THRESHOLD = 0.5
+## hand each frame's blits to pygame in one Surface.blits call (fblits where the
+## pygame has it) rather than one blit at a time - False to compare with bench.py --render
+USE_BATCHED_BLITS = True
+
+## SPRITE POOLS ##
+
+## most killed sprites of each kind kept around for reuse (0 turns a pool off)
+FIREBALL_POOL_SIZE = 128
+SP_PROJECTILE_POOL_SIZE = 32
+EXPLOSION_POOL_SIZE = 16
+
+## TELEMETRY ##
+
+## log what happens in played games (telemetry.py)
+TELEMETRY = True
+TELEMETRY_DIR = os.path.join("resources", "telemetry")
+## 'jsonl' or 'binary'
+TELEMETRY_FORMAT = 'jsonl'
+## events waiting to be written - past this they are dropped, and counted
+TELEMETRY_QUEUE_SIZE = 4096
+## how often the writer takes what has been queued
+TELEMETRY_FLUSH_SECONDS = 1.0
+## a new file is started once the current one is this big
+TELEMETRY_FILE_BYTES = 1 << 20
+## older files than this many are deleted
+TELEMETRY_KEEP_FILES = 20
+
+## PROFILER ##
+
+## time every phase of each frame (profiler.py), also turned on with --profile
+PROFILE = False
+## how many frames of timings are kept
+PROFILER_FRAMES = 3600
+## show frame time percentiles and sprite counts on screen while profiling
+PROFILER_OVERLAY = True
+## frames between overlay text updates
+PROFILER_OVERLAY_REFRESH = 30
+## width of the histogram bins in the json dump
+PROFILER_BIN_MS = 0.5
+## timings are written to this path + .csv / .json on exit
+PROFILE_OUTPUT = "profile"
+
+## AGENT ENVIRONMENT ##
+
+## how many enemies / fireballs a feature observation has room for (env.py)
+## fireballs past this are left out, lowest on the screen kept first
+ENV_ENEMY_SLOTS = 16
+ENV_FIREBALL_SLOTS = 16
+## pixel observations are the screen shrunk by this factor
+ENV_FRAME_SCALE = 4
+
+## NETPLAY ##
+
+## co-op over UDP (netplay.py) - the server's port
+NET_PORT = 47900
+## ticks between the states the server sends out
+NET_STATE_INTERVAL = 2
+## positions are sent in steps of this many pixels
+NET_POSITION_QUANTUM = 2
+## states kept for deltas - older than this and a client gets a full state
+NET_STATE_HISTORY = 64
+## seconds without hearing from a client before its spaceship is given up
+NET_TIMEOUT = 5.0
+
+## PILOT ##
+
+## the built in player (pilot.py) plans this many ticks ahead
+PILOT_HORIZON = 40
+## milliseconds it may spend thinking each tick, however many plans that leaves untried
+PILOT_BUDGET_MS = 2.0
+## plans tried together in one go - the budget is checked between batches
+PILOT_BATCH = 8
+## pixels added around the spaceship when planning, to make up for what the model leaves out
+PILOT_MARGIN = 4
@@ -0,0 +1,176 @@
+## Array backed entity store ##
+
+## instead of every fireball / projectile / enemy moving itself in its own
+## update(), the positions and velocities of a whole group live in numpy arrays
+## and get moved in one go each tick. the sprites are kept as thin views -
+## they still have an image and a rect (for drawing and collisions), but the
+## rect is just copied out of the arrays after each step
+
+## turned on with c.USE_ENTITY_STORE - the per sprite path is still there to compare against
+
+import numpy as np
+import pygame as pg
+import constants as c
+
+
+class EntityStore:
+    '''
+    struct of arrays holding the movement state of a group of entities
+    entities are packed at the front of the arrays, removing one moves the
+    last entity into its slot so a step only ever touches [:count]
+    :param kill_offscreen: step() hands back entities that left the top or
+    bottom of the screen - on for fireballs and projectiles, off for enemies,
+    which are never killed for being off screen
+    '''
+
+    def __init__(self, capacity=64, kill_offscreen=True):
+        self.count = 0
+        self.views = []
+        self.kill_offscreen = kill_offscreen
+
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.vx = np.zeros(capacity, dtype=np.int64)
+        self.vy = np.zeros(capacity, dtype=np.int64)
+
+        # added to vy every tick
+        self.gravity = np.zeros(capacity, dtype=np.int64)
+        # vy is clamped to [-max_speed, max_speed]
+        self.max_speed = np.zeros(capacity, dtype=np.int64)
+
+        # how far a homing entity steers toward the target each tick, 0 if not homing
+        self.homing = np.zeros(capacity, dtype=np.int64)
+        # which target it steers toward, when there is more than one
+        self.target = np.zeros(capacity, dtype=np.intp)
+
+    def arrays(self):
+        return (self.x, self.y, self.vx, self.vy, self.gravity, self.max_speed, self.homing, self.target)
+
+    def grow(self):
+        capacity = 2 * len(self.x)
+        for name in ('x', 'y', 'vx', 'vy', 'gravity', 'max_speed', 'homing', 'target'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, sprite, vx=0, vy=0, gravity=0, max_speed=0, homing=0, target=0):
+        if self.count == len(self.x):
+            self.grow()
+
+        i = self.count
+        self.x[i] = sprite.rect.x
+        self.y[i] = sprite.rect.y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.gravity[i] = gravity
+        self.max_speed[i] = max_speed
+        self.homing[i] = homing
+        self.target[i] = target
+
+        sprite.entity_index = i
+        self.views.append(sprite)
+        self.count += 1
+
+    def remove(self, sprite):
+        i = sprite.entity_index
+        last = self.count - 1
+
+        # fill the hole with the last entity
+        if i != last:
+            for array in self.arrays():
+                array[i] = array[last]
+            moved = self.views[last]
+            moved.entity_index = i
+            self.views[i] = moved
+
+        self.views.pop()
+        self.count -= 1
+        sprite.entity_index = None
+
+    def step(self, target_x=None):
+        '''
+        moves every entity by one tick
+        :param target_x: x coordinate homing entities steer toward - or an
+        array of them, each entity steering toward the one its target indexes
+        :return: the sprites that left the top or bottom of the screen, if kill_offscreen
+        '''
+        n = self.count
+        if n == 0:
+            return []
+
+        x = self.x[:n]
+        y = self.y[:n]
+        vy = self.vy[:n]
+        max_speed = self.max_speed[:n]
+
+        # gravity then clamp then move
+        vy += self.gravity[:n]
+        np.clip(vy, -max_speed, max_speed, out=vy)
+        y += vy
+        x += self.vx[:n]
+
+        # homing entities step toward the target horizontally
+        if target_x is not None:
+            if np.ndim(target_x):
+                target_x = target_x[self.target[:n]]
+            x += self.homing[:n] * np.sign(target_x - x)
+
+        self.sync()
+
+        if not self.kill_offscreen:
+            return []
+        return [self.views[i] for i in np.flatnonzero((y <= 0) | (y > c.SCREEN_HEIGHT))]
+
+    def sync(self):
+        '''
+        copies positions back onto the sprites' rects
+        '''
+        n = self.count
+        for sprite, x, y in zip(self.views, self.x[:n].tolist(), self.y[:n].tolist()):
+            sprite.rect.x = x
+            sprite.rect.y = y
+
+
+class StoreGroup(pg.sprite.Group):
+    '''
+    sprite group whose members are moved by an EntityStore
+    sprites added to it must have an entity_state() method returning the
+    keyword arguments for EntityStore.add
+    :param target: sprite that homing members steer toward
+    :param targets: sprites homing members steer toward, each member the one
+    its entity_state() names as 'target' (the first if it names none)
+    :param kill_offscreen: kill members that leave the top or bottom of the screen
+    '''
+
+    def __init__(self, *sprites, target=None, targets=None, kill_offscreen=True):
+        self.store = EntityStore(kill_offscreen=kill_offscreen)
+        if targets is None:
+            targets = [target] if target is not None else []
+        self.targets = list(targets)
+        pg.sprite.Group.__init__(self, *sprites)
+
+    def add_internal(self, sprite, layer=None):
+        if sprite not in self.spritedict:
+            state = sprite.entity_state()
+            target = state.pop('target', None)
+            if len(self.targets) > 1 and target in self.targets:
+                state['target'] = self.targets.index(target)
+            self.store.add(sprite, **state)
+        pg.sprite.Group.add_internal(self, sprite)
+
+    def remove_internal(self, sprite):
+        if sprite.entity_index is not None:
+            self.store.remove(sprite)
+        pg.sprite.Group.remove_internal(self, sprite)
+
+    def update(self, *args):
+        # one vectorized step instead of calling update on every sprite
+        if len(self.targets) > 1:
+            target_x = np.array([target.rect.x for target in self.targets])
+        elif self.targets:
+            target_x = self.targets[0].rect.x
+        else:
+            target_x = None
+        for sprite in self.store.step(target_x):
+            sprite.kill()
@@ -0,0 +1,224 @@
+## Agent environment ##
+
+## wraps Game in the usual reset() / step(action) interface for training agents
+## against it - headless, no frame cap, observations as numpy arrays
+
+##   env = Env()
+##   observation = env.reset()
+##   observation, reward, done, info = env.step(action)
+
+## actions are 0 to 5 - (nothing, left, right) + 3 to also shoot
+## the reward is the score gained by the step, done is set the tick the spaceship dies
+
+## observations are either 'features' - a float32 vector of positions scaled
+## to 0..1, see Env.features - or 'pixels', the screen shrunk by
+## c.ENV_FRAME_SCALE as a (height, width, 3) uint8 array
+
+## VectorEnv runs n games side by side, with batched observations / rewards / dones
+
+import random
+
+import numpy as np
+import pygame as pg
+
+import constants as c
+import setup as s
+import invaders
+
+
+NOTHING, LEFT, RIGHT = 0, 1, 2
+SHOOT = 3
+NUM_ACTIONS = 6
+
+# spaceship x, y and whether it can fire, then x, y, present for every slot
+FEATURES = 3 + 3 * (c.ENV_ENEMY_SLOTS + c.ENV_FIREBALL_SLOTS)
+
+
+def observation_shape(observation='features'):
+    if observation == 'features':
+        return (FEATURES,)
+    return (c.SCREEN_HEIGHT // c.ENV_FRAME_SCALE, c.SCREEN_WIDTH // c.ENV_FRAME_SCALE, 3)
+
+
+class Env:
+
+    ''' one game, played one action at a time '''
+
+    def __init__(self, observation='features', seed=None, frame_skip=1, max_ticks=None):
+        '''
+        :param observation: 'features' or 'pixels'
+        :param seed: seeds every game this env plays, in turn
+        :param frame_skip: ticks each action is held for
+        :param max_ticks: a game is done after this many ticks even if the spaceship lives
+        '''
+        if observation not in ('features', 'pixels'):
+            raise ValueError("unknown observation {}".format(observation))
+        s.start_headless()
+
+        self.observation = observation
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.seeds = random.Random(seed)
+        self.game = None
+
+        if observation == 'pixels':
+            self.surface = pg.Surface(c.SCREEN_SIZE)
+            self.frame = pg.Surface((c.SCREEN_WIDTH // c.ENV_FRAME_SCALE, c.SCREEN_HEIGHT // c.ENV_FRAME_SCALE))
+
+    def reset(self, seed=None, out=None):
+        '''
+        starts a new game
+        :param seed: for this game, otherwise the next from the env's seed
+        :param out: array to write the observation into, a new one if None
+        :return: the first observation
+        '''
+        if seed is None:
+            seed = self.seeds.getrandbits(32)
+        self.game = invaders.Game({'highscore': 0, 'score': 0, 'seed': seed})
+        invaders.SceneManager(self.game)
+        return self.observe(out)
+
+    def step(self, action, out=None):
+        '''
+        :param action: 0 to 5, see the top of the file
+        :param out: array to write the observation into, a new one if None
+        :return: observation, reward, done, info
+        '''
+        game = self.game
+        spaceship = game.spaceship
+        move = action % SHOOT
+        spaceship.left_key_detected = move == LEFT
+        spaceship.right_key_detected = move == RIGHT
+
+        score = game.SCORE
+        for _ in range(self.frame_skip):
+            # the same cooldown Game.handle_events puts on the spacebar
+            if action >= SHOOT and game.tick - game.last_shot_tick >= c.FIRING_COOLDOWN:
+                game.last_shot_tick = game.tick
+                spaceship.shoot = True
+            game.update()
+            if game.game_over:
+                break
+
+        done = game.game_over or (self.max_ticks is not None and game.tick >= self.max_ticks)
+        info = {'score': game.SCORE, 'tick': game.tick, 'seed': game.seed}
+        return self.observe(out), float(game.SCORE - score), done, info
+
+    def observe(self, out=None):
+        if self.observation == 'features':
+            return self.features(out)
+        return self.pixels(out)
+
+    def features(self, out=None):
+        '''
+        spaceship x, y and 1 if it can fire now, then x, y, 1 for each enemy
+        and each fireball (lowest on the screen first), zeros in empty slots.
+        positions are the sprite's centre over the screen size
+        '''
+        if out is None:
+            out = np.zeros(FEATURES, dtype=np.float32)
+        else:
+            out[:] = 0
+
+        game = self.game
+        width = float(c.SCREEN_WIDTH)
+        height = float(c.SCREEN_HEIGHT)
+
+        ship = game.spaceship.rect
+        out[0] = ship.centerx / width
+        out[1] = ship.centery / height
+        out[2] = game.tick + 1 - game.last_shot_tick >= c.FIRING_COOLDOWN
+
+        i = 3
+        for enemy in game.enemies.group:
+            if i >= 3 + 3 * c.ENV_ENEMY_SLOTS:
+                break
+            out[i:i + 3] = enemy.rect.centerx / width, enemy.rect.centery / height, 1.0
+            i += 3
+
+        i = 3 + 3 * c.ENV_ENEMY_SLOTS
+        fireballs = game.enemies.fireballs.sprites()
+        if len(fireballs) > c.ENV_FIREBALL_SLOTS:
+            fireballs.sort(key=lambda fireball: -fireball.rect.y)
+        for fireball in fireballs[:c.ENV_FIREBALL_SLOTS]:
+            out[i:i + 3] = fireball.rect.centerx / width, fireball.rect.centery / height, 1.0
+            i += 3
+        return out
+
+    def pixels(self, out=None):
+        self.game.render(self.surface)
+        pg.transform.scale(self.surface, self.frame.get_size(), self.frame)
+        # surfarray is indexed [x][y] - turn it the right way up
+        frame = pg.surfarray.pixels3d(self.frame).transpose(1, 0, 2)
+        if out is None:
+            return frame.copy()
+        out[:] = frame
+        return out
+
+
+class VectorEnv:
+
+    ''' n games stepped together in one process
+
+    step takes an action per game and returns the observations as one
+    (n, ...) array, with rewards and dones as (n,) arrays. a game that is done
+    is reset straight away - the observation returned for it is the new game's
+    first, and its info holds the finished game's score
+    '''
+
+    def __init__(self, n, observation='features', seed=None, frame_skip=1, max_ticks=None):
+        seeds = random.Random(seed)
+        self.envs = [Env(observation, seeds.getrandbits(32), frame_skip, max_ticks) for _ in range(n)]
+
+        self.observations = np.zeros((n,) + observation_shape(observation),
+                                     dtype=np.float32 if observation == 'features' else np.uint8)
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.dones = np.zeros(n, dtype=bool)
+
+    def __len__(self):
+        return len(self.envs)
+
+    def reset(self):
+        '''
+        :return: the first observation of every game - the array is reused, copy it to keep it
+        '''
+        for i, env in enumerate(self.envs):
+            env.reset(out=self.observations[i])
+        return self.observations
+
+    def step(self, actions):
+        '''
+        :param actions: one per game
+        :return: observations, rewards, dones, infos - the arrays are reused, copy them to keep them
+        '''
+        infos = []
+        for i, env in enumerate(self.envs):
+            observation, reward, done, info = env.step(actions[i], self.observations[i])
+            self.rewards[i] = reward
+            self.dones[i] = done
+            if done:
+                env.reset(out=self.observations[i])
+            infos.append(info)
+        return self.observations, self.rewards, self.dones, infos
+
+
+if __name__ == "__main__":
+    # python env.py [n] [features|pixels]  - random actions, steps per second
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    observation = sys.argv[2] if len(sys.argv) > 2 else 'features'
+    steps = 2000 if observation == 'features' else 200
+
+    envs = VectorEnv(n, observation, seed=0)
+    envs.reset()
+    actions = np.random.RandomState(0).randint(NUM_ACTIONS, size=(steps, n))
+    games = 0
+    start = time.perf_counter()
+    for t in range(steps):
+        observations, rewards, dones, infos = envs.step(actions[t])
+        games += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    print("{} envs, {} observations: {:.0f} steps/sec, {} games finished".format(
+        n, observation, steps * n / elapsed, games))
@@ -0,0 +1,105 @@
+## Enemy formations ##
+
+## an enemy wave is laid out from a formation spec - a dict with a 'kind'
+## naming one of the layouts below, and the rest of its keys passed to it
+## e.g. {'kind': 'grid', 'rows': 10, 'columns': 20, 'dx': 28, 'dy': 22}
+
+## every layout returns the top left (x, y) of each enemy in the wave. a wave
+## sticking out past either side of the screen is moved back onto it, and one
+## wider than the screen is refused - it would turn around every tick
+
+import constants as c
+
+
+def classic():
+    # the original wave - three across with one underneath the middle
+    return [
+        (c.INIT_ENEMY_X, c.INIT_ENEMY_Y),
+        (2 * c.INIT_ENEMY_X, c.INIT_ENEMY_Y),
+        (3 * c.INIT_ENEMY_X, c.INIT_ENEMY_Y),
+        (2 * c.INIT_ENEMY_X, c.INIT_ENEMY_Y + c.ENEMY_HEIGHT + c.ENEMY_VERT_DIST),
+    ]
+
+
+## left out arguments are filled in from constants when the wave is laid out,
+## not when this file is imported - so changed constants are picked up
+
+def spacing(dx, dy):
+    if dx is None:
+        dx = c.ENEMY_WIDTH + c.ENEMY_HOR_DIST
+    if dy is None:
+        dy = c.ENEMY_HEIGHT + c.ENEMY_VERT_DIST
+    return dx, dy
+
+
+def grid(rows, columns, x=0, y=None, dx=None, dy=None):
+    if y is None:
+        y = c.INIT_ENEMY_Y
+    dx, dy = spacing(dx, dy)
+    return [(x + col * dx, y + row * dy) for row in range(rows) for col in range(columns)]
+
+
+def wedge(rows, x=None, y=None, dx=None, dy=None):
+    # one enemy at the point, one more in each row below, centred on x
+    if x is None:
+        x = (c.SCREEN_WIDTH - c.ENEMY_WIDTH) // 2
+    if y is None:
+        y = c.INIT_ENEMY_Y
+    dx, dy = spacing(dx, dy)
+    positions = []
+    for row in range(rows):
+        start = x - row * dx / 2.0
+        positions.extend((int(start + i * dx), y + row * dy) for i in range(row + 1))
+    return positions
+
+
+def random_fill(count, rng, left=0, top=None, width=None, height=None):
+    if top is None:
+        top = c.INIT_ENEMY_Y
+    if width is None:
+        width = c.SCREEN_WIDTH - c.ENEMY_WIDTH
+    if height is None:
+        height = c.SCREEN_HEIGHT // 3
+    return [(left + rng.randrange(width), top + rng.randrange(height)) for _ in range(count)]
+
+
+LAYOUTS = {
+    'classic': classic,
+    'grid': grid,
+    'wedge': wedge,
+    'random': random_fill,
+}
+
+
+def positions(spec, rng):
+    '''
+    :param spec: formation spec, see the top of this file
+    :param rng: the game's random number generator (only used by random fills)
+    :return: list of (x, y)
+    '''
+    args = dict(spec)
+    layout = LAYOUTS[args.pop('kind')]
+    if layout is random_fill:
+        args['rng'] = rng
+    return fit(layout(**args))
+
+
+def fit(positions):
+    '''
+    moves the wave sideways so every enemy is on screen
+    :return: list of (x, y)
+    '''
+    if not positions:
+        return positions
+    left = min(x for x, y in positions)
+    right = max(x for x, y in positions)
+    if right - left > c.SCREEN_WIDTH - c.ENEMY_WIDTH:
+        raise ValueError("formation is {} wide, only {} fits on the screen".format(
+            right - left + c.ENEMY_WIDTH, c.SCREEN_WIDTH))
+
+    shift = 0
+    if left < 0:
+        shift = -left
+    elif right > c.SCREEN_WIDTH - c.ENEMY_WIDTH:
+        shift = c.SCREEN_WIDTH - c.ENEMY_WIDTH - right
+    return [(x + shift, y) for x, y in positions]
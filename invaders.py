@@ -1,12 +1,21 @@
 import pygame as pg
 import constants as c
 
-## Setup will load graphics ##
+import pickle
+import random
+import sys
+import time
+import zlib
 
-## Top level code for setup will only be run ONCE when setup is imported ##
+## Setup holds the display and graphics - both are only set up when first needed ##
 import setup as s
 
 import sprites
+import tools
+import entities
+import collision
+import render
+import telemetry
 
 import invaders_info as info
 
@@ -24,9 +33,15 @@ class Scene:
         # key - a name representing the persist variable
         # value - representing the value of the variable
         self.game_info = persist
-        pass
 
-    def render(self, screen):
+        # the game this scene leads into, when it is set up ahead of time
+        self.next_game = None
+
+    # draws the scene onto screen
+    # alpha is how far along (0 to 1) the next tick the frame is drawn at
+    # view is the Viewport to scale the drawing by, None for native size
+    # returns the list of rects that changed, or None if all of screen changed
+    def render(self, screen, alpha=1.0, view=None):
         raise NotImplementedError
 
     def update(self):
@@ -35,6 +50,12 @@ class Scene:
     def handle_events(self, events):
         raise NotImplementedError
 
+    # makes the game this scene leads into - only the first time
+    def prepare_game(self):
+        if self.next_game is None:
+            self.next_game = Game(self.game_info)
+        return self.next_game
+
 
 class Game(Scene):
 
@@ -49,15 +70,36 @@ class Game(Scene):
         # Note: pg.init and caption setting done in setup
         self.game_over = False
 
-        self.spaceship_projectiles = pg.sprite.Group()
+        # simulation ticks since the game started - every game timer counts these
+        self.tick = 0
+
+        # everything random in the game comes from here, so a game with a
+        # 'seed' in its persist plays out the same every time
+        # without one a seed is picked, and kept so the game can be recorded
+        self.seed = self.game_info.get('seed')
+        if self.seed is None:
+            self.seed = random.getrandbits(32)
+        # (a random.Random that can be snapshotted without copying its state each time)
+        self.rng = tools.SnapshotRandom(self.seed)
+
+        # where sprites were before the last tick, for drawing in between ticks
+        self.previous_positions = None
+
+        if c.USE_ENTITY_STORE:
+            self.spaceship_projectiles = entities.StoreGroup()
+        else:
+            self.spaceship_projectiles = pg.sprite.Group()
         self.enemies = pg.sprite.Group()
-        self.spaceship_sprites = pg.sprite.GroupSingle()
+        self.spaceship_sprites = pg.sprite.Group()
 
         # SCORE VARIABLE
         self.SCORE = 0
 
+        # who is playing, runs are saved under their name
+        self.player = self.game_info.get('player', c.PLAYER_NAME)
+
         # HIGH SCORE VARIABLE
-        self.HIGH_SCORE = self.game_info['highscore']
+        self.HIGH_SCORE = max(self.game_info['highscore'], s.SCORES.high_score(self.player))
 
         # SCORE OBJECT
         self.score_object = info.Score(c.SCORE_FONT_SIZE, c.SCORE_LOCATIONX, c.SCORE_LOCATIONY)
@@ -71,13 +113,26 @@ class Game(Scene):
         # bad code design
         # putting specific code to the spaceship in global scope
         # oh well
-        self.firing_rate = 360
-        self.last_update = pg.time.get_ticks()
+        self.last_shot_tick = 0
 
 
         # death period - basically wait for the explosion
-        self.death_period = 400
-        self.death_update_tick = 0
+        self.death_tick = 0
+
+        # fireball collision grid, rebuilt every update (None means test every pair)
+        # the enemy wave keeps its own grid
+        if c.USE_SPATIAL_HASH:
+            self.fireball_grid = collision.SpatialHash()
+        else:
+            self.fireball_grid = None
+
+        # sounds go here - silent unless the game is being played in a window
+        self.audio = s.AUDIO
+
+        # gameplay events go here - dropped unless the game is being played in a window
+        self.telemetry = s.TELEMETRY
+        # (speed step, homing) last told to telemetry, a TIER event is emitted when it changes
+        self.difficulty = sprites.difficulty(self.SCORE)
 
         # generic sprite container for holding things that don't do anything special
         self.generic_container = pg.sprite.Group()
@@ -90,25 +145,106 @@ class Game(Scene):
 
     def setup_background(self):
         self.background = s.GFX['space_background']
+        self.renderer = render.DirtyRenderer(self.background)
 
     def setup_enemies(self):
-        self.enemies = sprites.EnemyGroup(self.SCORE, self.spaceship)
+        self.enemies = sprites.EnemyGroup(self.SCORE, self.spaceship, self.rng, targets=self.spaceships)
 
     def setup_spaceship(self):
-        self.spaceship = sprites.Spaceship()
-        self.spaceship_sprites.add(self.spaceship)
+        # a game with 'players' in its persist has that many spaceships, spread
+        # out along the bottom - the first one is the keyboard's
+        players = self.game_info.get('players', 1)
+        self.spaceships = []
+        for i in range(players):
+            spaceship = sprites.Spaceship()
+            if players > 1:
+                spaceship.rect.centerx = c.SCREEN_WIDTH * (i + 1) // (players + 1)
+            self.spaceships.append(spaceship)
+            self.spaceship_sprites.add(spaceship)
+        self.spaceship = self.spaceships[0]
+
+    ## Snapshots
+
+    def snapshot(self):
+        '''
+        the whole state of the game as nested tuples of plain values - cheap to
+        take and to hold on to, and picklable for save states (see dump_snapshot)
+        nothing is shared with the game, so it can be restored any number of times
+        (tick, game_over, death_tick, last_shot_tick, score, high score, rng state,
+         (spaceship, alive) for each spaceship, projectiles, explosions, enemy wave)
+        '''
+        store = self.spaceship_projectiles.store if c.USE_ENTITY_STORE else None
+        return (self.tick, self.game_over, self.death_tick, self.last_shot_tick, self.SCORE, self.HIGH_SCORE,
+                self.rng.getstate(),
+                tuple((spaceship.snapshot(), spaceship in self.spaceship_sprites) for spaceship in self.spaceships),
+                tuple(projectile.snapshot(store) for projectile in self.spaceship_projectiles),
+                tuple(explosion.snapshot() for explosion in self.generic_container),
+                self.enemies.snapshot())
+
+    def restore(self, snapshot):
+        '''
+        puts the game back to how it was when snapshot was taken, reusing its
+        sprites - the snapshot can come from another game, e.g. a save state
+        '''
+        (self.tick, self.game_over, self.death_tick, self.last_shot_tick, self.SCORE, self.HIGH_SCORE,
+         rng_state, spaceships, projectiles, explosions, enemies) = snapshot
+
+        self.spaceship_sprites.empty()
+        for spaceship, (state, alive) in zip(self.spaceships, spaceships):
+            spaceship.restore(state)
+            if alive:
+                self.spaceship_sprites.add(spaceship)
+
+        for projectile in self.spaceship_projectiles.sprites():
+            projectile.kill()
+        for state in projectiles:
+            projectile = sprites.SP_PROJECTILES.acquire()
+            projectile.restore(state)
+            self.spaceship_projectiles.add(projectile)
+
+        for explosion in self.generic_container.sprites():
+            explosion.kill()
+        for state in explosions:
+            explosion = sprites.EXPLOSIONS.acquire()
+            explosion.restore(state)
+            self.generic_container.add(explosion)
+
+        self.enemies.restore(enemies)
+
+        # last - restoring the wave can draw numbers for new enemies
+        self.rng.setstate(rng_state)
+        self.previous_positions = None
+        self.difficulty = sprites.difficulty(self.SCORE)
 
     ## Rendering code
 
-    def render(self, surface):
-        surface.blit(self.background, c.ORIGIN)
-        self.spaceship_sprites.draw(surface)
-        self.spaceship_projectiles.draw(surface)
-        self.enemies.group.draw(surface)
-        self.enemies.fireballs.draw(surface)
-        self.generic_container.draw(surface)
-        self.score_object.draw(surface)
-        self.high_score_object.draw(surface)
+    def save_positions(self):
+        '''
+        remembers where every drawn sprite is, so the next render can draw
+        them part way between here and where the next tick moves them
+        (and which life of a pooled sprite it was, see PooledSprite)
+        '''
+        positions = {}
+        for group in self.drawn_groups():
+            for sprite in group:
+                positions[sprite] = (sprite.rect.x, sprite.rect.y, getattr(sprite, 'generation', 0))
+        self.previous_positions = positions
+
+    def drawn_groups(self):
+        return (self.spaceship_sprites, self.spaceship_projectiles, self.enemies.group,
+                self.enemies.fireballs, self.generic_container)
+
+    def render(self, surface, alpha=1.0, view=None):
+        # score text is only ever needed for drawing, so it is refreshed here
+        # rather than in update - headless runs never pay for font rendering
+        self.score_object.update(self.SCORE)
+        self.high_score_object.update(self.HIGH_SCORE)
+
+        for group in self.drawn_groups():
+            self.renderer.draw(group, self.previous_positions, alpha)
+        self.score_object.draw(self.renderer)
+        self.high_score_object.draw(self.renderer)
+        return self.renderer.flush(surface, view)
 
     ## Event handling code
 
@@ -125,9 +261,8 @@ class Game(Scene):
                     self.spaceship.right_key_detected = True
                 elif event.key == pg.K_SPACE:
                     # Shoot! - limit shooting rate
-                    now = pg.time.get_ticks()
-                    if now - self.last_update > self.firing_rate:
-                        self.last_update = now
+                    if self.tick - self.last_shot_tick >= c.FIRING_COOLDOWN:
+                        self.last_shot_tick = self.tick
                         self.spaceship.shoot = True
             if event.type == pg.KEYUP:
                 if event.key == pg.K_LEFT:
@@ -138,122 +273,225 @@ class Game(Scene):
 
     ## Updating stuff code
 
+    def lose_spaceship(self, spaceship, cause):
+        '''
+        :param cause: telemetry.DEATH_FIREBALL or telemetry.DEATH_COLLISION
+        '''
+        self.telemetry.emit(cause, self.tick, spaceship.rect.x, spaceship.rect.y,
+                            self.spaceships.index(spaceship))
+
+        # explode the spaceship
+        expl = sprites.EXPLOSIONS.acquire()
+        expl.set_position(spaceship.rect.x, spaceship.rect.y)
+        self.generic_container.add(expl)
+        self.audio.play('player_explosion')
+
+        # remove the spaceship
+        self.spaceship_sprites.remove(spaceship)
+
+        # the game is lost once every spaceship is gone
+        if not self.spaceship_sprites:
+            self.game_over = True
+
+            # get the time right now
+            self.death_tick = self.tick
+
     def update(self):
 
+        self.tick += 1
+
+        if self.tick == 1:
+            self.telemetry.emit(telemetry.GAME_START, self.tick, self.seed, len(self.spaceships), self.HIGH_SCORE)
 
         if self.game_over:
-            now = pg.time.get_ticks()
-            if now - self.death_update_tick > self.death_period:
+            if self.tick - self.death_tick >= c.DEATH_PERIOD:
+                # queued for the score store's writer thread, never waits on the disk
+                s.SCORES.record(self.player, self.SCORE, self.death_tick, self.seed)
+                self.telemetry.emit(telemetry.GAME_END, self.tick, self.seed, self.SCORE, self.death_tick)
                 persist = {
                     'highscore': self.HIGH_SCORE,
                     'score': self.SCORE,
+                    'player': self.player,
                 }
                 self.manager.go_to(EndScreen(persist))
 
         # unfortunately, we need to handle the shoot in the 'global' main loop :(
-        if self.spaceship.shoot:
-            projectile = sprites.Sp_Projectile()
-            projectile.spawn(self.spaceship.rect.x + c.SPACESHIP_WIDTH // 3,
-                             self.spaceship.rect.y - c.SPACESHIP_HEIGHT // 5)
-            self.spaceship_projectiles.add(projectile)
-            # reset the shoot flag
-            self.spaceship.shoot = False
+        for i, spaceship in enumerate(self.spaceships):
+            if spaceship.shoot:
+                projectile = sprites.SP_PROJECTILES.acquire()
+                projectile.spawn(spaceship.rect.x + c.SPACESHIP_WIDTH // 3,
+                                 spaceship.rect.y - c.SPACESHIP_HEIGHT // 5)
+                self.spaceship_projectiles.add(projectile)
+                self.audio.play('shoot')
+                self.telemetry.emit(telemetry.SHOT, self.tick, spaceship.rect.x, spaceship.rect.y, i)
+                # reset the shoot flag
+                spaceship.shoot = False
+
+        s.PROFILER.start('collisions')
+
+        enemy_grid = self.enemies.collision_grid()
 
         # we also need to check if the projectiles from the spaceship
         # has hit any of the enemies
         for projectile in self.spaceship_projectiles:
-            enemy_test = pg.sprite.spritecollideany(projectile, self.enemies.group)
+            enemy_test = collision.spritecollideany(projectile, self.enemies.group, enemy_grid)
             if enemy_test:
                 # kill the projectile and the spaceship
                 self.enemies.group.remove(enemy_test)
 
                 # add the SCORE
                 self.SCORE += c.KILL_SCORE
+                self.telemetry.emit(telemetry.KILL, self.tick, enemy_test.rect.x, enemy_test.rect.y, self.SCORE)
 
                 # create an explosion
-                expl = sprites.Explosion()
+                expl = sprites.EXPLOSIONS.acquire()
                 expl.set_position(enemy_test.rect.x, enemy_test.rect.y)
                 self.generic_container.add(expl)
+                self.audio.play('enemy_explosion')
 
-                self.spaceship_projectiles.remove(projectile)
+                projectile.kill()
 
         # for the player's side
         # check if any fireball has hit the spaceship
         # or if any enemies have hit the spaceship
 
+        # only the fireballs near the spaceships can hit them
+        if self.fireball_grid is not None:
+            self.fireball_grid.build(self.enemies.fireballs)
+            rects = [spaceship.rect for spaceship in self.spaceships]
+            fireballs = self.fireball_grid.query(rects[0].unionall(rects[1:]))
+        else:
+            fireballs = self.enemies.fireballs
+
         # # if so, then display an explosion, and do gameover
-        for fireball in self.enemies.fireballs:
-            fireball_collide = pg.sprite.spritecollideany(fireball, self.spaceship_sprites)
+        for fireball in fireballs:
+            fireball_collide = collision.spritecollideany(fireball, self.spaceship_sprites)
             if fireball_collide:
                 # kill the fireball
-                self.enemies.fireballs.remove(fireball_collide)
-
-                # explode the spaceship
-                expl = sprites.Explosion()
-                expl.set_position(self.spaceship.rect.x, self.spaceship.rect.y)
-                self.generic_container.add(expl)
-
-                # remove the spaceship
-                self.spaceship_sprites.remove(self.spaceship)
-
-                # lose because fireball hit spaceship
-                self.game_over = True
-
-                # get the time right now
-                self.death_update_tick = pg.time.get_ticks()
+                fireball.kill()
+                self.lose_spaceship(fireball_collide, telemetry.DEATH_FIREBALL)
 
         # if the enemy collides with the spaceship, then display an explosion and do gameover
-        enemy_collide = pg.sprite.spritecollideany(self.spaceship, self.enemies.group)
-        if enemy_collide:
-            expl = sprites.Explosion()
-            expl.set_position(self.spaceship.rect.x, self.spaceship.rect.y)
-            self.generic_container.add(expl)
-
-            # remove the spaceship
-            self.spaceship_sprites.remove(self.spaceship)
+        # (only once - a wave sitting on the spaceship would otherwise keep restarting the death period)
+        if not self.game_over:
+            for spaceship in self.spaceship_sprites.sprites():
+                if collision.spritecollideany(spaceship, self.enemies.group, enemy_grid):
+                    self.lose_spaceship(spaceship, telemetry.DEATH_COLLISION)
 
-            self.game_over = True
-
-            # get the time right now
-            self.death_update_tick = pg.time.get_ticks()
+        s.PROFILER.stop('collisions')
 
         # if there are no more enemies present on the screen then we need to create some!
         if len(self.enemies.group) == 0:
-            self.enemies = sprites.EnemyGroup(self.SCORE, self.spaceship)
+            # the last wave's fireballs disappear with it
+            for fireball in self.enemies.fireballs:
+                fireball.kill()
+            self.enemies = sprites.EnemyGroup(self.SCORE, self.spaceship, self.rng, targets=self.spaceships)
+            self.telemetry.emit(telemetry.WAVE, self.tick, self.SCORE, len(self.enemies.group),
+                                sprites.speed_step(self.SCORE))
+
+        # the score passing a speed up or homing score
+        difficulty = sprites.difficulty(self.SCORE)
+        if difficulty != self.difficulty:
+            self.difficulty = difficulty
+            self.telemetry.emit(telemetry.TIER, self.tick, self.SCORE, difficulty[0], int(difficulty[1]))
 
         # update the high score after all the logic processing
         if self.SCORE > self.HIGH_SCORE:
             self.HIGH_SCORE = self.SCORE
 
         # update states of everything
+        s.PROFILER.start('sprites')
         self.spaceship_sprites.update()
         self.spaceship_projectiles.update()
-        self.enemies.update_group()
         self.generic_container.update()
-        self.score_object.update(self.SCORE)
-        self.high_score_object.update(self.HIGH_SCORE)
+        s.PROFILER.stop('sprites')
+
+        s.PROFILER.start('enemies')
+        self.enemies.update_group()
+        s.PROFILER.stop('enemies')
+
+        if s.PROFILER.enabled:
+            s.PROFILER.count('projectiles', len(self.spaceship_projectiles))
+            s.PROFILER.count('enemies', len(self.enemies.group))
+            s.PROFILER.count('fireballs', len(self.enemies.fireballs))
+            s.PROFILER.count('explosions', len(self.generic_container))
 
 
 
 
 class SceneManager:
-    def __init__(self):
+    def __init__(self, scene=None):
         # this is only run ONCE
         # when scene manager is created
         # henceforth, scene manager is referred to in individual classes by a reference to self
         # very nice trick: self.scene.manager = self (this is like a singleton)
         # you only ever refer to this one scene manager instance
-        persist = {
-            'highscore': 0,
-            'score': 0,
-        }
-        self.go_to(StartScreen(persist))
+        # a scene can be handed in directly, e.g. a Game for headless runs
+        if scene is None:
+            persist = {
+                'highscore': 0,
+                'score': 0,
+                'player': c.PLAYER_NAME,
+            }
+            scene = StartScreen(persist)
+        self.go_to(scene)
         self.running = True
 
+        # number of simulation ticks run so far
+        self.ticks = 0
+
+        # milliseconds of game time owed to the simulation
+        self.lag = 0.0
+
+        # called with the manager at the start of every tick, before the scene updates
+        # e.g. to record or play back the player's input
+        self.tick_hooks = []
+
     def go_to(self, scene):
         self.scene = scene
         self.scene.manager = self
 
+    def step(self):
+        '''
+        runs the current scene for one simulation tick
+        '''
+        for hook in self.tick_hooks:
+            hook(self)
+        # a hook may have stopped the game
+        if not self.running:
+            return
+
+        s.PROFILER.start('update')
+        self.scene.update()
+        s.PROFILER.stop('update')
+        self.ticks += 1
+
+    def advance(self, elapsed):
+        '''
+        fixed timestep - runs as many whole ticks as fit in the time passed,
+        carrying the remainder over to the next frame
+        :param elapsed: milliseconds since the last call
+        :return: how far (0 to 1) into the next tick the frame should be drawn
+        '''
+        tick_length = 1000.0 / c.FPS
+        self.lag += elapsed
+
+        # a hair of slack, so float rounding can't hold a whole tick back a frame
+        steps = min(int((self.lag + 1e-6) // tick_length), c.MAX_STEPS_PER_FRAME)
+        for i in range(steps):
+            # only positions from just before the last tick are needed to interpolate
+            if i == steps - 1 and hasattr(self.scene, 'save_positions'):
+                self.scene.save_positions()
+            self.step()
+            self.lag -= tick_length
+
+        # too far behind - skip the rest rather than spiral
+        if self.lag >= tick_length:
+            self.lag = self.lag % tick_length
+        self.lag = max(self.lag, 0.0)
+
+        return self.lag / tick_length
+
     def quit(self):
         self.running = False
 
@@ -261,122 +499,263 @@ class SceneManager:
 
 class EndScreen(Scene):
 
+    # the background with the text that never changes drawn on, made by the first EndScreen
+    layer = None
+
     def __init__(self, persist):
         Scene.__init__(self, persist)
 
         self.game_info = persist
 
-        self.background = s.GFX['space_background']
+        if EndScreen.layer is None:
+            EndScreen.layer = self.compose()
 
-        self.txt_font_type = s.FONTS['arcade']
-        self.txt_font_object = pg.font.Font(self.txt_font_type, 50)
-        self.info_font_object = pg.font.Font(self.txt_font_type, 20)
-        self.txt_font_surface = self.txt_font_object.render("YOU   LOST", True, c.WHITE)
+        self.info_font_object = s.FONT_CACHE.get('arcade', 20)
+        self.score_surface = s.TEXT.render(self.info_font_object, "Score  {}".format(self.game_info['score']), True, c.WHITE)
+        self.highscore_surface = s.TEXT.render(self.info_font_object, "High  Score  {}".format(self.game_info['highscore']), True, c.WHITE)
 
-        self.score_surface = self.info_font_object.render("Score  {}".format(self.game_info['score']), True, c.WHITE)
-        self.highscore_surface = self.info_font_object.render("High  Score  {}".format(self.game_info['highscore']), True, c.WHITE)
-        self.txt_select_surface = self.info_font_object.render("m  to  return  to  start  q  to  quit  spacebar  to  replay", True, c.WHITE)
+        self.renderer = render.DirtyRenderer(EndScreen.layer)
+
+        # the next game is set up while this screen is showing, so replaying is instant
+        self.shown = False
+
+    def compose(self):
+        layer = s.GFX['space_background'].copy()
+        layer.blit(s.FONT_CACHE.get('arcade', 50).render("YOU   LOST", True, c.WHITE), (200, 300))
+        layer.blit(s.FONT_CACHE.get('arcade', 20).render("m  to  return  to  start  q  to  quit  spacebar  to  replay", True, c.WHITE), (55, 500))
+        return layer
 
     def update(self):
-        pass
+        # only once this screen has been drawn, the switch to it shouldn't wait on the game
+        # (and once the saved high scores are in, for the game to show)
+        if self.shown and s.SCORES.ready():
+            self.prepare_game()
 
     def handle_events(self, events):
         for event in events:
             if event.type == pg.KEYDOWN:
                 if event.key == pg.K_SPACE:
-                    self.manager.go_to(Game(self.game_info))
+                    self.manager.go_to(self.prepare_game())
                 elif event.key == pg.K_q:
                     self.manager.quit()
                 elif event.key == pg.K_m:
                     self.manager.go_to(StartScreen(self.game_info))
 
 
-    def render(self, screen):
-        screen.blit(self.background, c.ORIGIN)
-        screen.blit(self.txt_font_surface, (200, 300))
-        screen.blit(self.txt_select_surface, (55, 500))
-        screen.blit(self.score_surface, (235, 375))
-        screen.blit(self.highscore_surface, (235, 430))
+    def render(self, screen, alpha=1.0, view=None):
+        self.renderer.blit(self.score_surface, (235, 375))
+        self.renderer.blit(self.highscore_surface, (235, 430))
+        self.shown = True
+        return self.renderer.flush(screen, view)
 
 
 # Startscreen class
 
 class StartScreen(Scene):
 
+    # none of the start screen's text changes, so it is all drawn onto the background once
+    layer = None
+
     def __init__(self, persist):
         Scene.__init__(self, persist)
 
         self.game_info = persist
 
-        self.tfont_type = s.FONTS['death_star']
-        self.tfont_object = pg.font.Font(self.tfont_type, 60)
-        self.tfont_surface = self.tfont_object.render("SPACE SHOOTER", True, c.WHITE)
-
-        self.txt_font_type = s.FONTS['arcade']
-        self.txt_font_object = pg.font.Font(self.txt_font_type, 15)
-        self.txt_start_object = pg.font.Font(self.txt_font_type, 30)
-
-        self.prog_text_surface = self.txt_start_object.render(" PRESS  SPACEBAR  TO  START", True, c.WHITE)
+        if StartScreen.layer is None:
+            StartScreen.layer = self.compose()
+        self.renderer = render.DirtyRenderer(StartScreen.layer)
 
-        self.text1 = "It  is  the  year   2020  Enemy  Martians  have  descended  upon  the  Earth"
-        self.text2 = "You  are  responsible  for  defeating  these   extraterrestrials"
-        self.text4 = "Press  SPACEBAR  to  fire  an  asteroid  attack  and  destroy  their  enemy  ships"
-        self.text5 = "The  future  of  the E arth  rests  in  your  hands"
+        # the first game is set up while this screen is showing
+        self.shown = False
 
-        self.authortext = "Allen  Ma   Dec 2017  "
+    def compose(self):
+        layer = s.GFX['space_background'].copy()
 
-        self.text1s = self.txt_font_object.render(self.text1, False, c.WHITE)
-        self.text2s = self.txt_font_object.render(self.text2, False, c.WHITE)
-        self.text4s = self.txt_font_object.render(self.text4, False, c.WHITE)
-        self.text5s = self.txt_font_object.render(self.text5, False, c.WHITE)
+        tfont_object = s.FONT_CACHE.get('death_star', 60)
+        txt_font_object = s.FONT_CACHE.get('arcade', 15)
+        txt_start_object = s.FONT_CACHE.get('arcade', 30)
 
-        self.texts = [self.text1s, self.text2s, self.text4s, self.text5s]
+        layer.blit(tfont_object.render("SPACE SHOOTER", True, c.WHITE), (65, 230))
+        layer.blit(txt_start_object.render(" PRESS  SPACEBAR  TO  START", True, c.WHITE), (120, 500))
+        layer.blit(txt_font_object.render("Allen  Ma   Dec 2017  ", True, c.WHITE), (460, 660))
 
-        self.authortext_surface = self.txt_font_object.render(self.authortext, True, c.WHITE)
-
-        self.background = s.GFX['space_background']
+        texts = [
+            "It  is  the  year   2020  Enemy  Martians  have  descended  upon  the  Earth",
+            "You  are  responsible  for  defeating  these   extraterrestrials",
+            "Press  SPACEBAR  to  fire  an  asteroid  attack  and  destroy  their  enemy  ships",
+            "The  future  of  the E arth  rests  in  your  hands",
+        ]
+        for i, text in enumerate(texts):
+            layer.blit(txt_font_object.render(text, False, c.WHITE), (70, 320 + i * 30))
+        return layer
 
     def handle_events(self, events):
         for event in events:
             if event.type == pg.KEYDOWN and event.key == pg.K_SPACE:
-                self.manager.go_to(Game(self.game_info))
-
-    def render(self, screen):
-        screen.blit(self.background, c.ORIGIN)
-        screen.blit(self.tfont_surface, (65, 230))
-        screen.blit(self.prog_text_surface, (120, 500))
-        screen.blit(self.authortext_surface, (460, 660))
+                self.manager.go_to(self.prepare_game())
 
-        for i, text in enumerate(self.texts):
-            screen.blit(text, (70, 320 + i * 30))
+    def render(self, screen, alpha=1.0, view=None):
+        self.shown = True
+        return self.renderer.flush(screen, view)
 
 
     def update(self):
-        pass
+        if self.shown and s.SCORES.ready():
+            self.prepare_game()
 
 
 ## entry function of the program
-def main():
+def main(profile=c.PROFILE, tick_hooks=(), player=c.PLAYER_NAME, save_scores=True, handle_input=True):
+    '''
+    :param profile: time every frame and dump the results on exit
+    :param tick_hooks: callables run with the scene manager at the start of every tick
+    :param player: name the high scores are kept under
+    :param save_scores: load and save high scores - off for replays
+    :param handle_input: pass key presses on to the scenes - off when watching a
+    replay, where a tick hook sets every input
+    '''
 
-    screen = s.SCREEN
+    screen = s.start()
     clock = pg.time.Clock()
-    manager = SceneManager()
+
+    # saved scores are read in the background while the start screen comes up
+    if save_scores:
+        s.SCORES.start()
+
+    # every effect is decoded now, so none is ever loaded mid game
+    if c.SOUND and s.AUDIO.start():
+        s.AUDIO.play_music()
+
+    # what happens in played games is logged in the background - not replays
+    if save_scores and c.TELEMETRY:
+        s.TELEMETRY.start()
+
+    persist = {
+        'highscore': 0,
+        'score': 0,
+        'player': player,
+    }
+    manager = SceneManager(StartScreen(persist))
+    manager.tick_hooks.extend(tick_hooks)
+
+    profiler = s.PROFILER
+    profiler.enabled = profile
 
     while manager.running:
 
         if pg.event.get(pg.QUIT):
-            running = False
-            return
+            break
+
+        # a new window size needs a new viewport, and a whole frame drawn at it
+        resized = bool(pg.event.get(pg.VIDEORESIZE))
+        if resized:
+            s.fit_window()
+            screen = s.SCREEN
+
+        elapsed = clock.tick(c.RENDER_FPS)
+        profiler.start('frame')
+
+        profiler.start('events')
+        events = pg.event.get()
+        if handle_input:
+            manager.scene.handle_events(events)
+        profiler.stop('events')
+
+        alpha = manager.advance(elapsed)
+
+        # only push the parts of the screen that changed
+        profiler.start('render')
+        if s.VIEW is None:
+            dirty = manager.scene.render(screen, alpha)
+        elif c.SCALE_SPRITES:
+            dirty = manager.scene.render(screen, alpha, s.VIEW)
+        else:
+            # render at native size, then scale what changed onto the window
+            dirty = manager.scene.render(s.CANVAS, alpha)
+            if profiler.enabled and c.PROFILER_OVERLAY:
+                overlay = profiler.draw_overlay(s.CANVAS)
+                if dirty is not None:
+                    dirty.append(overlay)
+            dirty = s.VIEW.present(s.CANVAS, screen, None if resized else dirty)
+        profiler.stop('render')
+
+        if profiler.enabled and c.PROFILER_OVERLAY and (s.VIEW is None or c.SCALE_SPRITES):
+            overlay = profiler.draw_overlay(screen)
+            if dirty is not None:
+                dirty.append(overlay)
+
+        profiler.start('display')
+        if dirty is None or resized:
+            pg.display.update()
+        else:
+            pg.display.update(dirty)
+        profiler.stop('display')
+
+        profiler.stop('frame')
+        profiler.end_frame()
+
+    if profiler.enabled:
+        profiler.dump(c.PROFILE_OUTPUT)
+    # let the last games finish saving
+    s.SCORES.close()
+    s.TELEMETRY.close()
+    s.AUDIO.stop()
+    pg.quit()
 
-        clock.tick(c.FPS)
 
-        manager.scene.handle_events(pg.event.get())
-        manager.scene.update()
-        manager.scene.render(screen)
-        pg.display.update()
+## runs the game simulation with no window at all
+## no frame cap, no rendering and no display updates - just Game.update
+## as fast as the CPU allows. handy for balance testing and regression checks
+def run_headless(ticks, persist=None):
+    '''
+    :param ticks: maximum number of simulation ticks to run
+    :param persist: starting game info, defaults to a fresh game
+    give it a 'seed' to make the run repeatable
+    :return: the scene manager, so the final state can be inspected
+    stops early once the game is over
+    '''
+    s.start_headless()
 
-    pg.quit()
+    if persist is None:
+        persist = {
+            'highscore': 0,
+            'score': 0,
+        }
+    manager = SceneManager(Game(persist))
+
+    for _ in range(ticks):
+        if not manager.running or not isinstance(manager.scene, Game):
+            break
+        manager.step()
+
+    return manager
+
+
+## save states - Game.snapshot as bytes and back
+def dump_snapshot(snapshot):
+    return zlib.compress(pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL), 1)
+
+
+def load_snapshot(data):
+    return pickle.loads(zlib.decompress(data))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python invaders.py --headless 10000
+    if len(sys.argv) > 1 and sys.argv[1] == "--headless":
+        ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+        start = time.perf_counter()
+        manager = run_headless(ticks)
+        elapsed = time.perf_counter() - start
+        print("{} ticks in {:.3f}s ({:.0f} ticks/sec)".format(
+            manager.ticks, elapsed, manager.ticks / elapsed))
+    else:
+        # python invaders.py [--profile] [--player NAME] [--window 1200x1400] [--fullscreen] [--smooth]
+        player = c.PLAYER_NAME
+        if "--player" in sys.argv and sys.argv.index("--player") + 1 < len(sys.argv):
+            player = sys.argv[sys.argv.index("--player") + 1]
+        if "--window" in sys.argv and sys.argv.index("--window") + 1 < len(sys.argv):
+            c.WINDOW_SIZE = tuple(int(n) for n in sys.argv[sys.argv.index("--window") + 1].split("x"))
+        c.FULLSCREEN = c.FULLSCREEN or "--fullscreen" in sys.argv
+        c.SMOOTH_SCALING = c.SMOOTH_SCALING or "--smooth" in sys.argv
+        main(profile=c.PROFILE or "--profile" in sys.argv, player=player)
\ No newline at end of file
@@ -1,26 +1,37 @@
 ## Classes for scores and high score and what not that updates in game ##
 
 import constants as c
-import pygame as pg
 import setup as s
 
 class Score:
 
+    label = "Score: "
+
     def __init__(self, font_size, x, y):
 
-        self.font_type = s.FONTS['zerovelo']
-        self.font = pg.font.Font(self.font_type, font_size)
-        self.font_surface = self.font.render("Score: 0", True, c.WHITE)
+        self.font = s.FONT_CACHE.get('zerovelo', font_size)
         self.x = x
         self.y = y
 
+        self.score = None
+        self.update(0)
+
     def update(self, score):
         '''
         :param score: integer score
         :return: Nothing
-        updates self.font to the
+        updates self.font_surface to show the score - only when it has changed
         '''
-        self.font_surface = self.font.render("Score: " + str(score), True, c.WHITE)
+        if score == self.score:
+            return
+        self.score = score
+
+        if c.SCORE_GLYPH_STRIP:
+            label = s.TEXT.render(self.font, self.label, True, c.WHITE)
+            digits = s.TEXT.glyphs(self.font, True, c.WHITE)
+            self.font_surface = digits.render(str(score), prefix=label)
+        else:
+            self.font_surface = s.TEXT.render(self.font, self.label + str(score), True, c.WHITE)
 
     def draw(self, surface):
         surface.blit(self.font_surface, (self.x, self.y))
@@ -28,8 +39,7 @@ class Score:
 
 class HighScore(Score):
 
+    label = "High Score: "
+
     def __init__(self, font_size, x, y):
         Score.__init__(self, font_size, x, y)
-
-    def update(self, score):
-        self.font_surface = self.font.render("High Score: " + str(score), True, c.WHITE)
\ No newline at end of file
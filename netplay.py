@@ -0,0 +1,818 @@
+## Networked co-op ##
+
+## two players, two spaceships, one enemy wave, over UDP. the game only runs
+## on the server - clients send the keys they are holding and get back what is
+## on screen, so there is only ever one version of what happened. the server
+## keeps its own clock and never opens a window
+
+## python netplay.py server [--port 47900]                host a game
+## python netplay.py client [--server HOST:PORT]          join one, in a window
+## python netplay.py test [--latency 0.05 --loss 0.1]     a server and two scripted
+##                                                        clients over localhost, checked
+
+## Protocol ##
+
+## every packet starts with its type byte
+##   HELLO    client -> server   asking for a spaceship                   ('<BI' type, client token)
+##   WELCOME  server -> client   the spaceship it got, FULL_SLOT if none   ('<BIB' type, token, slot)
+##   INPUT    client -> server   every tick   ('<BIIBI' type, sequence number, newest state tick
+##                               the client has, keys held, times shoot has been pressed)
+##   STATE    server -> client   what is on screen, every c.NET_STATE_INTERVAL ticks
+##   BYE      client -> server   leaving                                  ('<BI' type, client token)
+## nothing is ever resent. inputs say what is held rather than what changed,
+## so a lost one is made up for by the next - and presses are counted, so a
+## shot isn't lost along with the packet it was in
+
+## a state is every sprite on screen as id -> (kind, x, y, frame), with the
+## positions in steps of c.NET_POSITION_QUANTUM. it is sent as the difference
+## from the newest state the client has acked: the ids that are gone, then only
+## the sprites that are new or changed. a sprite that moved is its id and a byte
+## per axis, one that didn't move costs nothing. a client whose ack is no longer
+## in the server's last c.NET_STATE_HISTORY states gets a full state instead
+
+import argparse
+import heapq
+import random
+import select
+import socket
+import struct
+import sys
+import time
+import zlib
+
+import pygame as pg
+import constants as c
+import setup as s
+import invaders
+import render
+import invaders_info as info
+
+
+HELLO = 1
+WELCOME = 2
+INPUT = 3
+STATE = 4
+BYE = 5
+
+HELLO_PACKET = struct.Struct('<BI')
+WELCOME_PACKET = struct.Struct('<BIB')
+INPUT_PACKET = struct.Struct('<BIIBI')
+# type, tick, baseline tick (0 for a full state), score, high score, flags,
+# then how many ids were removed and how many sprites follow
+STATE_HEADER = struct.Struct('<BIIIIBHH')
+REMOVED = struct.Struct('<H')
+# id, then FULL | kind or MOVE
+ENTITY = struct.Struct('<HB')
+FULL_BODY = struct.Struct('<hhB')
+MOVE_BODY = struct.Struct('<bb')
+
+FULL = 0x80
+MOVE = 0x40
+KIND_MASK = 0x0f
+
+# state flags
+GAME_OVER = 1
+# everything after the header is zlib compressed
+COMPRESSED = 2
+
+# welcome slot when every spaceship is taken
+FULL_SLOT = 255
+
+# the keys in INPUT, as in replays
+LEFT = 1
+RIGHT = 2
+
+# sprite kinds, in the order they are drawn. a spaceship's frame is its slot
+SHIP = 0
+PROJECTILE = 1
+ENEMY = 2
+FIREBALL = 3
+EXPLOSION = 4
+
+IMAGES = {
+    SHIP: 'ufo',
+    PROJECTILE: 'asteroid',
+    ENEMY: 'enemy',
+    FIREBALL: 'fireball',
+}
+
+# states smaller than this aren't worth compressing
+COMPRESS_OVER = 128
+
+
+## States ##
+
+def quantize(value):
+    return value // c.NET_POSITION_QUANTUM
+
+
+def encode_state(tick, state, status, baseline_tick=0, baseline=None):
+    '''
+    :param state: id -> (kind, x, y, frame) of every sprite
+    :param status: (score, high score, game over)
+    :param baseline: the state sent at baseline_tick the client has, None for a full state
+    :return: the STATE packet
+    '''
+    if baseline is None:
+        baseline_tick = 0
+        baseline = {}
+
+    body = bytearray()
+    removed = [id for id in baseline if id not in state]
+    for id in removed:
+        body += REMOVED.pack(id)
+
+    changed = 0
+    for id, entity in state.items():
+        old = baseline.get(id)
+        if old == entity:
+            continue
+        changed += 1
+        if old is not None and old[0] == entity[0] and old[3] == entity[3]:
+            dx = entity[1] - old[1]
+            dy = entity[2] - old[2]
+            if -128 <= dx <= 127 and -128 <= dy <= 127:
+                body += ENTITY.pack(id, MOVE)
+                body += MOVE_BODY.pack(dx, dy)
+                continue
+        body += ENTITY.pack(id, FULL | entity[0])
+        body += FULL_BODY.pack(entity[1], entity[2], entity[3])
+
+    score, high_score, game_over = status
+    flags = GAME_OVER if game_over else 0
+    if len(body) > COMPRESS_OVER:
+        compressed = zlib.compress(bytes(body), 1)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= COMPRESSED
+
+    return STATE_HEADER.pack(STATE, tick, baseline_tick, score, high_score, flags,
+                             len(removed), changed) + bytes(body)
+
+
+def decode_state(data, baselines):
+    '''
+    :param data: a STATE packet
+    :param baselines: tick -> state of the states the client has
+    :return: tick, state, status - None if the packet's baseline isn't in baselines
+    '''
+    _, tick, baseline_tick, score, high_score, flags, removed, changed = STATE_HEADER.unpack_from(data)
+    body = data[STATE_HEADER.size:]
+    if flags & COMPRESSED:
+        body = zlib.decompress(body)
+
+    if baseline_tick:
+        baseline = baselines.get(baseline_tick)
+        if baseline is None:
+            return None
+        state = dict(baseline)
+    else:
+        state = {}
+
+    offset = 0
+    for _ in range(removed):
+        state.pop(REMOVED.unpack_from(body, offset)[0], None)
+        offset += REMOVED.size
+    for _ in range(changed):
+        id, op = ENTITY.unpack_from(body, offset)
+        offset += ENTITY.size
+        if op & FULL:
+            x, y, frame = FULL_BODY.unpack_from(body, offset)
+            offset += FULL_BODY.size
+            state[id] = (op & KIND_MASK, x, y, frame)
+        else:
+            dx, dy = MOVE_BODY.unpack_from(body, offset)
+            offset += MOVE_BODY.size
+            kind, x, y, frame = state[id]
+            state[id] = (kind, x + dx, y + dy, frame)
+
+    return tick, state, (score, high_score, bool(flags & GAME_OVER))
+
+
+## Network conditions ##
+
+class Link:
+
+    ''' sends packets for one end - straight away, unless it has been given
+    latency, jitter or loss to stand in for a bad connection. then each packet
+    is held back latency +- jitter seconds (so they can arrive out of order)
+    or dropped. only ever delays outgoing packets, so a link at each end makes
+    a round trip of twice the latency
+    '''
+
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+
+        # (due, order, socket, data, address) of packets held back
+        self.queue = []
+        self.order = 0
+
+        self.sent = 0
+        self.dropped = 0
+        self.bytes = 0
+
+    def send(self, sock, data, address):
+        self.sent += 1
+        self.bytes += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+
+        delay = self.latency
+        if self.jitter:
+            delay += self.jitter * (2 * self.rng.random() - 1)
+        if delay <= 0:
+            sendto(sock, data, address)
+            return
+        heapq.heappush(self.queue, (time.perf_counter() + delay, self.order, sock, data, address))
+        self.order += 1
+
+    def flush(self, now):
+        ''' sends the held back packets that are due '''
+        while self.queue and self.queue[0][0] <= now:
+            _, _, sock, data, address = heapq.heappop(self.queue)
+            sendto(sock, data, address)
+
+    def next_due(self):
+        return self.queue[0][0] if self.queue else None
+
+
+def sendto(sock, data, address):
+    try:
+        sock.sendto(data, address)
+    except OSError:
+        # the other end has gone - it gets timed out
+        pass
+
+
+def receive(sock):
+    '''
+    :return: (data, address) of every packet waiting on a non-blocking socket
+    '''
+    packets = []
+    while True:
+        try:
+            packets.append(sock.recvfrom(65536))
+        except (BlockingIOError, InterruptedError):
+            return packets
+        except ConnectionError:
+            # a port unreachable from a client that has gone
+            continue
+
+
+## Server ##
+
+class Connection:
+
+    ''' a client the server has given a spaceship to '''
+
+    def __init__(self, address, token, slot, now):
+        self.address = address
+        self.token = token
+        self.slot = slot
+        self.last_heard = now
+
+        self.sequence = 0
+        self.keys = 0
+        self.presses = 0
+        # a press arrived that hasn't been tried yet
+        self.shoot = False
+        # the game tick of its last shot, the firing cooldown is per spaceship
+        self.last_shot_tick = -c.FIRING_COOLDOWN
+        # the newest state it has - deltas are sent against it
+        self.ack = 0
+
+
+class Server:
+
+    ''' runs co-op games back to back for whoever is connected
+
+    spaceships nobody is flying just sit there. when the game is over the
+    next one starts straight away, keeping the high score
+    '''
+
+    def __init__(self, host='127.0.0.1', port=c.NET_PORT, players=2, seed=None, link=None):
+        '''
+        :param port: 0 for any free port - see address
+        :param seed: seeds every game the server plays, in turn
+        :param link: sends the server's packets, defaults to straight away
+        '''
+        s.start_headless()
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.setblocking(False)
+        self.address = self.socket.getsockname()
+        self.link = link or Link()
+
+        self.players = players
+        self.seeds = random.Random(seed)
+        self.high_score = 0
+        # address -> Connection
+        self.connections = {}
+        self.running = True
+
+        # ticks since the server started - states are numbered by these, across games
+        self.tick = 0
+        # tick -> state of the last c.NET_STATE_HISTORY states sent, oldest first
+        self.states = {}
+        # sprite -> id of every sprite in the last state
+        self.ids = {}
+        self.next_id = 1
+
+        self.states_sent = 0
+        self.full_states = 0
+        self.state_bytes = 0
+
+        self.new_game()
+
+    def new_game(self):
+        persist = {
+            'highscore': self.high_score,
+            'score': 0,
+            'seed': self.seeds.getrandbits(32),
+            'players': self.players,
+        }
+        self.game = invaders.Game(persist)
+        self.manager = invaders.SceneManager(self.game)
+        for connection in self.connections.values():
+            connection.last_shot_tick = -c.FIRING_COOLDOWN
+
+    ## Packets ##
+
+    def handle(self, data, address, now):
+        if not data:
+            return
+        kind = data[0]
+        connection = self.connections.get(address)
+
+        if kind == INPUT and len(data) == INPUT_PACKET.size:
+            if connection is None:
+                return
+            _, sequence, ack, keys, presses = INPUT_PACKET.unpack(data)
+            # an old input that arrived late says nothing new
+            if sequence <= connection.sequence:
+                return
+            connection.sequence = sequence
+            connection.last_heard = now
+            connection.keys = keys
+            if presses != connection.presses:
+                connection.presses = presses
+                connection.shoot = True
+            if ack > connection.ack:
+                connection.ack = ack
+
+        elif kind == HELLO and len(data) == HELLO_PACKET.size:
+            _, token = HELLO_PACKET.unpack(data)
+            if connection is None or connection.token != token:
+                slot = self.free_slot()
+                if slot is None:
+                    self.link.send(self.socket, WELCOME_PACKET.pack(WELCOME, token, FULL_SLOT), address)
+                    return
+                connection = Connection(address, token, slot, now)
+                self.connections[address] = connection
+            # the welcome may have been lost, so every hello gets one
+            connection.last_heard = now
+            self.link.send(self.socket, WELCOME_PACKET.pack(WELCOME, token, connection.slot), address)
+
+        elif kind == BYE and len(data) == HELLO_PACKET.size:
+            if connection is not None and HELLO_PACKET.unpack(data)[1] == connection.token:
+                self.drop(connection)
+
+    def free_slot(self):
+        taken = set(connection.slot for connection in self.connections.values())
+        for slot in range(self.players):
+            if slot not in taken:
+                return slot
+        return None
+
+    def drop(self, connection):
+        del self.connections[connection.address]
+        spaceship = self.game.spaceships[connection.slot]
+        spaceship.left_key_detected = spaceship.right_key_detected = False
+
+    ## Simulation ##
+
+    def apply_inputs(self):
+        game = self.game
+        for connection in self.connections.values():
+            spaceship = game.spaceships[connection.slot]
+            spaceship.left_key_detected = bool(connection.keys & LEFT)
+            spaceship.right_key_detected = bool(connection.keys & RIGHT)
+            # like the spacebar, a press during the cooldown is ignored
+            if connection.shoot:
+                connection.shoot = False
+                if spaceship.alive() and game.tick - connection.last_shot_tick >= c.FIRING_COOLDOWN:
+                    connection.last_shot_tick = game.tick
+                    spaceship.shoot = True
+
+    def step(self):
+        ''' one tick of the game, then the state if one is due '''
+        # a lost game is started again here, on the tick Game.update would go
+        # to the end screen - the server has no screen to build it on
+        game = self.game
+        if game.game_over and game.tick + 1 - game.death_tick >= c.DEATH_PERIOD:
+            self.new_game()
+
+        self.apply_inputs()
+        self.manager.step()
+        self.tick += 1
+        self.high_score = max(self.high_score, self.game.HIGH_SCORE)
+
+        if self.tick % c.NET_STATE_INTERVAL == 0:
+            self.send_states()
+
+    def capture(self):
+        '''
+        :return: id -> (kind, x, y, frame) of every sprite in the game
+        '''
+        game = self.game
+        state = {}
+        ids = {}
+        in_use = set(self.ids.values())
+
+        def add(sprite, kind, frame=0):
+            id = self.ids.get(sprite)
+            if id is None:
+                id = self.new_id(state, in_use)
+            ids[sprite] = id
+            state[id] = (kind, quantize(sprite.rect.x), quantize(sprite.rect.y), frame)
+
+        for slot, spaceship in enumerate(game.spaceships):
+            if spaceship.alive():
+                add(spaceship, SHIP, slot)
+        for projectile in game.spaceship_projectiles:
+            add(projectile, PROJECTILE)
+        for enemy in game.enemies.group:
+            add(enemy, ENEMY)
+        for fireball in game.enemies.fireballs:
+            add(fireball, FIREBALL)
+        for explosion in game.generic_container:
+            add(explosion, EXPLOSION, explosion.frame)
+
+        self.ids = ids
+        return state
+
+    def new_id(self, state, in_use):
+        # ids go round, skipping any still in use
+        while True:
+            id = self.next_id
+            self.next_id = self.next_id % 0xffff + 1
+            if id not in state and id not in in_use:
+                return id
+
+    def send_states(self):
+        state = self.capture()
+        self.states[self.tick] = state
+        if len(self.states) > c.NET_STATE_HISTORY:
+            del self.states[next(iter(self.states))]
+
+        status = (self.game.SCORE, self.high_score, self.game.game_over)
+        for connection in self.connections.values():
+            baseline = self.states.get(connection.ack)
+            packet = encode_state(self.tick, state, status, connection.ack, baseline)
+            self.link.send(self.socket, packet, connection.address)
+
+            self.states_sent += 1
+            self.full_states += baseline is None
+            self.state_bytes += len(packet)
+
+    ## Running ##
+
+    def update(self, now, next_tick):
+        '''
+        takes in packets, runs the ticks that are due and sends what is due
+        :return: when the next tick is due
+        '''
+        for data, address in receive(self.socket):
+            self.handle(data, address, now)
+
+        for connection in list(self.connections.values()):
+            if now - connection.last_heard > c.NET_TIMEOUT:
+                self.drop(connection)
+
+        tick_length = 1.0 / c.FPS
+        steps = 0
+        while now >= next_tick and steps < c.MAX_STEPS_PER_FRAME:
+            self.step()
+            next_tick += tick_length
+            steps += 1
+        # too far behind - skip the rest rather than spiral
+        if now - next_tick > tick_length:
+            next_tick = now
+
+        self.link.flush(now)
+        return next_tick
+
+    def run(self, seconds=None):
+        ''' serves games at c.FPS ticks a second, forever or for seconds '''
+        start = next_tick = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            if seconds is not None and now - start >= seconds:
+                break
+            next_tick = self.update(now, next_tick)
+
+            # sleep until the next tick, a held back packet or a packet coming in
+            wake = next_tick
+            if self.link.next_due() is not None:
+                wake = min(wake, self.link.next_due())
+            select.select([self.socket], [], [], max(0.0, wake - time.perf_counter()))
+
+    def close(self):
+        self.socket.close()
+
+
+## Client ##
+
+class Client:
+
+    ''' one player's end - sends what they are pressing, keeps the newest state
+
+    state, status and tick are the newest state received. states keeps the
+    last c.NET_STATE_HISTORY of them, for decoding deltas against
+    '''
+
+    def __init__(self, server=('127.0.0.1', c.NET_PORT), link=None):
+        # packets are matched on the address they come from, so no host names
+        self.server = (socket.gethostbyname(server[0]), server[1])
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('', 0))
+        self.socket.setblocking(False)
+        self.link = link or Link()
+
+        self.token = random.getrandbits(32)
+        # the spaceship flown, None until welcomed, FULL_SLOT if the server is full
+        self.slot = None
+        self.last_hello = None
+        self.next_input = 0.0
+
+        self.sequence = 0
+        self.keys = 0
+        self.presses = 0
+
+        self.tick = 0
+        self.state = {}
+        self.status = (0, 0, False)
+        self.states = {}
+
+        self.received = 0
+        self.undecodable = 0
+
+    def set_keys(self, left, right):
+        self.keys = left * LEFT | right * RIGHT
+
+    def press_shoot(self):
+        self.presses = (self.presses + 1) & 0xffffffff
+
+    def handle(self, data):
+        if not data:
+            return
+        if data[0] == STATE and self.slot is not None:
+            self.received += 1
+            decoded = decode_state(data, self.states)
+            if decoded is None:
+                # its baseline has already been dropped - the server will move on to a newer one
+                self.undecodable += 1
+                return
+            tick, state, status = decoded
+            self.states[tick] = state
+            if len(self.states) > c.NET_STATE_HISTORY:
+                del self.states[min(self.states)]
+            # an old state arriving late is kept as a baseline, but not shown
+            if tick > self.tick:
+                self.tick = tick
+                self.state = state
+                self.status = status
+
+        elif data[0] == WELCOME and len(data) == WELCOME_PACKET.size:
+            _, token, slot = WELCOME_PACKET.unpack(data)
+            if token == self.token and self.slot is None:
+                self.slot = slot
+
+    def update(self, now):
+        '''
+        takes in packets, then says hello until welcomed and sends input once a tick after
+        '''
+        for data, address in receive(self.socket):
+            if address == self.server:
+                self.handle(data)
+
+        if self.slot is None:
+            if self.last_hello is None or now - self.last_hello >= 0.25:
+                self.last_hello = now
+                self.link.send(self.socket, HELLO_PACKET.pack(HELLO, self.token), self.server)
+        elif self.slot != FULL_SLOT and now >= self.next_input:
+            self.next_input = max(self.next_input + 1.0 / c.FPS, now - 1.0 / c.FPS)
+            self.sequence += 1
+            self.link.send(self.socket, INPUT_PACKET.pack(INPUT, self.sequence, self.tick, self.keys, self.presses),
+                           self.server)
+
+        self.link.flush(now)
+
+    def close(self):
+        if self.slot is not None and self.slot != FULL_SLOT:
+            sendto(self.socket, HELLO_PACKET.pack(BYE, self.token), self.server)
+        self.socket.close()
+
+
+class StateView:
+
+    ''' draws the states a client receives, the way Game draws itself '''
+
+    def __init__(self):
+        self.renderer = render.DirtyRenderer(s.GFX['space_background'])
+        self.score_object = info.Score(c.SCORE_FONT_SIZE, c.SCORE_LOCATIONX, c.SCORE_LOCATIONY)
+        self.high_score_object = info.HighScore(c.SCORE_FONT_SIZE, c.HIGHSCORE_LOCATIONX, c.HIGHSCORE_LOCATIONY)
+
+    def image(self, kind, frame):
+        if kind == EXPLOSION:
+            return s.GFX["explosion{}".format(frame)]
+        return s.GFX[IMAGES[kind]]
+
+    def render(self, surface, state, status, view=None):
+        for kind, x, y, frame in sorted(state.values()):
+            self.renderer.blit(self.image(kind, frame),
+                               (x * c.NET_POSITION_QUANTUM, y * c.NET_POSITION_QUANTUM))
+        self.score_object.update(status[0])
+        self.high_score_object.update(status[1])
+        self.score_object.draw(self.renderer)
+        self.high_score_object.draw(self.renderer)
+        return self.renderer.flush(surface, view)
+
+
+def play(server):
+    ''' joins a server and plays in a window - arrows to move, space to shoot '''
+    screen = s.start()
+    clock = pg.time.Clock()
+    client = Client(server)
+    view = StateView()
+    left = right = False
+
+    try:
+        while True:
+            if pg.event.get(pg.QUIT):
+                break
+            resized = bool(pg.event.get(pg.VIDEORESIZE))
+            if resized:
+                s.fit_window()
+                screen = s.SCREEN
+            clock.tick(c.RENDER_FPS)
+
+            for event in pg.event.get((pg.KEYDOWN, pg.KEYUP)):
+                down = event.type == pg.KEYDOWN
+                if event.key == pg.K_LEFT:
+                    left = down
+                elif event.key == pg.K_RIGHT:
+                    right = down
+                elif event.key == pg.K_SPACE and down:
+                    client.press_shoot()
+                elif event.key == pg.K_ESCAPE:
+                    return
+            client.set_keys(left, right)
+            client.update(time.perf_counter())
+            if client.slot == FULL_SLOT:
+                print("{}:{} is full".format(*server))
+                return
+
+            if s.VIEW is None:
+                dirty = view.render(screen, client.state, client.status)
+            elif c.SCALE_SPRITES:
+                dirty = view.render(screen, client.state, client.status, s.VIEW)
+            else:
+                dirty = s.VIEW.present(s.CANVAS, screen, view.render(s.CANVAS, client.state, client.status))
+            if dirty is None or resized:
+                pg.display.update()
+            else:
+                pg.display.update(dirty)
+    finally:
+        client.close()
+        pg.quit()
+
+
+## Test harness ##
+
+def bot(client, rng):
+    # change direction now and then, shoot a lot
+    if rng.random() < 0.02:
+        direction = rng.randrange(3)
+        client.set_keys(direction == 1, direction == 2)
+    if rng.random() < 0.05:
+        client.press_shoot()
+
+
+def test(seconds=10.0, latency=0.0, jitter=0.0, loss=0.0, fireballs=0, seed=0):
+    '''
+    a server and two scripted clients over localhost, each end sending through
+    a Link with the given conditions. every state a client decodes is checked
+    against the one the server captured
+    :param fireballs: keep at least this many fireballs on screen, to see what bandwidth they take
+    :return: dict of figures - mismatches should always be 0
+    '''
+    from bench import top_up_fireballs
+
+    server = Server(port=0, seed=seed, link=Link(latency, jitter, loss, seed))
+    clients = [Client(server.address, Link(latency, jitter, loss, seed + 1 + i)) for i in range(server.players)]
+    rngs = [random.Random(seed + 1 + i) for i in range(server.players)]
+
+    # every state the server sent, by tick - the server itself only keeps the last few
+    truth = {}
+    shown = [0] * len(clients)
+    checked = mismatches = 0
+    most_sprites = 0
+
+    start = next_tick = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        if now - start >= seconds:
+            break
+        if fireballs:
+            top_up_fireballs(server.game, fireballs)
+        next_tick = server.update(now, next_tick)
+        truth.update(server.states)
+
+        for i, client in enumerate(clients):
+            bot(client, rngs[i])
+            client.update(now)
+            if client.tick != shown[i]:
+                shown[i] = client.tick
+                checked += 1
+                mismatches += client.state != truth[client.tick]
+                most_sprites = max(most_sprites, len(client.state))
+        time.sleep(0.001)
+
+    for client in clients:
+        client.close()
+    server.close()
+
+    states_sent = max(1, server.states_sent)
+    received = sum(client.received for client in clients)
+    return {
+        'seconds': seconds,
+        'ticks': server.tick,
+        'states_sent': server.states_sent,
+        'full_states': server.full_states,
+        'bytes_per_state': server.state_bytes / float(states_sent),
+        'kbps_per_client': server.state_bytes * 8 / 1000.0 / seconds / len(clients),
+        'most_sprites': most_sprites,
+        'delivered': received / float(states_sent),
+        'undecodable': sum(client.undecodable for client in clients),
+        'checked': checked,
+        'mismatches': mismatches,
+    }
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="two player co-op over UDP")
+    commands = parser.add_subparsers(dest='command')
+
+    server = commands.add_parser('server', help="host games (no window)")
+    server.add_argument('--host', default='0.0.0.0')
+    server.add_argument('--port', type=int, default=c.NET_PORT)
+    server.add_argument('--players', type=int, default=2)
+
+    client = commands.add_parser('client', help="join a game in a window")
+    client.add_argument('--server', type=parse_address, default=('127.0.0.1', c.NET_PORT), metavar="HOST:PORT")
+
+    harness = commands.add_parser('test', help="server and scripted clients over localhost")
+    harness.add_argument('--seconds', type=float, default=10.0)
+    harness.add_argument('--latency', type=float, default=0.0, help="seconds each way")
+    harness.add_argument('--jitter', type=float, default=0.0, help="seconds either side of the latency")
+    harness.add_argument('--loss', type=float, default=0.0, help="fraction of packets dropped")
+    harness.add_argument('--fireballs', type=int, default=0, help="keep at least this many on screen")
+    harness.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'server':
+        host = Server(args.host, args.port, args.players)
+        print("serving on {}:{}".format(*host.address))
+        try:
+            host.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            host.close()
+    elif args.command == 'client':
+        play(args.server)
+    elif args.command == 'test':
+        results = test(args.seconds, args.latency, args.jitter, args.loss, args.fireballs, args.seed)
+        print("{ticks} ticks, {states_sent} states sent ({full_states} full), "
+              "{bytes_per_state:.0f} bytes each, {kbps_per_client:.1f} kbit/s per client".format(**results))
+        print("{delivered:.0%} delivered, {undecodable} undecodable, up to {most_sprites} sprites".format(**results))
+        print("{checked} states checked against the server, {mismatches} mismatches".format(**results))
+        return 1 if results['mismatches'] else 0
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+## Built in pilot ##
+
+## flies the spaceship on its own - for soak testing and for an attract mode.
+## every tick it tries out plans (a move for each of the next c.PILOT_HORIZON
+## ticks) against a forward model of what is falling toward it, and flies the
+## best one: the plan that survives longest, then ends up under an enemy to shoot
+## it shoots whenever the cooldown allows
+
+## the model is a few numpy arrays rather than a copy of the game: fireballs
+## with their gravity and homing, the fireballs enemies are due to drop in the
+## next few ticks (the wave's fire schedule says when), and any enemies low
+## enough to run into. whole batches of plans are checked against it at once
+
+## thinking is held to c.PILOT_BUDGET_MS a tick. building the model and each
+## batch of plans is only started if the slowest it has taken lately still fits
+## in what is left - when not even the model fits, last tick's plan is flown on.
+## the plan flown last tick, moved on a tick, goes in with the first batch, so the
+## pilot only ever changes its mind for something better. plans that didn't fit
+## are tried first next tick
+
+## python pilot.py                         watch it play, in a window
+## python pilot.py --soak 20               20 games headless, with how much it managed to think
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import constants as c
+import setup as s
+import invaders
+from batch import fire
+from bench import percentile
+
+
+STAY, LEFT, RIGHT = 0, -1, 1
+
+# ticks a plan can change direction on
+SWITCH_TICKS = (2, 5, 10, 20)
+
+# how much the slowest recent times are trusted each tick - a slow tick makes
+# the pilot careful for a while, without one hiccup stopping it thinking for good
+ESTIMATE_DECAY = 0.95
+# steps are taken to be this much slower than the slowest recent one
+ESTIMATE_MARGIN = 1.25
+
+
+def candidate_plans(horizon):
+    '''
+    :return: (plans, horizon) int8 array of moves - hold one direction, then maybe another
+    '''
+    plans = []
+    for first in (STAY, LEFT, RIGHT):
+        plans.append([first] * horizon)
+        for switch in SWITCH_TICKS:
+            if switch >= horizon:
+                continue
+            for then in (STAY, LEFT, RIGHT):
+                if then != first:
+                    plans.append([first] * switch + [then] * (horizon - switch))
+    return np.array(plans, dtype=np.int8)
+
+
+class Model:
+
+    ''' what might hit the spaceship over the next horizon ticks, as arrays
+
+    an obstacle is a fireball on screen, one an enemy is due to drop (from
+    born ticks on) or an enemy low enough to run into. how they fall doesn't
+    depend on the plan, so every y - and the x of everything that doesn't home -
+    is worked out once for the whole horizon. only homing fireballs are moved
+    plan by plan
+    '''
+
+    def __init__(self, game, horizon):
+        self.horizon = horizon
+        ship = game.spaceship.rect
+        self.ship_x = ship.x
+        self.ship_width = ship.width
+        top = ship.y - c.PILOT_MARGIN
+        bottom = ship.bottom + c.PILOT_MARGIN
+
+        enemies = game.enemies
+        store = enemies.fireballs.store if enemies.use_store else None
+        # x, y, vx, vy, gravity, max_speed, homing, width, height, born
+        obstacles = []
+        for fireball in enemies.fireballs:
+            x, y, vy, homing, _ = fireball.snapshot(store)
+            obstacles.append((x, y, 0, vy, fireball.acceleration, c.FIREBALL_MAX_YSPEED,
+                              fireball.xmove_increment if homing else 0,
+                              fireball.rect.width, fireball.rect.height, 0))
+
+        # fireballs due in the next horizon ticks, from where their enemies will be
+        homing = c.FIREBALL_XMOVE_INCREMENT if enemies.score >= c.HOMING_SCORE else 0
+        width, height = s.GFX['fireball'].get_size()
+        danger = ship.top - 2 * c.ENEMY_HEIGHT
+        for enemy in enemies.group:
+            due = enemy.next_fireball_tick - enemies.tick
+            if 1 <= due <= horizon:
+                obstacles.append((enemy.rect.centerx + due * enemies.x_move_increment, enemy.rect.centery,
+                                  0, c.FIREBALL_YMOVE_INCREMENT, c.GRAVITY, c.FIREBALL_MAX_YSPEED,
+                                  homing, width, height, due))
+            # enemies down by the spaceship just shuffle sideways into it
+            if enemy.rect.bottom >= danger:
+                obstacles.append((enemy.rect.x, enemy.rect.y, enemies.x_move_increment, 0, 0, 0, 0,
+                                  enemy.rect.width, enemy.rect.height, 0))
+
+        x, y, vx, vy, gravity, max_speed, steer, width, height, born = \
+            np.array(obstacles, dtype=np.int64).reshape(-1, 10).T
+
+        # how many times each obstacle has moved by each tick - nothing moves before
+        # it is born, and one born on tick d makes its first move on tick d
+        ticks = np.arange(horizon + 1)[:, None]
+        moves = np.clip(ticks - np.maximum(born, 1) + 1, 0, None)
+        exists = ticks >= born
+
+        # y after m moves is y plus the first m speeds, gravity adding to each up to the limit
+        speeds = np.minimum(vy + gravity * np.arange(1, horizon + 1)[:, None], max_speed)
+        fallen = np.vstack((np.zeros((1, len(y)), dtype=np.int64), np.cumsum(speeds, axis=0)))
+        ys = y + np.take_along_axis(fallen, moves, axis=0)
+        # (horizon + 1, n) - whether each obstacle is level with the spaceship on each tick
+        level = exists & (ys < bottom) & (ys + height > top)
+
+        fixed = steer == 0
+        self.fixed_level = level[:, fixed]
+        self.fixed_left = (x + vx * moves)[:, fixed]
+        self.fixed_right = self.fixed_left + width[fixed]
+
+        homing = ~fixed
+        self.homing_level = level[:, homing]
+        self.homing_x = x[homing]
+        self.homing_step = steer[homing]
+        self.homing_moving = (moves[1:] > moves[:-1])[:, homing]
+        self.homing_width = width[homing]
+
+        # the nearest enemy to end up under
+        if enemies.group:
+            self.target = min((enemy.rect.centerx for enemy in enemies.group),
+                              key=lambda x: abs(x - ship.centerx))
+        else:
+            self.target = ship.centerx
+
+    def evaluate(self, paths):
+        '''
+        :param paths: (k, horizon + 1) x of the spaceship on each tick, one row per plan
+        :return: the tick each plan is first hit on (horizon + 1 if never), and
+        where each leaves the spaceship's centre
+        '''
+        left = (paths - c.PILOT_MARGIN)[:, :, None]
+        right = (paths + self.ship_width + c.PILOT_MARGIN)[:, :, None]
+
+        hits = ((self.fixed_left < right) & (self.fixed_right > left) & self.fixed_level).any(axis=2)
+
+        if len(self.homing_x):
+            # each tick the spaceship moves, then the fireballs step toward where it went
+            xs = np.empty(paths.shape + (len(self.homing_x),), dtype=np.int64)
+            hx = np.tile(self.homing_x, (len(paths), 1))
+            xs[:, 0] = hx
+            for k in range(1, self.horizon + 1):
+                hx += self.homing_step * np.sign(paths[:, k, None] - hx) * self.homing_moving[k - 1]
+                xs[:, k] = hx
+            hits |= ((xs < right) & (xs + self.homing_width > left) & self.homing_level).any(axis=2)
+
+        hit = np.where(hits.any(axis=1), hits.argmax(axis=1), self.horizon + 1)
+        return hit, paths[:, -1] + self.ship_width // 2
+
+
+def ship_paths(plans, x):
+    '''
+    :return: (plans, horizon + 1) x of the spaceship on each tick flying each plan from x
+    '''
+    paths = np.empty((len(plans), plans.shape[1] + 1), dtype=np.int64)
+    paths[:, 0] = x
+    steps = plans.astype(np.int64) * c.MOVE_INCREMENT
+    np.cumsum(steps, axis=1, out=paths[:, 1:])
+    paths[:, 1:] += x
+    limit = c.SCREEN_WIDTH - c.SPACESHIP_WIDTH
+    if paths.min() >= 0 and paths.max() <= limit:
+        return paths
+
+    for k in range(plans.shape[1]):
+        # the walls stop it, as in Spaceship.update
+        column = paths[:, k + 1]
+        np.add(paths[:, k], steps[:, k], out=column)
+        np.maximum(column, 0, out=column)
+        np.minimum(column, limit, out=column)
+    return paths
+
+
+class Pilot:
+
+    ''' tick hook that flies the spaceship of whatever Game is running
+
+    :param attract: start a new game whenever the scene isn't one, so it plays on its own
+    futures holds how many plans were tried on each tick, think_times how long each took
+    '''
+
+    def __init__(self, horizon=c.PILOT_HORIZON, budget_ms=c.PILOT_BUDGET_MS, attract=False):
+        self.horizon = horizon
+        self.budget = budget_ms / 1000.0
+        self.attract = attract
+
+        self.plans = candidate_plans(horizon)
+        # spaceship x -> the paths of every candidate plan from there
+        self.paths = {}
+        # the next plan to try - carries on from here next tick when the budget runs out
+        self.cursor = 0
+        # the plan being flown, moves from this tick on
+        self.plan = np.zeros(horizon, dtype=np.int8)
+        # the longest building the model and trying a batch have taken lately
+        self.setup_time = 0.0
+        self.batch_time = 0.0
+        self.game = None
+
+        self.futures = []
+        self.think_times = []
+        self.games = []
+
+    def __call__(self, manager):
+        scene = manager.scene
+        if not isinstance(scene, invaders.Game):
+            if self.attract:
+                manager.go_to(invaders.Game({'highscore': 0, 'score': 0}))
+            return
+        self.fly(scene)
+
+    def fly(self, game):
+        if game is not self.game:
+            self.finish()
+            self.game = game
+            self.plan[:] = STAY
+        if game.game_over:
+            return
+
+        move = self.think(game)
+        game.spaceship.left_key_detected = move == LEFT
+        game.spaceship.right_key_detected = move == RIGHT
+        fire(game)
+
+    def finish(self):
+        ''' adds the game being flown to games - done when the next one starts '''
+        if self.game is not None:
+            game = self.game
+            self.games.append((game.SCORE, game.death_tick if game.game_over else game.tick))
+            self.game = None
+
+    def think(self, game):
+        '''
+        builds the model, then tries plans a batch at a time - each step only
+        if it is expected to finish inside the budget
+        :return: the move to make this tick
+        '''
+        start = time.perf_counter()
+        deadline = start + self.budget
+        self.setup_time *= ESTIMATE_DECAY
+        self.batch_time *= ESTIMATE_DECAY
+
+        # last tick's plan, a tick on - flown again if nothing better fits in the budget
+        plan = np.roll(self.plan, -1)
+        plan[-1] = plan[-2]
+        best = plan
+        best_score = None
+
+        tried = 0
+        if start + self.setup_time + self.batch_time < deadline:
+            model = Model(game, self.horizon)
+            # the candidates only ever start from a few hundred places, so their paths are kept
+            x = game.spaceship.rect.x
+            paths = self.paths.get(x)
+            if paths is None:
+                paths = self.paths[x] = ship_paths(self.plans, x)
+            # last tick's plan goes in with the first batch
+            plans = plan[None, :]
+            rows = ship_paths(plans, x)
+            self.setup_time = self.estimate(self.setup_time, time.perf_counter() - start)
+
+            while tried < len(self.plans) and time.perf_counter() + self.batch_time < deadline:
+                batch_start = time.perf_counter()
+                chosen = np.arange(self.cursor, self.cursor + c.PILOT_BATCH) % len(self.plans)
+                self.cursor = (self.cursor + len(chosen)) % len(self.plans)
+                plans = np.vstack((plans, self.plans[chosen]))
+                rows = np.vstack((rows, paths[chosen]))
+
+                hit, end = model.evaluate(rows)
+                tried += len(plans)
+                scores = hit * 1000 - np.abs(end - model.target)
+                i = int(scores.argmax())
+                if best_score is None or scores[i] > best_score:
+                    best = plans[i]
+                    best_score = scores[i]
+                plans = plans[:0]
+                rows = rows[:0]
+                self.batch_time = self.estimate(self.batch_time, time.perf_counter() - batch_start)
+
+        self.plan = best.copy()
+        self.futures.append(tried)
+        self.think_times.append(time.perf_counter() - start)
+        return int(best[0])
+
+    def estimate(self, estimate, taken):
+        '''
+        :return: the new estimate of how long a step takes, given it just took taken
+        a step is never put down as taking over half the budget - one stall
+        shouldn't keep the pilot from thinking for the next few ticks
+        '''
+        return max(estimate, min(taken * ESTIMATE_MARGIN, self.budget / 2))
+
+    def report(self):
+        '''
+        :return: dict of how much thinking it got through each tick
+        '''
+        futures = self.futures or [0]
+        times = self.think_times or [0.0]
+        return {
+            'ticks': len(self.futures),
+            'futures_per_tick': sum(futures) / float(len(futures)),
+            'futures_p10': percentile(futures, 0.1),
+            'think_ms_p50': percentile(times, 0.5) * 1000,
+            'think_ms_p99': percentile(times, 0.99) * 1000,
+            'over_budget': sum(1 for t in times if t > self.budget) / float(len(times)),
+            'games': self.games,
+        }
+
+
+def soak(games, max_ticks=36000, horizon=c.PILOT_HORIZON, budget_ms=c.PILOT_BUDGET_MS, seed=0):
+    '''
+    lets the pilot play seeded games headless, one after another
+    :return: the Pilot, with every game's (score, ticks)
+    '''
+    s.start_headless()
+    pilot = Pilot(horizon, budget_ms)
+    for i in range(games):
+        game = invaders.Game({'highscore': 0, 'score': 0, 'seed': seed + i})
+        manager = invaders.SceneManager(game)
+        manager.tick_hooks.append(pilot)
+        while manager.scene is game and game.tick < max_ticks:
+            manager.step()
+    pilot.finish()
+    return pilot
+
+
+def print_report(report):
+    print("{ticks} ticks: {futures_per_tick:.1f} futures per tick (p10 {futures_p10}), "
+          "thinking p50 {think_ms_p50:.2f}ms p99 {think_ms_p99:.2f}ms, {over_budget:.1%} over budget".format(**report))
+    for score, ticks in report['games']:
+        print("  score {:>6}  {:>7.1f}s".format(score, ticks / float(c.FPS)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="the built in pilot")
+    parser.add_argument('--soak', type=int, metavar="GAMES", help="play this many games headless and report")
+    parser.add_argument('--max-ticks', type=int, default=36000, help="stop soak games still going after this long")
+    parser.add_argument('--horizon', type=int, default=c.PILOT_HORIZON, help="ticks to plan ahead")
+    parser.add_argument('--budget', type=float, default=c.PILOT_BUDGET_MS, help="milliseconds of thinking a tick")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.soak:
+        pilot = soak(args.soak, args.max_ticks, args.horizon, args.budget, args.seed)
+    else:
+        pilot = Pilot(args.horizon, args.budget, attract=True)
+        invaders.main(tick_hooks=[pilot], save_scores=False)
+        pilot.finish()
+    print_report(pilot.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
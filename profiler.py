@@ -0,0 +1,152 @@
+## Frame profiler ##
+
+## times each phase of the main loop (events, update, render, display) and
+## the subsystems inside Game.update, one row per frame in a ring buffer of
+## the last c.PROFILER_FRAMES frames. can draw an overlay with frame time
+## percentiles and sprite counts, and dump everything to csv / json on exit
+
+## every call returns straight away while the profiler is disabled, which is
+## all the cost there is when it isn't in use
+
+## python invaders.py --profile turns it on
+
+import csv
+import json
+import time
+from collections import deque
+
+import pygame as pg
+import constants as c
+
+
+class Profiler:
+
+    def __init__(self, frames=c.PROFILER_FRAMES):
+        self.enabled = False
+
+        # one dict of phase name -> milliseconds per frame, oldest first
+        self.rows = deque(maxlen=frames)
+        self.row = {}
+        self.started = {}
+
+        # latest number of sprites in each group
+        self.counts = {}
+
+        self.overlay = None
+        self.overlay_font = None
+        self.overlay_age = 0
+
+    def start(self, name):
+        if self.enabled:
+            self.started[name] = time.perf_counter()
+
+    def stop(self, name):
+        if self.enabled:
+            elapsed = (time.perf_counter() - self.started.pop(name)) * 1000.0
+            # a phase can run more than once a frame (several ticks), it all adds up
+            self.row[name] = self.row.get(name, 0.0) + elapsed
+
+    def count(self, name, number):
+        if self.enabled:
+            self.counts[name] = number
+
+    def end_frame(self):
+        if self.enabled:
+            self.rows.append(self.row)
+            self.row = {}
+
+    ## results
+
+    def phases(self):
+        names = set()
+        for row in self.rows:
+            names.update(row)
+        return sorted(names)
+
+    def percentiles(self, name, qs=(0.5, 0.95, 0.99)):
+        values = sorted(row.get(name, 0.0) for row in self.rows)
+        if not values:
+            return [0.0 for q in qs]
+        return [values[min(len(values) - 1, int(q * len(values)))] for q in qs]
+
+    def histogram(self, name, bin_ms=c.PROFILER_BIN_MS):
+        '''
+        :return: bin start (ms) -> number of frames, for the frames that ran the phase
+        '''
+        bins = {}
+        for row in self.rows:
+            if name in row:
+                start = int(row[name] // bin_ms) * bin_ms
+                bins[start] = bins.get(start, 0) + 1
+        return dict(sorted(bins.items()))
+
+    def summary(self):
+        summary = {'frames': len(self.rows), 'counts': dict(self.counts), 'phases': {}}
+        for name in self.phases():
+            p50, p95, p99 = self.percentiles(name)
+            summary['phases'][name] = {
+                'p50': p50,
+                'p95': p95,
+                'p99': p99,
+                'histogram_bin_ms': c.PROFILER_BIN_MS,
+                'histogram': self.histogram(name),
+            }
+        return summary
+
+    def dump(self, path):
+        '''
+        writes path.csv (every frame) and path.json (percentiles and histograms)
+        '''
+        names = self.phases()
+        with open(path + ".csv", 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['row'] + names)
+            for i, row in enumerate(self.rows):
+                writer.writerow([i] + ["{:.4f}".format(row.get(name, 0.0)) for name in names])
+
+        with open(path + ".json", 'w') as f:
+            json.dump(self.summary(), f, indent=1)
+
+    ## overlay
+
+    def draw_overlay(self, surface):
+        '''
+        draws the stats in the bottom left corner of surface
+        the text is only re-rendered every so often, fonts are slow
+        :return: the rect drawn over
+        '''
+        if self.overlay is None or self.overlay_age >= c.PROFILER_OVERLAY_REFRESH:
+            self.overlay = self.render_overlay()
+            self.overlay_age = 0
+        self.overlay_age += 1
+
+        rect = self.overlay.get_rect(bottomleft=(0, surface.get_height()))
+        return surface.blit(self.overlay, rect)
+
+    def render_overlay(self):
+        if self.overlay_font is None:
+            self.overlay_font = pg.font.Font(None, 18)
+
+        p50, p95, p99 = self.percentiles('frame')
+        lines = ["frame ms  p50 {:.2f}  p95 {:.2f}  p99 {:.2f}".format(p50, p95, p99)]
+        for name in self.phases():
+            if name != 'frame':
+                lines.append("{}  p50 {:.2f}  p99 {:.2f}".format(name, *self.percentiles(name, (0.5, 0.99))))
+        lines.append("  ".join("{} {}".format(name, n) for name, n in sorted(self.counts.items())))
+
+        texts = [self.overlay_font.render(line, True, c.WHITE) for line in lines]
+        width = max(text.get_width() for text in texts) + 8
+        height = sum(text.get_height() for text in texts) + 8
+
+        # never shrink - the screen under the old overlay isn't redrawn
+        if self.overlay is not None:
+            width = max(width, self.overlay.get_width())
+            height = max(height, self.overlay.get_height())
+
+        overlay = pg.Surface((width, height))
+        overlay.fill(c.BLACK)
+        y = 4
+        for text in texts:
+            overlay.blit(text, (4, y))
+            y += text.get_height()
+        return overlay
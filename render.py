@@ -0,0 +1,182 @@
+## Dirty rectangle rendering ##
+
+## scenes hand everything they draw to a DirtyRenderer instead of blitting
+## straight onto the screen. the renderer compares what is drawn this frame
+## with what was drawn last frame, and only restores the background and
+## redraws where something actually changed. the rects it returns are the
+## only parts of the display that need pushing with pg.display.update
+
+## when too much of the screen has changed it is cheaper to just redraw the
+## whole thing - see c.DIRTY_RECT_THRESHOLD. c.USE_DIRTY_RECTS = False always redraws
+
+## flushing with a Viewport (viewport.py) draws onto a bigger or smaller window -
+## all the comparing is still done at native size, only the drawing is scaled
+
+## everything a flush draws goes to pygame as one batch (see blit_all), in the
+## order it was queued - so the layers still stack the way the scene drew them
+
+import pygame as pg
+import constants as c
+
+
+# pygame-ce's blits for plain (image, dest) pairs, None on pygame
+FBLITS = getattr(pg.Surface, 'fblits', None)
+
+
+def blit_all(surface, blits):
+    '''
+    blits everything in order, as one call with c.USE_BATCHED_BLITS
+    :param blits: (image, dest) or (image, dest, area) tuples, as for Surface.blits
+    '''
+    if not c.USE_BATCHED_BLITS:
+        for blit in blits:
+            surface.blit(*blit)
+    elif FBLITS is not None and all(len(blit) == 2 for blit in blits):
+        FBLITS(surface, blits)
+    else:
+        surface.blits(blits, doreturn=False)
+
+
+class DirtyRenderer:
+
+    def __init__(self, background):
+        self.background = background
+
+        # (image, rect) pairs drawn this frame, in drawing order
+        self.items = []
+        # and the ones drawn last frame
+        self.last_items = None
+        self.last_surface = None
+        self.last_view = None
+
+    def blit(self, image, dest):
+        '''
+        queues an image to be drawn - same call as Surface.blit, so anything
+        with a draw(surface) method can draw onto the renderer
+        '''
+        self.items.append((image, image.get_rect(topleft=dest)))
+
+    def draw(self, group, previous=None, alpha=1.0):
+        '''
+        queues every sprite in group
+        :param previous: sprite -> (x, y, generation) from before the last tick, if interpolating -
+        a pooled sprite handed out again since then is drawn where it is now
+        :param alpha: how far to draw each sprite from its previous position to its current one
+        '''
+        if previous is None or alpha >= 1.0:
+            self.items.extend([(sprite.image, sprite.rect.copy()) for sprite in group])
+            return
+
+        for sprite in group:
+            rect = sprite.rect.copy()
+            old = previous.get(sprite)
+            if old is not None and old[2] == getattr(sprite, 'generation', 0):
+                dx = rect.x - old[0]
+                dy = rect.y - old[1]
+                if abs(dx) <= c.INTERPOLATION_MAX_JUMP and abs(dy) <= c.INTERPOLATION_MAX_JUMP:
+                    rect.x = old[0] + int(dx * alpha)
+                    rect.y = old[1] + int(dy * alpha)
+            self.items.append((sprite.image, rect))
+
+    def flush(self, surface, view=None):
+        '''
+        draws the queued images onto surface
+        :param view: Viewport to scale everything by, None to draw at native size
+        :return: list of rects that changed, or None if the whole surface was redrawn
+        '''
+        items = self.items
+        self.items = []
+
+        if (not c.USE_DIRTY_RECTS or self.last_items is None or surface is not self.last_surface or
+                view is not self.last_view):
+            return self.redraw(surface, items, view)
+
+        dirty = self.changed_rects(items)
+        if not dirty:
+            self.last_items = items
+            return dirty
+
+        limit = c.DIRTY_RECT_THRESHOLD * surface.get_width() * surface.get_height()
+        area = sum(rect.w * rect.h for rect in dirty)
+        if area > limit:
+            return self.redraw(surface, items, view)
+
+        # anything touching a dirty rect has to be redrawn, and everything
+        # it covers becomes dirty too - keep going until nothing new is hit.
+        # each pass only needs checking against the rects the last one added
+        redraw = [False] * len(items)
+        new = dirty
+        while new:
+            added = []
+            for i, (image, rect) in enumerate(items):
+                if not redraw[i] and rect.collidelist(new) != -1:
+                    redraw[i] = True
+                    added.append(rect)
+                    area += rect.w * rect.h
+                    # once past the threshold, give up and redraw everything
+                    if area > limit:
+                        return self.redraw(surface, items, view)
+            dirty.extend(added)
+            new = added
+
+        self.last_items = items
+
+        if view is not None:
+            return self.draw_scaled(surface, items, redraw, dirty, view)
+
+        blit_all(surface, [(self.background, rect, rect) for rect in dirty])
+        blit_all(surface, [item for item, needed in zip(items, redraw) if needed])
+        return dirty
+
+    def draw_scaled(self, surface, items, redraw, dirty, view):
+        background = view.image(self.background)
+        offset_x, offset_y = view.offset
+        dirty = [view.rect(rect).clip(view.area) for rect in dirty]
+
+        # sprites hanging off the playfield mustn't draw over the bars around it
+        clip = surface.get_clip()
+        surface.set_clip(view.area)
+        blit_all(surface, [(background, rect, rect.move(-offset_x, -offset_y)) for rect in dirty])
+        blit_all(surface, [(view.image(image), view.rect(rect))
+                           for (image, rect), needed in zip(items, redraw) if needed])
+        surface.set_clip(clip)
+        return dirty
+
+    def redraw(self, surface, items, view=None):
+        if view is None:
+            surface.blit(self.background, c.ORIGIN)
+            blit_all(surface, items)
+        else:
+            clip = surface.get_clip()
+            surface.set_clip(view.area)
+            surface.blit(view.image(self.background), view.offset)
+            blit_all(surface, [(view.image(image), view.rect(rect)) for image, rect in items])
+            surface.set_clip(clip)
+
+        self.last_items = items
+        self.last_surface = surface
+        self.last_view = view
+        return None
+
+    def changed_rects(self, items):
+        '''
+        rects of whatever appeared, moved, changed image or went away since last frame
+        '''
+        now = {}
+        for image, rect in items:
+            key = (image, tuple(rect))
+            now[key] = now.get(key, 0) + 1
+
+        before = {}
+        for image, rect in self.last_items:
+            key = (image, tuple(rect))
+            before[key] = before.get(key, 0) + 1
+
+        dirty = []
+        for key, count in now.items():
+            if before.get(key, 0) != count:
+                dirty.append(pg.Rect(key[1]))
+        for key, count in before.items():
+            if key not in now:
+                dirty.append(pg.Rect(key[1]))
+        return dirty
@@ -0,0 +1,287 @@
+## Input replays ##
+
+## records what the player pressed on every tick, so a session can be played
+## back exactly - on screen, or headless with no frame cap to get there fast.
+## every random thing in a game comes from its seed, so the seed plus the
+## input on each tick is all it takes to get the same game again
+
+## python replay.py --record session.ssr     play normally, recording every game
+## python replay.py session.ssr              play it back headless, checking the scores match
+## python replay.py session.ssr --watch      play it back on screen
+
+## File format ##
+
+## b'SSRP' and a version byte, then for every game played:
+##   seed, high score at the start, ticks, final score, data length  ('<QIIII')
+##   the inputs, zlib compressed
+## inputs are run length encoded - each run of ticks with the same keys held is
+## one varint of (run length << 3 | keys), keys being left | right << 1 | shoot << 2
+## a player holds the same keys for a long time, so an hour of play is a few kilobytes
+
+import struct
+import sys
+import time
+import zlib
+from itertools import groupby
+
+import setup as s
+import invaders
+
+
+MAGIC = b'SSRP'
+VERSION = 1
+HEADER = struct.Struct('<QIIII')
+
+LEFT = 1
+RIGHT = 2
+SHOOT = 4
+KEY_BITS = 3
+
+
+## Encoding ##
+
+def read_keys(spaceship):
+    return (spaceship.left_key_detected * LEFT | spaceship.right_key_detected * RIGHT |
+            spaceship.shoot * SHOOT)
+
+
+def apply_keys(spaceship, keys):
+    spaceship.left_key_detected = bool(keys & LEFT)
+    spaceship.right_key_detected = bool(keys & RIGHT)
+    spaceship.shoot = bool(keys & SHOOT)
+
+
+def encode(inputs):
+    '''
+    :param inputs: the keys held on each tick
+    :return: the run length encoded inputs, compressed
+    '''
+    data = bytearray()
+    for keys, run in groupby(inputs):
+        value = sum(1 for _ in run) << KEY_BITS | keys
+        # varint - 7 bits at a time, the top bit set while there is more to come
+        while value >= 0x80:
+            data.append(value & 0x7f | 0x80)
+            value >>= 7
+        data.append(value)
+    return zlib.compress(bytes(data), 9)
+
+
+def decode(data):
+    '''
+    :param data: inputs as written by encode
+    :return: the keys held on each tick
+    '''
+    inputs = bytearray()
+    value = shift = 0
+    for byte in zlib.decompress(data):
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte & 0x80:
+            continue
+        inputs.extend(bytes((value & (1 << KEY_BITS) - 1,)) * (value >> KEY_BITS))
+        value = shift = 0
+    return inputs
+
+
+class Recording:
+
+    ''' one recorded game - enough to play it again, and what it should come to '''
+
+    def __init__(self, seed, highscore, inputs, score=0):
+        self.seed = seed
+        self.highscore = highscore
+        self.inputs = inputs
+        self.score = score
+
+    @property
+    def ticks(self):
+        return len(self.inputs)
+
+    def persist(self):
+        return {
+            'highscore': self.highscore,
+            'score': 0,
+            'seed': self.seed,
+        }
+
+
+def write_recording(file, recording):
+    data = encode(recording.inputs)
+    file.write(HEADER.pack(recording.seed, recording.highscore, recording.ticks,
+                           recording.score, len(data)))
+    file.write(data)
+
+
+def load(path):
+    '''
+    :param path: a file written by Recorder
+    :return: list of Recordings, one per game
+    '''
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a replay file".format(path))
+        version = file.read(1)[0]
+        if version != VERSION:
+            raise ValueError("{} is replay version {}, expected {}".format(path, version, VERSION))
+
+        recordings = []
+        while True:
+            header = file.read(HEADER.size)
+            if not header:
+                break
+            seed, highscore, ticks, score, length = HEADER.unpack(header)
+            inputs = decode(file.read(length))
+            if len(inputs) != ticks:
+                raise ValueError("{} is damaged - a game should have {} ticks, has {}".format(
+                    path, ticks, len(inputs)))
+            recordings.append(Recording(seed, highscore, inputs, score))
+    return recordings
+
+
+## Recording ##
+
+class Recorder:
+
+    ''' tick hook that writes every game played to a replay file
+
+    each game is written out as soon as it ends, so a crash loses at most the one being played
+    '''
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + bytes((VERSION,)))
+        self.game = None
+        self.recording = None
+
+    def __call__(self, manager):
+        scene = manager.scene
+        if scene is not self.game:
+            self.finish()
+            if isinstance(scene, invaders.Game):
+                self.game = scene
+                self.recording = Recording(scene.seed, scene.HIGH_SCORE, bytearray())
+        if self.game is not None:
+            self.recording.inputs.append(read_keys(self.game.spaceship))
+
+    def finish(self):
+        if self.game is None:
+            return
+        self.recording.score = self.game.SCORE
+        write_recording(self.file, self.recording)
+        self.file.flush()
+        self.game = None
+        self.recording = None
+
+    def close(self):
+        self.finish()
+        self.file.close()
+
+
+## Playback ##
+
+class Player:
+
+    ''' tick hook that plays recorded games one after another, then stops
+
+    each game is checked against its recording as it finishes - results
+    holds (recording, score, ticks) for every game played
+    '''
+
+    def __init__(self, recordings):
+        self.recordings = list(recordings)
+        self.index = -1
+        self.game = None
+        self.position = 0
+        self.results = []
+
+    def next_game(self):
+        '''
+        :return: a Game set up as the next recording started, None when there are no more
+        '''
+        if self.game is not None:
+            self.results.append((self.recordings[self.index], self.game.SCORE, self.game.tick))
+            self.game = None
+
+        self.index += 1
+        if self.index >= len(self.recordings):
+            return None
+        self.game = invaders.Game(self.recordings[self.index].persist())
+        self.position = 0
+        return self.game
+
+    def __call__(self, manager):
+        if (self.game is None or manager.scene is not self.game or
+                self.position >= self.recordings[self.index].ticks):
+            game = self.next_game()
+            if game is None:
+                manager.quit()
+                return
+            manager.go_to(game)
+
+        apply_keys(self.game.spaceship, self.recordings[self.index].inputs[self.position])
+        self.position += 1
+
+    def mismatches(self):
+        return [result for result in self.results
+                if (result[1], result[2]) != (result[0].score, result[0].ticks)]
+
+
+def play(path):
+    '''
+    plays a replay file back headless, as fast as possible
+    :return: the Player, holding the result of every game
+    '''
+    s.start_headless()
+
+    player = Player(load(path))
+    manager = invaders.SceneManager(player.next_game())
+    manager.tick_hooks.append(player)
+
+    while manager.running:
+        manager.step()
+
+    return player
+
+
+def watch(path):
+    ''' plays a replay file back on screen at normal speed - the keyboard does
+    nothing, only the recorded keys move the spaceship '''
+    player = Player(load(path))
+    invaders.main(tick_hooks=[player], save_scores=False, handle_input=False)
+    return player
+
+
+def record(path):
+    ''' plays the game normally, recording every game to path '''
+    recorder = Recorder(path)
+    try:
+        invaders.main(tick_hooks=[recorder])
+    finally:
+        recorder.close()
+
+
+def report(player, elapsed=None):
+    for recording, score, ticks in player.results:
+        status = "ok" if (score, ticks) == (recording.score, recording.ticks) else "MISMATCH"
+        print("seed {:>10}  {:>7} ticks  score {:>5} (recorded {} ticks, score {})  {}".format(
+            recording.seed, ticks, score, recording.ticks, recording.score, status))
+    if elapsed is not None:
+        ticks = sum(result[2] for result in player.results)
+        print("{} ticks in {:.3f}s ({:.0f} ticks/sec)".format(ticks, elapsed, ticks / elapsed))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python replay.py [--record] FILE [--watch]")
+        sys.exit(2)
+
+    if sys.argv[1] == "--record":
+        record(sys.argv[2] if len(sys.argv) > 2 else "session.ssr")
+    elif "--watch" in sys.argv:
+        report(watch(sys.argv[1]))
+    else:
+        start = time.perf_counter()
+        player = play(sys.argv[1])
+        report(player, time.perf_counter() - start)
+        sys.exit(1 if player.mismatches() else 0)
@@ -0,0 +1,195 @@
+## High score store ##
+
+## every finished game is kept in an sqlite database - player, score, how
+## long it lasted and its seed - so high scores and the leaderboard survive
+## restarts, and each player has a history of their runs
+
+## the database is only ever touched from a background thread. it is read
+## when the store starts, while the first frames are being drawn, and finished
+## games are queued up and written in batches - a game over never waits on the
+## disk. best scores and the leaderboard are kept in memory for the game to read
+
+## python scores.py            the leaderboard
+## python scores.py NAME       a player's best and their last runs
+
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import constants as c
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    seed INTEGER,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_player ON runs (player, score);
+CREATE INDEX IF NOT EXISTS runs_score ON runs (score);
+'''
+
+# put on the queue to stop the writer once everything before it is written
+STOP = None
+
+
+class ScoreStore:
+
+    ''' setup.SCORES - nothing is opened until start() is called, so headless
+    runs never touch the database. runs recorded before then are ignored, so
+    simulated and replayed games never turn up as anyone's high score. until
+    the database has been read the store only knows about runs recorded since
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = None
+        self.loaded = threading.Event()
+
+        # everything below is shared with the writer thread
+        self.lock = threading.Lock()
+        # player -> best score
+        self.best = {}
+        # (score, player, finished) of the best runs, highest first
+        self.top = []
+
+        self.written = 0
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.run, name="scores", daemon=True)
+        self.thread.start()
+
+    def ready(self):
+        '''
+        :return: True once the saved scores are in memory (or if they never will be)
+        '''
+        return self.thread is None or self.loaded.is_set()
+
+    def record(self, player, score, ticks, seed=None):
+        ''' saves a finished game - returns straight away, the write happens later '''
+        if self.thread is None:
+            return
+        run = (player, score, ticks, seed, time.time())
+        self.remember([run])
+        self.queue.put(run)
+
+    def remember(self, runs):
+        with self.lock:
+            for player, score, ticks, seed, finished in runs:
+                if score > self.best.get(player, 0):
+                    self.best[player] = score
+                self.top.append((score, player, finished))
+            self.top.sort(key=lambda run: (-run[0], run[2]))
+            del self.top[c.LEADERBOARD_SIZE:]
+
+    def high_score(self, player):
+        with self.lock:
+            return self.best.get(player, 0)
+
+    def leaderboard(self):
+        '''
+        :return: list of (score, player, finished) of the best runs, highest first
+        '''
+        with self.lock:
+            return list(self.top)
+
+    def close(self):
+        ''' waits for everything recorded so far to be written '''
+        if self.thread is None:
+            return
+        self.queue.put(STOP)
+        self.thread.join()
+        self.thread = None
+
+    ## Writer thread ##
+
+    def run(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.executescript(SCHEMA)
+            self.load(connection)
+            self.loaded.set()
+
+            stopping = False
+            while not stopping:
+                batch, stopping = self.next_batch()
+                if batch:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO runs (player, score, ticks, seed, finished) VALUES (?, ?, ?, ?, ?)", batch)
+                    self.written += len(batch)
+        finally:
+            self.loaded.set()
+            connection.close()
+
+    def load(self, connection):
+        best = connection.execute("SELECT player, MAX(score) FROM runs GROUP BY player").fetchall()
+        top = connection.execute("SELECT player, score, ticks, seed, finished FROM runs "
+                                 "ORDER BY score DESC, finished LIMIT ?", (c.LEADERBOARD_SIZE,)).fetchall()
+        with self.lock:
+            for player, score in best:
+                if score > self.best.get(player, 0):
+                    self.best[player] = score
+        # the best are already in there, this just fills the leaderboard
+        self.remember(top)
+
+    def next_batch(self):
+        '''
+        waits for a run, then for up to SCORE_FLUSH_SECONDS for more
+        :return: the runs to write, and whether the store is stopping
+        '''
+        run = self.queue.get()
+        if run is STOP:
+            return [], True
+
+        batch = [run]
+        deadline = time.monotonic() + c.SCORE_FLUSH_SECONDS
+        while len(batch) < c.SCORE_BATCH_SIZE:
+            try:
+                run = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if run is STOP:
+                return batch, True
+            batch.append(run)
+        return batch, False
+
+
+def history(path, player, limit=20):
+    '''
+    reads the database directly - not for use while the game is running
+    :return: list of (score, ticks, seed, finished) of the player's last runs, newest first
+    '''
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        return connection.execute("SELECT score, ticks, seed, finished FROM runs WHERE player = ? "
+                                  "ORDER BY finished DESC LIMIT ?", (player, limit)).fetchall()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    store = ScoreStore(c.SCORE_DB)
+    store.start()
+    store.loaded.wait()
+
+    if len(sys.argv) > 1:
+        player = sys.argv[1]
+        print("{} - best {}".format(player, store.high_score(player)))
+        for score, ticks, seed, finished in history(c.SCORE_DB, player):
+            print("  {}  {:>6}  {:>7.1f}s  seed {}".format(
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(finished)), score, ticks / c.FPS, seed))
+    else:
+        for i, (score, player, finished) in enumerate(store.leaderboard()):
+            print("{:>3}. {:<16} {:>6}  {}".format(
+                i + 1, player, score, time.strftime("%Y-%m-%d %H:%M", time.localtime(finished))))
+    store.close()
@@ -2,17 +2,101 @@ import pygame as pg
 import os
 import constants as c
 from tools import *
+import assets
+import audio
+import profiler
+import scores
+import telemetry
+import viewport
 
 
 ## Top level Code ##
 
+## nothing here touches the display when setup is imported
+## the window is only opened by start(), and graphics/fonts are loaded
+## the first time something looks them up in GFX / FONTS
+## that way the simulation can be imported and run headless
+
 os.environ['SDL_VIDEO_CENTERED'] = '1'
-SCREEN = pg.display.set_mode(c.SCREEN_SIZE)
-SCREEN_RECT = SCREEN.get_rect()
 
-pg.init()
-pg.display.set_caption(c.CAPTION)
+SCREEN = None
+SCREEN_RECT = pg.Rect(c.ORIGIN, c.SCREEN_SIZE)
+
+# maps the playfield onto the window, None when the window is SCREEN_SIZE
+VIEW = None
+# with VIEW and not c.SCALE_SPRITES, scenes render here and it is scaled onto SCREEN
+CANVAS = None
+
+# set by start_headless - no window, no rendering, no frame cap
+HEADLESS = False
+
+# each image is loaded on first use, from the decoded image cache when it can be
+GFX = assets.ImageLibrary(os.path.join("resources", "graphics"), c.ASSET_CACHE_DIR, use_atlas=c.USE_TEXTURE_ATLAS)
+# font name -> path, the fonts themselves are opened by whoever needs them
+FONTS = LazyResources(lambda: assets.scan(os.path.join("resources", "fonts"), (".ttf", ".otf")))
+# opened fonts by (path, size) - FONT_CACHE.get('arcade', 20)
+FONT_CACHE = FontCache(FONTS)
+
+# every bit of text in the game is rendered through here
+TEXT = TextCache(c.TEXT_CACHE_SIZE)
+
+# sound effects and music, silent until started
+AUDIO = audio.Audio(c.SOUND_DIR)
+
+# saved high scores and every finished game, nothing is read or written until started
+SCORES = scores.ScoreStore(c.SCORE_DB)
+
+# gameplay events written out in the background, nothing is queued until started
+TELEMETRY = telemetry.Telemetry(c.TELEMETRY_DIR, c.TELEMETRY_FORMAT)
+
+# frame timings, does nothing until enabled
+PROFILER = profiler.Profiler()
+
+
+def start():
+    '''
+    opens the game window
+    :return: the display surface
+    '''
+    global SCREEN
+
+    if c.FULLSCREEN:
+        SCREEN = pg.display.set_mode((0, 0), pg.FULLSCREEN)
+    else:
+        SCREEN = pg.display.set_mode(c.WINDOW_SIZE or c.SCREEN_SIZE, pg.RESIZABLE if c.RESIZABLE_WINDOW else 0)
+    fit_window()
+
+    pg.init()
+    pg.display.set_caption(c.CAPTION)
+    return SCREEN
+
+
+def fit_window():
+    '''
+    sets up VIEW (and CANVAS) for the current window size - run again after the window is resized
+    '''
+    global SCREEN, SCREEN_RECT, VIEW, CANVAS
+
+    SCREEN = pg.display.get_surface()
+    SCREEN_RECT = SCREEN.get_rect()
+    if SCREEN.get_size() == c.SCREEN_SIZE:
+        VIEW = None
+        CANVAS = None
+        return
+
+    VIEW = viewport.Viewport(SCREEN.get_size())
+    if not c.SCALE_SPRITES and CANVAS is None:
+        CANVAS = pg.Surface(c.SCREEN_SIZE).convert()
+    # the bars either side of the playfield
+    SCREEN.fill(c.BLACK)
 
-GFX = load_all_gfx(os.path.join("resources", "graphics"))
-FONTS = load_all_fonts(os.path.join("resources", "fonts"))
 
+def start_headless():
+    '''
+    sets up for running the simulation without a display
+    only the font module is initialised (scores still create fonts),
+    SDL video is never touched
+    '''
+    global HEADLESS
+    HEADLESS = True
+    pg.font.init()
@@ -1,6 +1,11 @@
 import pygame as pg
 import setup as s
 import constants as c
+import entities
+import formations
+import collision
+
+import heapq
 
 import random
 
@@ -10,6 +15,7 @@ class Spaceship(pg.sprite.Sprite):
         pg.sprite.Sprite.__init__(self)
 
         self.image = s.GFX['ufo']
+        self.mask = s.GFX.mask('ufo')
         self.rect = self.image.get_rect()
         self.rect.x = c.INIT_SPACESHIP_X
         self.rect.y = c.INIT_SPACESHIP_Y
@@ -18,6 +24,12 @@ class Spaceship(pg.sprite.Sprite):
         self.right_key_detected = False
         self.shoot = False
 
+    def snapshot(self):
+        return (self.rect.x, self.rect.y, self.left_key_detected, self.right_key_detected, self.shoot)
+
+    def restore(self, state):
+        self.rect.x, self.rect.y, self.left_key_detected, self.right_key_detected, self.shoot = state
+
 
     def update(self):
 
@@ -36,41 +48,48 @@ class Spaceship(pg.sprite.Sprite):
                 self.rect.x = c.SCREEN_WIDTH - c.SPACESHIP_WIDTH
 
 
+# one step up for every speed up score reached
+def speed_step(score):
+    return sum(1 for threshold in c.SPEED_UP_SCORES if score >= threshold)
+
+
+# how far enemies move sideways / down a row at a given score
+def enemy_speeds(score):
+    speeds = [(c.INIT_MOV_X, c.INIT_MOV_Y), (c.MOV_X_200, c.MOV_Y_200),
+              (c.MOV_X_400, c.MOV_Y_400), (c.MOV_X_600, c.MOV_Y_600)]
+    return speeds[min(speed_step(score), len(speeds) - 1)]
+
+
+# how hard the game is at a score - waves' speed step, and whether fireballs home
+def difficulty(score):
+    return speed_step(score), score >= c.HOMING_SCORE
+
+
 class Enemy(pg.sprite.Sprite):
 
-    def __init__(self, score):
+    # rng is the random number generator of the game the enemy is in
+    def __init__(self, score, rng=random):
         pg.sprite.Sprite.__init__(self)
 
         self.image = s.GFX['enemy']
+        self.mask = s.GFX.mask('enemy')
         self.rect = self.image.get_rect()
 
         self.alive = True
         self.rect.x = c.INIT_ENEMY_X
         self.rect.y = c.INIT_ENEMY_Y
 
-        if score >= 800:
-            self.x_move_increment = c.MOV_X_600
-            self.y_move_increment = c.MOV_Y_600
-        elif score >= 600:
-            self.x_move_increment = c.MOV_X_600
-            self.y_move_increment = c.MOV_Y_600
-        elif score >= 400:
-            self.x_move_increment = c.MOV_X_400
-            self.y_move_increment = c.MOV_Y_400
-        elif score >= 200:
-            self.x_move_increment = c.MOV_X_200
-            self.y_move_increment = c.MOV_Y_200
-        else:
-            self.x_move_increment = c.INIT_MOV_X
-            self.y_move_increment = c.INIT_MOV_Y
+        self.x_move_increment, self.y_move_increment = enemy_speeds(score)
 
 
-        self.shoot_fireball = False
+        # ticks between fireballs - the lower the value, the more
+        # frequently the enemy shoots
+        self.fireball_count_threshold = rng.randint(80, 120)
+        # set by the EnemyGroup the enemy is in
+        self.next_fireball_tick = None
 
-        # the higher the value, the more frequently the
-        # spaceships will shoot fireballs
-        self.fireball_counter = 0
-        self.fireball_count_threshold = random.randint(80, 120)
+        # slot in the entity store when moved by one (c.USE_ENTITY_STORE)
+        self.entity_index = None
 
     def set_position(self, x, y):
         self.rect.x = x
@@ -78,34 +97,137 @@ class Enemy(pg.sprite.Sprite):
 
 
 
+    def entity_state(self):
+        return {'vx': self.x_move_increment}
+
+    # store is the EntityStore moving the enemy, if any - its speed is kept there
+    def snapshot(self, store=None):
+        vx = int(store.vx[self.entity_index]) if store is not None else self.x_move_increment
+        return (self.rect.x, self.rect.y, vx, self.y_move_increment,
+                self.fireball_count_threshold, self.next_fireball_tick)
+
+    def restore(self, state):
+        (self.rect.x, self.rect.y, self.x_move_increment, self.y_move_increment,
+         self.fireball_count_threshold, self.next_fireball_tick) = state
+
     def update(self):
 
         self.rect.x += self.x_move_increment
 
-class Explosion(pg.sprite.Sprite):
+class PooledSprite(pg.sprite.Sprite):
+    '''
+    a sprite that goes back to the pool it came from when it is killed
+    subclasses put their starting state in reset(), which is called both
+    for brand new sprites and for ones handed out again by the pool
+    generation counts how many times it has been handed out again, so a
+    position remembered from its last life isn't taken to be from this one
+    '''
+
+    pool = None
+    generation = 0
+
+    def kill(self):
+        pg.sprite.Sprite.kill(self)
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class SpritePool:
+    '''
+    keeps killed sprites around to be handed out again instead of making new ones
+    :param sprite_class: PooledSprite subclass to make when the pool is empty
+    :param cap_constant: name of the constant holding the most sprites kept
+    waiting in the pool, 0 turns pooling off - read on every release, so the
+    pools at the bottom of this file follow changes to constants
+    hits / misses count acquires served from the pool / by making a new sprite,
+    dropped counts releases thrown away because the pool was full
+    '''
+
+    def __init__(self, sprite_class, cap_constant):
+        self.sprite_class = sprite_class
+        self.cap_constant = cap_constant
+        self.free = []
+
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    @property
+    def cap(self):
+        return getattr(c, self.cap_constant)
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            self.hits += 1
+            sprite = self.free.pop()
+            sprite.in_pool = False
+            sprite.generation += 1
+            sprite.reset(*args, **kwargs)
+            return sprite
+
+        self.misses += 1
+        sprite = self.sprite_class(*args, **kwargs)
+        sprite.pool = self
+        sprite.in_pool = False
+        return sprite
+
+    def release(self, sprite):
+        # a sprite can be killed more than once, it only goes back once
+        if sprite.in_pool:
+            return
+        if len(self.free) < self.cap:
+            sprite.in_pool = True
+            self.free.append(sprite)
+        else:
+            self.dropped += 1
 
-    def __init__(self):
-        pg.sprite.Sprite.__init__(self)
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'dropped': self.dropped,
+            'free': len(self.free),
+            'cap': self.cap,
+        }
 
-        self.explosion_graphics = []
+
+class Explosion(PooledSprite):
+
+    # the explosion frames, looked up once and shared by every explosion
+    explosion_graphics = None
+    num_images = 8
+
+    def __init__(self):
+        PooledSprite.__init__(self)
 
         # get explosion images
-        self.num_images = 8
-        for i in range(self.num_images):
-            name = "explosion{}".format(i)
-            self.explosion_graphics.append(s.GFX[name])
+        if Explosion.explosion_graphics is None:
+            Explosion.explosion_graphics = []
+            for i in range(self.num_images):
+                name = "explosion{}".format(i)
+                Explosion.explosion_graphics.append(s.GFX[name])
 
+        self.reset()
+
+    def reset(self):
         # position of the rectangle
         self.collision_x = None
         self.collision_y = None
 
         self.frame = 0
-        self.last_update = pg.time.get_ticks()
-        self.frame_rate = c.FPS
+        # ticks the current image has been shown for
+        self.frame_ticks = 0
 
         self.image = self.explosion_graphics[self.frame]
         self.rect = self.image.get_rect()
 
+    def snapshot(self):
+        return (self.rect.x, self.rect.y, self.frame, self.frame_ticks, self.collision_x, self.collision_y)
+
+    def restore(self, state):
+        self.rect.x, self.rect.y, self.frame, self.frame_ticks, self.collision_x, self.collision_y = state
+        self.image = self.explosion_graphics[self.frame]
+
     def set_position(self, x, y):
         if not self.collision_x:
             self.collision_x = x
@@ -117,9 +239,9 @@ class Explosion(pg.sprite.Sprite):
 
 
     def update(self):
-        now = pg.time.get_ticks()
-        if now - self.last_update > self.frame_rate:
-            self.last_update = now
+        self.frame_ticks += 1
+        if self.frame_ticks >= c.EXPLOSION_FRAME_TICKS:
+            self.frame_ticks = 0
             self.frame += 1
             # increase the sprite counter each frame
             if self.frame == self.num_images - 1:
@@ -129,86 +251,230 @@ class Explosion(pg.sprite.Sprite):
 
 
 class EnemyGroup():
-
-    def __init__(self, score, spaceship):
+    '''
+    a wave of enemies moving together as one formation
+    the formation's left and right edges are tracked as it moves, so the
+    wall check is done once per tick instead of once per enemy, fireballs
+    are fired off a schedule instead of every enemy counting ticks, and
+    the collision grid is shifted along with the wave instead of rebuilt -
+    the only per enemy work each tick is moving them
+    :param formation: formation spec (see formations.py), defaults to c.FORMATION
+    :param targets: spaceships homing fireballs go after, defaults to just spaceship
+    '''
+
+    def __init__(self, score, spaceship, rng=random, formation=None, targets=None):
         self.too_close = False
 
         self.spaceship = spaceship
+        self.targets = targets or [spaceship]
         self.score = score
-
-        self.num_enemies = 4
-        self.group = pg.sprite.Group()
-
-        self.fireballs = pg.sprite.Group()
-
-        self.enemy_left = Enemy(score)
-        self.enemy_left.set_position(c.INIT_ENEMY_X, c.INIT_ENEMY_Y)
-        self.group.add(self.enemy_left)
-
-        self.enemy_center = Enemy(score)
-        self.enemy_center.set_position(2 * c.INIT_ENEMY_X, c.INIT_ENEMY_Y)
-        self.group.add(self.enemy_center)
-
-        self.enemy_right = Enemy(score)
-        self.enemy_right.set_position(3 * c.INIT_ENEMY_X, c.INIT_ENEMY_Y)
-        self.group.add(self.enemy_right)
-
-        self.enemy_down = Enemy(score)
-        self.enemy_down.set_position(2 * c.INIT_ENEMY_X, c.INIT_ENEMY_Y + c.ENEMY_HEIGHT+ c.ENEMY_VERT_DIST)
-        self.group.add(self.enemy_down)
+        self.rng = rng
+
+        # ticks this wave has been going for
+        self.tick = 0
+        # (tick, order, enemy) of the next fireball of every enemy
+        self.fireball_schedule = []
+        self.scheduled = 0
+
+        # x of the leftmost / rightmost enemy, and how many enemies that was worked out for
+        self.left = 0
+        self.right = 0
+        self.bounds_count = 0
+
+        # every enemy in a wave moves at the same speed
+        self.x_move_increment, self.y_move_increment = enemy_speeds(score)
+
+        # with the entity store on, enemies and fireballs are moved
+        # a whole group at a time instead of sprite by sprite
+        self.use_store = c.USE_ENTITY_STORE
+        if self.use_store:
+            # enemies are only killed by being shot - the same as Enemy.update
+            self.group = entities.StoreGroup(kill_offscreen=False)
+            self.fireballs = entities.StoreGroup(targets=self.targets)
+        else:
+            self.group = pg.sprite.Group()
+            self.fireballs = pg.sprite.Group()
+
+        # collision grid of the wave, only rebuilt when enemies join or drop a row
+        self.grid = collision.SpatialHash() if c.USE_SPATIAL_HASH else None
+        self.grid_stale = True
+
+        if formation is None:
+            formation = c.FORMATION
+        for x, y in formations.positions(formation, rng):
+            enemy = Enemy(score, rng)
+            enemy.set_position(x, y)
+            self.add_enemy(enemy)
+
+        self.num_enemies = len(self.group)
+
+    def add_enemy(self, enemy):
+        # join the wave heading the same way as the rest of it
+        enemy.x_move_increment = self.x_move_increment
+        self.group.add(enemy)
+        self.schedule_fireball(enemy)
+        self.bounds_count = -1
+        self.grid_stale = True
+
+    def collision_grid(self):
+        '''
+        :return: SpatialHash of the enemies, or None when not using them
+        enemies shot down since it was built are still in it - collision.spritecollideany skips them
+        '''
+        if self.grid is not None and self.grid_stale:
+            self.grid.build(self.group)
+            self.grid_stale = False
+        return self.grid
+
+    def schedule_fireball(self, enemy):
+        enemy.next_fireball_tick = self.tick + enemy.fireball_count_threshold
+        # the order number keeps enemies firing on the same tick in the order they were added
+        heapq.heappush(self.fireball_schedule, (enemy.next_fireball_tick, self.scheduled, enemy))
+        self.scheduled += 1
+
+    def update_bounds(self):
+        # only needed when enemies have come or gone, otherwise the edges just move with the wave
+        if self.bounds_count != len(self.group):
+            xs = [enemy.rect.x for enemy in self.group]
+            self.left = min(xs) if xs else 0
+            self.right = max(xs) if xs else 0
+            self.bounds_count = len(xs)
+
+    def move(self):
+        # every enemy one step sideways
+        if self.use_store:
+            self.group.update()
+        else:
+            for enemy in self.group:
+                enemy.update()
+        self.left += self.x_move_increment
+        self.right += self.x_move_increment
+        if self.grid is not None:
+            self.grid.move(self.x_move_increment, 0)
 
     def update_group(self):
 
-        # updating logic for the enemy
-        for enemy in self.group:
-            enemy.update()
-
-            enemy.fireball_counter += 1
-
-            # if counter reaches update count, shoot a fireball
-            if enemy.fireball_counter == enemy.fireball_count_threshold:
-                enemy.shoot_fireball = True
-                # reset the counter
-                enemy.fireball_counter = 0
-
-            # fireball handling code
-            if enemy.shoot_fireball:
-                # set fireball shoot to false
-                enemy.shoot_fireball = False
-
-                # really bad coding style - adding hardcoded score in a random update place
-                # but basically set homing to true when score is greater than 300
-                if self.score >= 300:
-                    fireball = Fireball(self.spaceship, homing=True)
-                    fireball.update_pos(enemy.rect.centerx, enemy.rect.centery)
-                    self.fireballs.add(fireball)
-                else:
-                    fireball = Fireball()
-                    fireball.update_pos(enemy.rect.centerx, enemy.rect.centery)
-                    self.fireballs.add(fireball)
+        self.tick += 1
+        self.update_bounds()
 
+        # updating logic for the enemy
+        self.move()
 
+        # fireball handling code
+        schedule = self.fireball_schedule
+        while schedule and schedule[0][0] <= self.tick:
+            tick, order, enemy = heapq.heappop(schedule)
+            # enemies that have been shot down just drop off the schedule
+            if enemy in self.group and enemy.next_fireball_tick == tick:
+                self.shoot_fireball(enemy)
+                self.schedule_fireball(enemy)
 
-            if (enemy.rect.x < 0) or \
-                (enemy.rect.x > c.SCREEN_WIDTH - c.ENEMY_WIDTH):
-                self.too_close = True
-                break
+        if self.bounds_count and (self.left < 0 or self.right > c.SCREEN_WIDTH - c.ENEMY_WIDTH):
+            self.too_close = True
 
         # updating logic for the fireball
-        for fireball in self.fireballs:
-            fireball.update()
+        self.fireballs.update()
 
         if self.too_close:
+            self.too_close = False
+            self.reverse()
+
+    def reverse(self):
+        '''
+        turn the wave around and drop it down a row
+        if the enemies reach the bottom line, then they just shuffle horizontally
+        '''
+        self.x_move_increment *= -1
+        bottom = c.INIT_SPACESHIP_Y - 40
+        # not every enemy drops, so the grid can't just be shifted
+        self.grid_stale = True
+
+        if self.use_store:
+            store = self.group.store
+            n = store.count
+            y = store.y[:n]
+            vx = store.vx[:n]
+            vx *= -1
+            y[y < bottom] += int(self.y_move_increment)
+            store.sync()
+        else:
             for enemy in self.group:
                 enemy.x_move_increment *= -1
-                # if the enemies reach the bottom line,
-                # then just shuffle horizontally
-                if not (enemy.rect.y >= c.INIT_SPACESHIP_Y - 40 ):
+                if not (enemy.rect.y >= bottom):
                     enemy.rect.y += enemy.y_move_increment
-                self.too_close = False
-                enemy.update()
 
-class Fireball(pg.sprite.Sprite):
+        self.move()
+
+    ## Snapshots ##
+
+    def snapshot(self):
+        '''
+        :return: the wave's state as a tuple of plain values, see Game.snapshot
+        '''
+        # each enemy has one live entry on the schedule - only its order is needed,
+        # the tick is the enemy's next_fireball_tick
+        orders = {}
+        for tick, order, enemy in self.fireball_schedule:
+            if enemy.next_fireball_tick == tick:
+                orders[enemy] = order
+
+        enemy_store = self.group.store if self.use_store else None
+        fireball_store = self.fireballs.store if self.use_store else None
+        return (self.tick, self.scheduled, self.score, self.x_move_increment, self.y_move_increment,
+                self.too_close, self.num_enemies,
+                tuple(enemy.snapshot(enemy_store) + (orders[enemy],) for enemy in self.group),
+                tuple(fireball.snapshot(fireball_store) + (self.targets.index(fireball.spaceship) if fireball.homing else 0,)
+                      for fireball in self.fireballs))
+
+    def restore(self, state):
+        '''
+        puts the wave back as it was when state was taken - the enemies already
+        here are reused, fireballs go back to and come from the pool
+        '''
+        (self.tick, self.scheduled, self.score, self.x_move_increment, self.y_move_increment,
+         self.too_close, self.num_enemies, enemies, fireballs) = state
+
+        spare = list(self.group)
+        self.group.empty()
+        self.fireball_schedule = []
+        for enemy_state in enemies:
+            enemy = spare.pop() if spare else Enemy(self.score, self.rng)
+            enemy.restore(enemy_state[:-1])
+            self.group.add(enemy)
+            self.fireball_schedule.append((enemy.next_fireball_tick, enemy_state[-1], enemy))
+        heapq.heapify(self.fireball_schedule)
+
+        for fireball in self.fireballs.sprites():
+            fireball.kill()
+        for fireball_state in fireballs:
+            # the last value is which of the targets the fireball is after
+            fireball = FIREBALLS.acquire(self.targets[fireball_state[-1]], homing=fireball_state[3])
+            fireball.restore(fireball_state[:-1])
+            self.fireballs.add(fireball)
+
+        # worked out again from the enemies on the next update
+        self.bounds_count = -1
+        self.grid_stale = True
+
+    def target(self, enemy):
+        # with more than one spaceship, go after the nearest one still flying
+        if len(self.targets) == 1:
+            return self.spaceship
+        alive = [spaceship for spaceship in self.targets if spaceship.alive()]
+        if not alive:
+            return self.spaceship
+        return min(alive, key=lambda spaceship: abs(spaceship.rect.centerx - enemy.rect.centerx))
+
+    def shoot_fireball(self, enemy):
+        # homing fireballs once the score is high enough
+        if self.score >= c.HOMING_SCORE:
+            fireball = FIREBALLS.acquire(self.target(enemy), homing=True)
+        else:
+            fireball = FIREBALLS.acquire()
+        fireball.update_pos(enemy.rect.centerx, enemy.rect.centery)
+        self.fireballs.add(fireball)
+
+class Fireball(PooledSprite):
     """
     a projectile shot by the enemy
     homing missile - tracks the spaceship movement
@@ -220,9 +486,13 @@ class Fireball(pg.sprite.Sprite):
 
     def __init__(self, spaceship=None, homing=False):
 
-        pg.sprite.Sprite.__init__(self)
+        PooledSprite.__init__(self)
+        self.reset(spaceship, homing)
+
+    def reset(self, spaceship=None, homing=False):
 
         self.image = s.GFX['fireball']
+        self.mask = s.GFX.mask('fireball')
         self.rect = self.image.get_rect()
 
         self.xmove_increment = c.FIREBALL_XMOVE_INCREMENT
@@ -234,6 +504,29 @@ class Fireball(pg.sprite.Sprite):
             self.spaceship = spaceship
             self.spaceshipx = self.spaceship.rect.centerx
 
+        self.entity_index = None
+
+    def entity_state(self):
+        return {
+            'vy': self.ymove_increment,
+            'gravity': self.acceleration,
+            'max_speed': c.FIREBALL_MAX_YSPEED,
+            'homing': self.xmove_increment if self.homing else 0,
+            'target': self.spaceship if self.homing else None,
+        }
+
+    def snapshot(self, store=None):
+        vy = int(store.vy[self.entity_index]) if store is not None else self.ymove_increment
+        # where the target is, as both update() and the store read it - the
+        # spaceshipx attribute is never moved on by the store
+        return (self.rect.x, self.rect.y, vy, self.homing, self.spaceship.rect.x if self.homing else 0)
+
+    # pooled fireballs come back with reset() done, only what changes needs setting
+    def restore(self, state):
+        self.rect.x, self.rect.y, self.ymove_increment, homing, spaceshipx = state
+        if homing:
+            self.spaceshipx = spaceshipx
+
 
     def update_pos(self, x, y):
         self.rect.x = x
@@ -256,22 +549,44 @@ class Fireball(pg.sprite.Sprite):
 
 
         # kill the sprite if it moves out of screen
-        if self.rect.y <= 0:
+        # (falling off the bottom too, it can't hit anything down there)
+        if self.rect.y <= 0 or self.rect.y > c.SCREEN_HEIGHT:
             self.kill()
 
 
 # Spaceship's projectile
-class Sp_Projectile(pg.sprite.Sprite):
+class Sp_Projectile(PooledSprite):
 
     def __init__(self):
-        pg.sprite.Sprite.__init__(self)
+        PooledSprite.__init__(self)
+        self.reset()
+
+    def reset(self):
         self.image = s.GFX['asteroid']
+        self.mask = s.GFX.mask('asteroid')
         self.acceleration = c.SP_PROJECTILE_ACCELERATION
         self.rect = self.image.get_rect()
         self.rect.x = 0
         self.rect.y = 0
         self.move_increment = c.SP_PROJECTILE_MOVE_INCREMENT
 
+        self.entity_index = None
+
+    def entity_state(self):
+        # moves up the screen, so velocity and acceleration are negative
+        return {
+            'vy': -self.move_increment,
+            'gravity': -self.acceleration,
+            'max_speed': c.SP_PROJECTILE_MAX_SPEED,
+        }
+
+    def snapshot(self, store=None):
+        speed = -int(store.vy[self.entity_index]) if store is not None else self.move_increment
+        return (self.rect.x, self.rect.y, speed)
+
+    def restore(self, state):
+        self.rect.x, self.rect.y, self.move_increment = state
+
     def spawn(self, x, y):
         self.rect.x = x
         self.rect.y = y
@@ -285,4 +600,19 @@ class Sp_Projectile(pg.sprite.Sprite):
 
         # kill the sprite if it moves out of screen
         if self.rect.y <= 0:
-            self.kill()
\ No newline at end of file
+            self.kill()
+
+
+## Pools ##
+
+## fireballs, projectiles and explosions come and go constantly, so killed
+## ones are kept and handed out again. pool sizes are in constants
+FIREBALLS = SpritePool(Fireball, 'FIREBALL_POOL_SIZE')
+SP_PROJECTILES = SpritePool(Sp_Projectile, 'SP_PROJECTILE_POOL_SIZE')
+EXPLOSIONS = SpritePool(Explosion, 'EXPLOSION_POOL_SIZE')
+
+POOLS = {
+    'fireball': FIREBALLS,
+    'sp_projectile': SP_PROJECTILES,
+    'explosion': EXPLOSIONS,
+}
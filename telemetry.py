@@ -0,0 +1,240 @@
+## Gameplay telemetry ##
+
+## what happens in played games, as a stream of events - shots, kills, deaths
+## (and what did it), new waves, difficulty going up, games starting and ending -
+## each stamped with the game tick, so real sessions can be looked at afterwards
+
+## every event has a type and three whole number fields, see EVENTS. emitting
+## one puts a tuple on a bounded queue and returns - no lock, no waiting, no
+## disk. when the queue is full the event is dropped and counted instead, and
+## the count is written out with the next batch
+## a background thread takes everything queued every c.TELEMETRY_FLUSH_SECONDS
+## and appends it to the current file - json lines, or fixed size binary
+## records with c.TELEMETRY_FORMAT = 'binary'. files are started afresh every
+## c.TELEMETRY_FILE_BYTES and only the last c.TELEMETRY_KEEP_FILES are kept
+
+## python telemetry.py              how many of each event the kept files hold
+## python telemetry.py FILE...      the same for particular files
+
+import collections
+import json
+import os
+import struct
+import sys
+import threading
+import time
+
+import constants as c
+
+
+SHOT = 1
+KILL = 2
+DEATH_FIREBALL = 3
+DEATH_COLLISION = 4
+WAVE = 5
+TIER = 6
+GAME_START = 7
+GAME_END = 8
+# how many events were dropped since the last batch, written by the writer itself
+DROPPED = 9
+
+# type -> name, and the names of its three fields
+EVENTS = {
+    SHOT: ('shot', ('x', 'y', 'spaceship')),
+    KILL: ('kill', ('x', 'y', 'score')),
+    DEATH_FIREBALL: ('death_fireball', ('x', 'y', 'spaceship')),
+    DEATH_COLLISION: ('death_collision', ('x', 'y', 'spaceship')),
+    WAVE: ('wave', ('score', 'enemies', 'speed')),
+    TIER: ('tier', ('score', 'speed_step', 'homing')),
+    GAME_START: ('game_start', ('seed', 'spaceships', 'highscore')),
+    GAME_END: ('game_end', ('seed', 'score', 'ticks')),
+    DROPPED: ('dropped', ('count', 'queued', 'capacity')),
+}
+NAMES = dict((name, kind) for kind, (name, fields) in EVENTS.items())
+
+MAGIC = b'SSTL'
+VERSION = 1
+# type, tick, the three fields
+RECORD = struct.Struct('<BIqqq')
+EXTENSIONS = {'jsonl': '.jsonl', 'binary': '.sstl'}
+
+
+class Telemetry:
+
+    ''' setup.TELEMETRY - nothing is queued or written until start() is
+    called, so headless runs and simulations cost one attribute check an event
+    '''
+
+    def __init__(self, directory=c.TELEMETRY_DIR, format=c.TELEMETRY_FORMAT, capacity=c.TELEMETRY_QUEUE_SIZE):
+        if format not in EXTENSIONS:
+            raise ValueError("unknown telemetry format {}".format(format))
+        self.directory = directory
+        self.format = format
+        self.capacity = capacity
+
+        self.started = False
+        # appended to by the game, emptied from the left by the writer - a deque
+        # needs no lock for that
+        self.queue = collections.deque()
+        self.thread = None
+        self.stopping = threading.Event()
+
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+
+        # writer thread only
+        self.file = None
+        self.files = 0
+        self.session = None
+        self.reported_drops = 0
+
+    def start(self):
+        if self.started:
+            return
+        # the pid keeps two games started in the same second apart
+        self.session = "{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid())
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.started = True
+        self.thread.start()
+
+    def emit(self, kind, tick, first=0, second=0, third=0):
+        ''' queues an event - returns straight away, dropping it if the queue is full '''
+        if not self.started:
+            return
+        if len(self.queue) >= self.capacity:
+            self.dropped += 1
+            return
+        self.queue.append((kind, tick, first, second, third))
+        self.emitted += 1
+
+    def close(self):
+        ''' writes out whatever is queued and stops the writer '''
+        if not self.started:
+            return
+        self.started = False
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+
+    ## Writer thread ##
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            while not self.stopping.wait(c.TELEMETRY_FLUSH_SECONDS):
+                self.write_batch()
+            self.write_batch()
+        finally:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def take(self):
+        '''
+        :return: everything queued so far, plus a DROPPED event if any were dropped
+        '''
+        batch = []
+        queue = self.queue
+        # how full the queue was - anything appended after this waits for the next batch
+        queued = len(queue)
+        for _ in range(queued):
+            batch.append(queue.popleft())
+
+        dropped = self.dropped
+        if dropped != self.reported_drops:
+            tick = batch[-1][1] if batch else 0
+            batch.append((DROPPED, tick, dropped - self.reported_drops, queued, self.capacity))
+            self.reported_drops = dropped
+        return batch
+
+    def write_batch(self):
+        batch = self.take()
+        if not batch:
+            return
+        if self.file is None or self.file.tell() >= c.TELEMETRY_FILE_BYTES:
+            self.next_file()
+
+        if self.format == 'jsonl':
+            lines = []
+            for kind, tick, first, second, third in batch:
+                name, fields = EVENTS[kind]
+                lines.append(json.dumps({'event': name, 'tick': tick,
+                                         fields[0]: first, fields[1]: second, fields[2]: third}))
+            self.file.write(("\n".join(lines) + "\n").encode())
+        else:
+            self.file.write(b"".join(RECORD.pack(*event) for event in batch))
+        self.file.flush()
+        self.written += len(batch)
+
+    def next_file(self):
+        if self.file is not None:
+            self.file.close()
+        # never opens over an existing file - if the name is taken, the next one is tried
+        while True:
+            self.files += 1
+            path = os.path.join(self.directory, "{}-{:04d}{}".format(self.session, self.files, EXTENSIONS[self.format]))
+            try:
+                self.file = open(path, 'xb')
+                break
+            except FileExistsError:
+                continue
+        if self.format == 'binary':
+            self.file.write(MAGIC + bytes((VERSION,)))
+        self.prune()
+
+    def prune(self):
+        # the oldest files go once there are too many - names sort oldest first
+        kept = session_files(self.directory)
+        for path in kept[:max(0, len(kept) - c.TELEMETRY_KEEP_FILES)]:
+            os.remove(path)
+
+
+## Reading ##
+
+def session_files(directory=c.TELEMETRY_DIR):
+    '''
+    :return: paths of every telemetry file in directory, oldest first
+    '''
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if os.path.splitext(name)[1] in EXTENSIONS.values()]
+
+
+def read(path):
+    '''
+    :return: list of (name, tick, fields dict) of the events in a file of either format
+    '''
+    events = []
+    with open(path, 'rb') as file:
+        if path.endswith(EXTENSIONS['binary']):
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{} is not a telemetry file".format(path))
+            version = file.read(1)[0]
+            if version != VERSION:
+                raise ValueError("{} is telemetry version {}, expected {}".format(path, version, VERSION))
+            data = file.read()
+            # a record cut short by a crash is left off
+            for kind, tick, first, second, third in RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size]):
+                name, fields = EVENTS[kind]
+                events.append((name, tick, dict(zip(fields, (first, second, third)))))
+        else:
+            for line in file:
+                event = json.loads(line)
+                name = event.pop('event')
+                events.append((name, event.pop('tick'), event))
+    return events
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or session_files()
+    counts = collections.Counter()
+    for path in paths:
+        for name, tick, fields in read(path):
+            counts[name] += fields['count'] if name == 'dropped' else 1
+    print("{} files".format(len(paths)))
+    for kind in sorted(EVENTS):
+        name = EVENTS[kind][0]
+        print("  {:<16} {:>8}".format(name, counts[name]))
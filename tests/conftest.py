@@ -0,0 +1,23 @@
+## the game's modules live at the top of the repo, and are run headless here
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import constants as c
+import setup as s
+
+
+@pytest.fixture(scope='session', autouse=True)
+def headless():
+    s.start_headless()
+
+
+@pytest.fixture
+def homing(monkeypatch):
+    # homing fireballs from the start, so they are in every snapshot compared
+    monkeypatch.setattr(c, 'HOMING_SCORE', 0)
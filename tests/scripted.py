@@ -0,0 +1,36 @@
+## seeded games played by a scripted player, for tests that compare two runs
+
+import random
+
+import invaders
+from batch import POLICIES
+
+
+SEEDS = (1, 7, 12345)
+TICKS = 900
+
+
+def play(seed, ticks=TICKS, snapshot_every=None, hooks=(), keep_alive=False):
+    '''
+    plays seed with the dodging player for ticks, or until the game is over
+    :param keep_alive: put the spaceship straight back when it dies, like bench.py,
+    so the game runs for all the ticks
+    :return: the game, and its snapshot every snapshot_every ticks
+    '''
+    game = invaders.Game({'highscore': 0, 'score': 0, 'seed': seed})
+    manager = invaders.SceneManager(game)
+    manager.tick_hooks.extend(hooks)
+    rng = random.Random(seed)
+    snapshots = []
+    for t in range(ticks):
+        if manager.scene is not game:
+            break
+        if not game.game_over:
+            POLICIES['dodge'](game, t, rng)
+        manager.step()
+        if keep_alive and game.game_over:
+            game.game_over = False
+            game.spaceship_sprites.add(game.spaceship)
+        if snapshot_every and manager.scene is game and game.tick % snapshot_every == 0:
+            snapshots.append(game.snapshot())
+    return game, snapshots
@@ -0,0 +1,186 @@
+## decoded images are kept on disk until their source changes - and any number
+## of processes can fill the cache at once
+
+import json
+import multiprocessing
+import os
+import time
+
+import pygame as pg
+import pytest
+
+import assets
+import atlas
+
+
+def make_images(directory, count=6):
+    os.makedirs(str(directory), exist_ok=True)
+    for i in range(count):
+        image = pg.Surface((20 + i, 10 + i))
+        image.fill((10 * i, 255 - 10 * i, 40))
+        pg.image.save(image, os.path.join(str(directory), "image{}.bmp".format(i)))
+
+
+def pixels(image):
+    return pg.image.tostring(image, 'RGB')
+
+
+@pytest.fixture
+def images(tmp_path):
+    make_images(tmp_path / "graphics")
+    return str(tmp_path / "graphics"), str(tmp_path / "cache")
+
+
+def test_second_start_reads_the_cache(images):
+    source, cache = images
+    cold = assets.ImageLibrary(source, cache)
+    cold.load_all()
+    assert (cold.cache.hits, cold.cache.misses) == (0, 6)
+
+    warm = assets.ImageLibrary(source, cache)
+    warm.load_all()
+    assert (warm.cache.hits, warm.cache.misses) == (6, 0)
+    for name in cold:
+        assert pixels(warm[name]) == pixels(cold[name])
+
+
+def test_touched_file_is_hashed_not_decoded(images):
+    source, cache = images
+    assets.ImageLibrary(source, cache).load_all()
+    path = os.path.join(source, "image0.bmp")
+    later = time.time() + 100
+    os.utime(path, (later, later))
+
+    library = assets.ImageLibrary(source, cache)
+    library['image0']
+    assert (library.cache.hits, library.cache.misses) == (1, 0)
+    with open(os.path.join(cache, "index.json")) as f:
+        assert json.load(f)['image0']['mtime'] == os.stat(path).st_mtime_ns
+
+
+def test_changed_file_is_decoded_again(images):
+    source, cache = images
+    assets.ImageLibrary(source, cache).load_all()
+
+    # same size file, different pixels
+    path = os.path.join(source, "image1.bmp")
+    image = pg.image.load(path)
+    image.fill((1, 2, 3))
+    pg.image.save(image, path)
+    # and a different size
+    pg.image.save(pg.Surface((50, 50)), os.path.join(source, "image2.bmp"))
+
+    library = assets.ImageLibrary(source, cache)
+    assert pixels(library['image1']) == pixels(image)
+    assert library['image2'].get_size() == (50, 50)
+    assert (library.cache.hits, library.cache.misses) == (0, 2)
+
+
+def test_unwritable_cache_is_just_a_miss(images, tmp_path):
+    source, cache = images
+    # a file where the cache directory should be
+    blocked = str(tmp_path / "blocked")
+    open(blocked, 'w').close()
+    library = assets.ImageLibrary(source, blocked)
+    library.load_all()
+    assert library.cache.misses == 6
+
+
+def fill(args):
+    source, cache, barrier = args
+    barrier.wait()
+    library = assets.ImageLibrary(source, cache)
+    library.load_all()
+    return library.cache.misses
+
+
+def test_many_processes_fill_the_cache_at_once(images):
+    source, cache = images
+    context = multiprocessing.get_context('fork')
+    processes = 8
+    barrier = context.Manager().Barrier(processes)
+    with context.Pool(processes) as pool:
+        pool.map(fill, [(source, cache, barrier)] * processes)
+
+    assert not [name for name in os.listdir(cache) if name.endswith(".tmp")]
+    library = assets.ImageLibrary(source, cache)
+    library.load_all()
+    assert (library.cache.hits, library.cache.misses) == (6, 0)
+
+
+## the texture atlas ##
+
+def make_sprites(directory):
+    os.makedirs(str(directory), exist_ok=True)
+    for i, size in enumerate(((30, 12), (8, 40), (16, 16), (25, 5))):
+        image = pg.Surface(size, pg.SRCALPHA)
+        image.fill((40 * i, 20, 200, 60 + 40 * i))
+        image.fill((255, 255, 255, 255), (1, 1, 3, 3))
+        pg.image.save(image, os.path.join(str(directory), "sprite{}.png".format(i)))
+
+
+@pytest.fixture
+def sprites(tmp_path):
+    directory = str(tmp_path / "graphics")
+    make_sprites(directory)
+    atlas.build(directory)
+    return directory, str(tmp_path / "cache")
+
+
+def test_atlas_hands_out_the_same_pixels(sprites):
+    source, cache = sprites
+    packed = assets.ImageLibrary(source, cache, use_atlas=True)
+    separate = assets.ImageLibrary(source, use_atlas=False)
+    assert sorted(packed.atlas()) == ["sprite{}".format(i) for i in range(4)]
+    for name in packed.atlas():
+        image = packed[name]
+        assert image.get_parent() is not None
+        assert pg.image.tostring(image, 'RGBA') == pg.image.tostring(separate[name], 'RGBA')
+
+
+def test_stale_atlas_is_not_used(sprites):
+    source, cache = sprites
+    path = os.path.join(source, "sprite2.png")
+    image = pg.image.load(path)
+    image.fill((0, 0, 0, 255))
+    pg.image.save(image, path)
+
+    library = assets.ImageLibrary(source, cache, use_atlas=True)
+    assert library.atlas() == {}
+    assert pg.image.tostring(library['sprite2'], 'RGBA') == pg.image.tostring(image, 'RGBA')
+
+
+def test_atlas_sources_are_hashed_once_and_the_index_never_written(sprites, monkeypatch):
+    source, cache = sprites
+    with open(atlas.index_path(source), 'rb') as f:
+        built = f.read()
+    hashed = []
+    file_hash = assets.file_hash
+    monkeypatch.setattr(assets, 'file_hash', lambda path: hashed.append(path) or file_hash(path))
+
+    assert atlas.load_index(source, cache) is not None
+    assert len(hashed) == 4
+    assert atlas.load_index(source, cache) is not None
+    assert len(hashed) == 4
+
+    # touched, not changed - hashed again, still used
+    path = os.path.join(source, "sprite0.png")
+    later = time.time() + 100
+    os.utime(path, (later, later))
+    assert atlas.load_index(source, cache) is not None
+    assert hashed[4:] == [path]
+
+    with open(atlas.index_path(source), 'rb') as f:
+        assert f.read() == built
+
+
+def test_atlas_in_a_read_only_directory(sprites, tmp_path):
+    source, cache = sprites
+    os.chmod(source, 0o555)
+    blocked = str(tmp_path / "blocked")
+    open(blocked, 'w').close()
+    try:
+        assert atlas.load_index(source, blocked) is not None
+        assert atlas.load_index(source) is not None
+    finally:
+        os.chmod(source, 0o755)
@@ -0,0 +1,61 @@
+## effects share a few channels - the important ones take them from the rest
+
+import numpy as np
+import pygame as pg
+import pytest
+
+import audio
+
+
+@pytest.fixture
+def sounds(tmp_path):
+    player = audio.Audio(str(tmp_path), {'player_explosion': 3, 'enemy_explosion': 2, 'shoot': 1})
+    if not player.start(channels=4):
+        pytest.skip("no audio driver")
+    # long enough that nothing finishes while a test is running
+    rate, size, channels = pg.mixer.get_init()
+    silence = pg.sndarray.make_sound(np.zeros((rate * 10, channels), np.int16))
+    for name in player.sounds:
+        player.sounds[name] = silence
+    yield player
+    player.stop()
+
+
+def test_nothing_plays_before_start(tmp_path):
+    assert audio.Audio(str(tmp_path)).play('shoot') is None
+
+
+def test_no_mixer_is_silent(tmp_path, monkeypatch, capsys):
+    def no_device(*args):
+        raise pg.error("no device")
+    monkeypatch.setattr(pg.mixer, 'init', no_device)
+    player = audio.Audio(str(tmp_path))
+    assert not player.start()
+    assert player.play('shoot') is None
+    assert capsys.readouterr().out == ""
+
+
+def test_free_channels_are_used_first(sounds):
+    played = [sounds.play('shoot') for _ in range(4)]
+    assert played == sounds.channels
+    assert (sounds.played, sounds.stolen, sounds.dropped) == (4, 0, 0)
+
+
+def test_explosion_takes_the_oldest_shot(sounds):
+    shots = [sounds.play('shoot') for _ in range(4)]
+    assert sounds.play('player_explosion') is shots[0]
+    assert sounds.play('enemy_explosion') is shots[1]
+    # the enemy explosion outranks the shots left, but not the player explosion
+    assert sounds.play('enemy_explosion') is shots[2]
+    assert sounds.stolen == 3 and sounds.dropped == 0
+
+
+def test_shot_is_dropped_when_everything_matters_more(sounds):
+    for name in ('player_explosion', 'enemy_explosion', 'enemy_explosion', 'player_explosion'):
+        sounds.play(name)
+    assert sounds.play('shoot') is None
+    assert sounds.dropped == 1
+
+    # an effect as important as the least important playing takes the oldest of those
+    assert sounds.play('enemy_explosion') is sounds.channels[1]
+    assert (sounds.stolen, sounds.dropped) == (1, 1)
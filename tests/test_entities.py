@@ -0,0 +1,43 @@
+## the entity store has to move everything exactly as the sprites' own update() would
+
+import random
+
+import pytest
+
+import constants as c
+import entities
+import sprites
+from scripted import SEEDS, TICKS, play
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_entity_store_plays_like_sprites(seed, homing, monkeypatch):
+    monkeypatch.setattr(c, 'USE_ENTITY_STORE', False)
+    sprites_game, sprite_snapshots = play(seed, snapshot_every=10, keep_alive=True)
+    monkeypatch.setattr(c, 'USE_ENTITY_STORE', True)
+    store_game, store_snapshots = play(seed, snapshot_every=10, keep_alive=True)
+
+    assert len(sprite_snapshots) == TICKS // 10
+    assert (store_game.SCORE, store_game.tick) == (sprites_game.SCORE, sprites_game.tick)
+    assert store_snapshots == sprite_snapshots
+
+
+@pytest.mark.parametrize('use_store', (False, True))
+def test_enemies_above_the_screen_are_kept(use_store, monkeypatch):
+    monkeypatch.setattr(c, 'USE_ENTITY_STORE', use_store)
+    spaceship = sprites.Spaceship()
+    formation = {'kind': 'grid', 'rows': 2, 'columns': 3, 'x': 100, 'y': -60}
+    wave = sprites.EnemyGroup(0, spaceship, random.Random(1), formation=formation)
+    for _ in range(10):
+        wave.update_group()
+    assert len(wave.group) == 6
+
+
+def test_step_kills_what_leaves_the_screen():
+    store = entities.StoreGroup()
+    projectile = sprites.SP_PROJECTILES.acquire()
+    projectile.spawn(100, 5)
+    store.add(projectile)
+    for _ in range(5):
+        store.update()
+    assert len(store) == 0
@@ -0,0 +1,59 @@
+## enemy waves are laid out on screen and keep going one way until they reach a side
+
+import random
+
+import pytest
+
+import constants as c
+import formations
+import sprites
+
+
+def test_every_layout_fits_on_screen():
+    rng = random.Random(3)
+    specs = [
+        {'kind': 'classic'},
+        {'kind': 'grid', 'rows': 3, 'columns': 5},
+        {'kind': 'grid', 'rows': 2, 'columns': 4, 'x': 400},
+        {'kind': 'wedge', 'rows': 5},
+        {'kind': 'wedge', 'rows': 3, 'x': 0},
+        {'kind': 'random', 'count': 30},
+    ]
+    for spec in specs:
+        laid_out = formations.positions(spec, rng)
+        assert laid_out
+        assert all(0 <= x <= c.SCREEN_WIDTH - c.ENEMY_WIDTH for x, y in laid_out), spec
+
+
+def test_wave_sticking_out_is_moved_not_squashed():
+    laid_out = formations.positions({'kind': 'grid', 'rows': 1, 'columns': 3, 'x': -50, 'dx': 100}, None)
+    assert laid_out == [(0, c.INIT_ENEMY_Y), (100, c.INIT_ENEMY_Y), (200, c.INIT_ENEMY_Y)]
+    laid_out = formations.positions({'kind': 'grid', 'rows': 1, 'columns': 2, 'x': 500, 'dx': 100}, None)
+    assert [x for x, y in laid_out] == [c.SCREEN_WIDTH - c.ENEMY_WIDTH - 100, c.SCREEN_WIDTH - c.ENEMY_WIDTH]
+
+
+@pytest.mark.parametrize('spec', (
+    {'kind': 'grid', 'rows': 2, 'columns': 10},
+    {'kind': 'wedge', 'rows': 8},
+))
+def test_wave_wider_than_the_screen_is_refused(spec):
+    with pytest.raises(ValueError):
+        formations.positions(spec, random.Random(1))
+
+
+def test_widest_wave_crosses_the_screen_before_turning():
+    # as wide as fits, one enemy width to move in
+    columns = 5
+    dx = (c.SCREEN_WIDTH - 2 * c.ENEMY_WIDTH) // (columns - 1)
+    spaceship = sprites.Spaceship()
+    wave = sprites.EnemyGroup(0, spaceship, random.Random(1),
+                              formation={'kind': 'grid', 'rows': 1, 'columns': columns, 'dx': dx})
+    turns = 0
+    ticks = 4 * int(c.ENEMY_WIDTH / abs(wave.x_move_increment))
+    for _ in range(ticks):
+        heading = wave.x_move_increment
+        wave.update_group()
+        turns += heading != wave.x_move_increment
+        for enemy in wave.group:
+            assert -abs(heading) <= enemy.rect.x <= c.SCREEN_WIDTH - c.ENEMY_WIDTH + abs(heading)
+    assert 1 <= turns <= 5
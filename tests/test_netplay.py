@@ -0,0 +1,71 @@
+## states sent to clients are rebuilt exactly, whichever state they are sent against
+
+import random
+
+import netplay
+
+
+def random_state(rng, ids, kinds=(netplay.SHIP, netplay.ENEMY, netplay.FIREBALL)):
+    return dict((id, (rng.choice(kinds), rng.randrange(-20, 600), rng.randrange(-20, 700), rng.randrange(4)))
+                for id in ids)
+
+
+def move(rng, state, spread):
+    moved = {}
+    for id, (kind, x, y, frame) in state.items():
+        moved[id] = (kind, x + rng.randrange(-spread, spread + 1), y + rng.randrange(-spread, spread + 1), frame)
+    return moved
+
+
+def test_full_state_round_trips():
+    rng = random.Random(1)
+    state = random_state(rng, range(1, 40))
+    packet = netplay.encode_state(7, state, (120, 900, False))
+    assert netplay.decode_state(packet, {}) == (7, state, (120, 900, False))
+
+
+def test_deltas_round_trip():
+    rng = random.Random(2)
+    states = {1: random_state(rng, range(1, 30))}
+    for tick in range(2, 60):
+        previous = states[tick - 1]
+        state = move(rng, previous, 3 if tick % 10 else 300)
+        # some sprites go, some new ones turn up
+        for id in rng.sample(sorted(state), 3):
+            del state[id]
+        state.update(random_state(rng, range(100 * tick, 100 * tick + 3)))
+        states[tick] = state
+
+        baseline_tick = max(1, tick - rng.randrange(1, 5))
+        packet = netplay.encode_state(tick, state, (tick, 0, tick == 59), baseline_tick, states[baseline_tick])
+        assert netplay.decode_state(packet, states) == (tick, state, (tick, 0, tick == 59))
+
+
+def test_unchanged_sprites_cost_nothing_and_moves_are_small():
+    rng = random.Random(3)
+    state = random_state(rng, range(1, 200))
+    full = netplay.encode_state(2, state, (0, 0, False))
+    same = netplay.encode_state(2, state, (0, 0, False), 1, state)
+    assert len(same) == netplay.STATE_HEADER.size
+
+    one_moved = dict(state)
+    kind, x, y, frame = state[5]
+    one_moved[5] = (kind, x + 1, y - 1, frame)
+    delta = netplay.encode_state(2, one_moved, (0, 0, False), 1, state)
+    assert len(delta) == netplay.STATE_HEADER.size + netplay.ENTITY.size + netplay.MOVE_BODY.size
+    assert len(delta) < len(full)
+
+
+def test_big_states_are_compressed():
+    state = dict((id, (netplay.ENEMY, 10 * (id % 10), 40 * (id // 10), 0)) for id in range(1, 300))
+    packet = netplay.encode_state(1, state, (0, 0, False))
+    assert netplay.STATE_HEADER.unpack_from(packet)[5] & netplay.COMPRESSED
+    assert len(packet) < netplay.STATE_HEADER.size + len(state) * (netplay.ENTITY.size + netplay.FULL_BODY.size)
+    assert netplay.decode_state(packet, {})[1] == state
+
+
+def test_unknown_baseline_is_dropped():
+    rng = random.Random(4)
+    baseline = random_state(rng, range(1, 10))
+    packet = netplay.encode_state(9, move(rng, baseline, 2), (0, 0, False), 8, baseline)
+    assert netplay.decode_state(packet, {7: baseline}) is None
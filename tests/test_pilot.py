@@ -0,0 +1,64 @@
+## the pilot thinks only as long as its budget allows, and flies on without thinking at all
+
+import random
+
+import numpy as np
+
+import constants as c
+import invaders
+import pilot
+
+
+def walk(plan, x):
+    # the spaceship flying plan, one tick at a time, stopped by the walls
+    xs = [x]
+    for move in plan:
+        x = min(max(x + int(move) * c.MOVE_INCREMENT, 0), c.SCREEN_WIDTH - c.SPACESHIP_WIDTH)
+        xs.append(x)
+    return xs
+
+
+def test_paths_stop_at_the_walls():
+    plans = pilot.candidate_plans(c.PILOT_HORIZON)
+    for x in (0, 3, c.SCREEN_WIDTH // 2, c.SCREEN_WIDTH - c.SPACESHIP_WIDTH - 7, c.SCREEN_WIDTH - c.SPACESHIP_WIDTH):
+        assert pilot.ship_paths(plans, x).tolist() == [walk(plan, x) for plan in plans]
+
+
+def game(seed=1, ticks=60):
+    played = invaders.Game({'highscore': 0, 'score': 0, 'seed': seed})
+    for _ in range(ticks):
+        played.update()
+    return played
+
+
+def test_no_budget_flies_the_last_plan_on():
+    flyer = pilot.Pilot(budget_ms=0)
+    flyer.plan[:] = pilot.LEFT
+    flyer.plan[3:] = pilot.RIGHT
+    played = game()
+    moves = [flyer.think(played) for _ in range(5)]
+    assert moves == [pilot.LEFT, pilot.LEFT, pilot.RIGHT, pilot.RIGHT, pilot.RIGHT]
+    assert flyer.futures == [0] * 5
+
+
+def test_plenty_of_budget_tries_every_plan():
+    flyer = pilot.Pilot(budget_ms=10000)
+    played = game()
+    flyer.think(played)
+    # every candidate, plus last tick's plan
+    assert flyer.futures[-1] >= len(flyer.plans)
+
+
+def test_one_slow_step_doesnt_stop_thinking():
+    flyer = pilot.Pilot(budget_ms=5)
+    flyer.setup_time = flyer.estimate(0.0, 1.0)
+    flyer.batch_time = flyer.estimate(0.0, 1.0)
+    assert flyer.setup_time + flyer.batch_time <= flyer.budget
+    played = game()
+    flyer.think(played)
+    assert flyer.futures[-1] > 0
+
+
+def test_soak_plays_to_the_end():
+    flown = pilot.soak(1, max_ticks=600, budget_ms=10000)
+    assert len(flown.games) == 1 and flown.report()['ticks'] > 0
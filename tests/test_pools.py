@@ -0,0 +1,77 @@
+## pooled sprites are handed out again - as good as new, and never drawn as if from their last life
+
+import pytest
+
+import constants as c
+import render
+import sprites
+import invaders
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(c, 'SP_PROJECTILE_POOL_SIZE', 2)
+    pool = sprites.SpritePool(sprites.Sp_Projectile, 'SP_PROJECTILE_POOL_SIZE')
+    return pool
+
+
+def test_killed_sprites_are_handed_out_again(pool):
+    projectile = pool.acquire()
+    projectile.spawn(50, 60)
+    projectile.move_increment = 99
+    projectile.kill()
+    again = pool.acquire()
+    assert again is projectile
+    # reset to how a new one starts
+    assert again.move_increment == c.SP_PROJECTILE_MOVE_INCREMENT
+    assert (pool.hits, pool.misses) == (1, 1)
+
+
+def test_killing_twice_only_returns_once(pool):
+    projectile = pool.acquire()
+    projectile.kill()
+    projectile.kill()
+    assert pool.acquire() is projectile
+    assert pool.acquire() is not projectile
+
+
+def test_full_pool_drops_the_rest(pool):
+    made = [pool.acquire() for _ in range(3)]
+    for projectile in made:
+        projectile.kill()
+    assert pool.stats()['free'] == 2
+    assert pool.dropped == 1
+
+
+def test_cap_follows_the_constant(pool, monkeypatch):
+    monkeypatch.setattr(c, 'SP_PROJECTILE_POOL_SIZE', 0)
+    projectile = pool.acquire()
+    projectile.kill()
+    assert pool.acquire() is not projectile
+
+
+def draw(game, alpha):
+    renderer = render.DirtyRenderer(None)
+    renderer.draw(game.spaceship_projectiles, game.previous_positions, alpha)
+    return [rect.topleft for image, rect in renderer.items]
+
+
+def test_reused_sprites_are_not_interpolated_from_their_last_life():
+    game = invaders.Game({'highscore': 0, 'score': 0, 'seed': 1})
+    projectile = sprites.SP_PROJECTILES.acquire()
+    projectile.spawn(100, 300)
+    game.spaceship_projectiles.add(projectile)
+
+    # still the same life, drawn half way
+    game.save_positions()
+    projectile.rect.y -= 10
+    assert draw(game, 0.5) == [(100, 295)]
+
+    # killed and handed straight out again, somewhere close by
+    game.save_positions()
+    projectile.kill()
+    again = sprites.SP_PROJECTILES.acquire()
+    assert again is projectile
+    again.spawn(130, 320)
+    game.spaceship_projectiles.add(again)
+    assert draw(game, 0.5) == [(130, 320)]
@@ -0,0 +1,101 @@
+## drawing only what changed has to leave the screen the same as redrawing all of it
+
+import random
+
+import pygame as pg
+import pytest
+
+import constants as c
+import render
+
+
+SIZE = (200, 150)
+
+
+def background():
+    surface = pg.Surface(SIZE)
+    for x in range(0, SIZE[0], 10):
+        pg.draw.line(surface, (x, 255 - x, 90), (x, 0), (x, SIZE[1]))
+    return surface
+
+
+def images():
+    made = []
+    for i, color in enumerate(((255, 0, 0), (0, 255, 0), (0, 0, 255, 128))):
+        image = pg.Surface((12 + 4 * i, 9 + 3 * i), pg.SRCALPHA)
+        image.fill(color)
+        made.append(image)
+    return made
+
+
+def frames(rng, count, sprites=12):
+    '''
+    :return: (image, (x, y)) of every sprite for count frames - sprites move,
+    change image, stand still, come and go
+    '''
+    kinds = images()
+    positions = [(rng.randrange(-10, SIZE[0]), rng.randrange(-10, SIZE[1])) for _ in range(sprites)]
+    chosen = [rng.choice(kinds) for _ in range(sprites)]
+    for _ in range(count):
+        for i in range(sprites):
+            roll = rng.random()
+            if roll < 0.3:
+                x, y = positions[i]
+                positions[i] = (x + rng.randrange(-6, 7), y + rng.randrange(-6, 7))
+            elif roll < 0.35:
+                chosen[i] = rng.choice(kinds)
+        yield [(image, position) for image, position in zip(chosen, positions) if rng.random() > 0.05]
+
+
+@pytest.mark.parametrize('seed', (1, 2, 3))
+def test_dirty_frames_match_full_redraws(seed, monkeypatch):
+    monkeypatch.setattr(c, 'USE_DIRTY_RECTS', True)
+    monkeypatch.setattr(c, 'DIRTY_RECT_THRESHOLD', 0.5)
+    back = background()
+    dirty_renderer = render.DirtyRenderer(back)
+    full_renderer = render.DirtyRenderer(back)
+    screen = pg.Surface(SIZE)
+    reference = pg.Surface(SIZE)
+
+    partial = 0
+    for drawn in frames(random.Random(seed), 200):
+        for image, position in drawn:
+            dirty_renderer.blit(image, position)
+        changed = dirty_renderer.flush(screen)
+        partial += changed is not None
+
+        for image, position in drawn:
+            full_renderer.blit(image, position)
+        full_renderer.redraw(reference, full_renderer.items)
+        full_renderer.items = []
+
+        assert pg.image.tostring(screen, 'RGB') == pg.image.tostring(reference, 'RGB')
+    # most frames have to have gone the dirty rect way for this to mean anything
+    assert partial > 150
+
+
+def test_nothing_changed_nothing_dirty(monkeypatch):
+    monkeypatch.setattr(c, 'USE_DIRTY_RECTS', True)
+    renderer = render.DirtyRenderer(background())
+    screen = pg.Surface(SIZE)
+    image = images()[0]
+    renderer.blit(image, (10, 10))
+    assert renderer.flush(screen) is None
+
+    renderer.blit(image, (10, 10))
+    assert renderer.flush(screen) == []
+
+    renderer.blit(image, (14, 10))
+    assert set(tuple(rect) for rect in renderer.flush(screen)) == {(10, 10, 12, 9), (14, 10, 12, 9)}
+
+
+def test_too_much_changed_redraws_everything(monkeypatch):
+    monkeypatch.setattr(c, 'USE_DIRTY_RECTS', True)
+    monkeypatch.setattr(c, 'DIRTY_RECT_THRESHOLD', 0.1)
+    renderer = render.DirtyRenderer(background())
+    screen = pg.Surface(SIZE)
+    big = pg.Surface((120, 100))
+    renderer.blit(big, (0, 0))
+    renderer.flush(screen)
+    renderer.blit(big, (50, 40))
+    assert renderer.flush(screen) is None
@@ -0,0 +1,48 @@
+## a recorded session plays back to the same scores
+
+import random
+
+import pytest
+
+import replay
+from scripted import SEEDS, play
+
+
+def test_inputs_round_trip():
+    rng = random.Random(5)
+    inputs = bytearray()
+    for _ in range(300):
+        inputs.extend(bytes((rng.randrange(8),)) * rng.choice((1, 2, 17, 200, 5000)))
+    assert replay.decode(replay.encode(inputs)) == inputs
+    assert replay.decode(replay.encode(b'')) == b''
+
+
+def test_damaged_file_is_refused(tmp_path):
+    path = str(tmp_path / 'session.ssr')
+    recorder = replay.Recorder(path)
+    play(SEEDS[0], ticks=200, hooks=[recorder])
+    recorder.close()
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    with open(path, 'wb') as f:
+        f.write(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        replay.load(path)
+
+    with open(path, 'wb') as f:
+        f.write(data[:replay.HEADER.size + len(replay.MAGIC) + 1] + replay.encode(b'\x01' * 3))
+    with pytest.raises(ValueError):
+        replay.load(path)
+
+
+def test_replay_gets_the_recorded_scores(tmp_path):
+    path = str(tmp_path / 'session.ssr')
+    recorder = replay.Recorder(path)
+    played = [play(seed, ticks=3000, hooks=[recorder])[0] for seed in SEEDS]
+    recorder.close()
+
+    player = replay.play(path)
+    assert player.mismatches() == []
+    assert [(score, ticks) for recording, score, ticks in player.results] == \
+        [(game.SCORE, game.tick) for game in played]
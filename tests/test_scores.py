@@ -0,0 +1,61 @@
+## finished games are written by the store's thread and read back on the next start
+
+import threading
+
+import constants as c
+import scores
+
+
+def test_runs_before_start_are_ignored(tmp_path):
+    path = str(tmp_path / 'scores.sqlite3')
+    store = scores.ScoreStore(path)
+    store.record('ann', 500, 100)
+    assert store.ready()
+    assert store.high_score('ann') == 0
+    store.close()
+    assert not (tmp_path / 'scores.sqlite3').exists()
+
+
+def test_runs_are_saved_and_read_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(c, 'LEADERBOARD_SIZE', 3)
+    path = str(tmp_path / 'scores.sqlite3')
+    store = scores.ScoreStore(path)
+    store.start()
+    for player, score in (('ann', 40), ('bob', 90), ('ann', 120), ('cat', 10), ('bob', 60)):
+        store.record(player, score, score * 3, seed=score)
+    # known straight away, before anything has been written
+    assert store.high_score('ann') == 120
+    assert [(score, player) for score, player, finished in store.leaderboard()] == \
+        [(120, 'ann'), (90, 'bob'), (60, 'bob')]
+    store.close()
+    assert store.written == 5
+    assert sorted(run[:3] for run in scores.history(path, 'bob')) == [(60, 180, 60), (90, 270, 90)]
+
+    again = scores.ScoreStore(path)
+    again.start()
+    again.loaded.wait()
+    assert (again.high_score('ann'), again.high_score('bob'), again.high_score('cat')) == (120, 90, 10)
+    assert [(score, player) for score, player, finished in again.leaderboard()] == \
+        [(120, 'ann'), (90, 'bob'), (60, 'bob')]
+    again.close()
+
+
+def test_runs_from_many_threads_are_all_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(c, 'SCORE_BATCH_SIZE', 8)
+    path = str(tmp_path / 'scores.sqlite3')
+    store = scores.ScoreStore(path)
+    store.start()
+
+    # games ending on several threads at once
+    def finish(player):
+        for i in range(50):
+            store.record(player, i, i)
+    threads = [threading.Thread(target=finish, args=('p{}'.format(n),)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+    assert store.written == 200
+    assert all(len(scores.history(path, 'p{}'.format(n), limit=100)) == 50 for n in range(4))
@@ -0,0 +1,33 @@
+## a restored game carries on exactly as the one it was taken from
+
+import pytest
+
+import constants as c
+import invaders
+from scripted import SEEDS, play
+
+
+@pytest.mark.parametrize('use_store', (False, True))
+def test_snapshot_restores_and_plays_on_the_same(use_store, homing, monkeypatch):
+    monkeypatch.setattr(c, 'USE_ENTITY_STORE', use_store)
+    game, _ = play(SEEDS[0], ticks=100)
+    snapshot = game.snapshot()
+    assert not game.game_over and game.enemies.fireballs
+
+    # a different seed - everything has to come from the snapshot
+    copy = invaders.Game({'highscore': 0, 'score': 0, 'seed': SEEDS[-1]})
+    copy.restore(invaders.load_snapshot(invaders.dump_snapshot(snapshot)))
+    assert copy.snapshot() == snapshot
+
+    while not game.game_over:
+        game.update()
+        copy.update()
+    assert copy.snapshot() == game.snapshot()
+
+
+def test_snapshot_is_plain_data():
+    game, _ = play(SEEDS[1], ticks=50)
+    snapshot = game.snapshot()
+    assert invaders.load_snapshot(invaders.dump_snapshot(snapshot)) == snapshot
+    game.update()
+    assert game.snapshot() != snapshot
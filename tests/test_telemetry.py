@@ -0,0 +1,62 @@
+## events that don't fit in the queue are counted, and the count is written with the rest
+
+import pytest
+
+import constants as c
+import telemetry
+
+
+@pytest.fixture
+def slow_flush(monkeypatch):
+    # the writer only takes the queue when it is closed
+    monkeypatch.setattr(c, 'TELEMETRY_FLUSH_SECONDS', 60)
+
+
+def test_nothing_is_queued_before_start(tmp_path):
+    events = telemetry.Telemetry(str(tmp_path), capacity=4)
+    events.emit(telemetry.SHOT, 1)
+    assert (events.emitted, events.dropped, len(events.queue)) == (0, 0, 0)
+    events.close()
+    assert telemetry.session_files(str(tmp_path)) == []
+
+
+@pytest.mark.parametrize('format', ('jsonl', 'binary'))
+def test_dropped_events_are_written_as_a_count(format, tmp_path, slow_flush):
+    events = telemetry.Telemetry(str(tmp_path), format, capacity=5)
+    events.start()
+    for tick in range(12):
+        events.emit(telemetry.SHOT, tick, tick * 10, 600, 0)
+    assert (events.emitted, events.dropped) == (5, 7)
+    events.close()
+
+    written = [event for path in telemetry.session_files(str(tmp_path)) for event in telemetry.read(path)]
+    assert [tick for name, tick, fields in written if name == 'shot'] == [0, 1, 2, 3, 4]
+    assert written[-1] == ('dropped', 4, {'count': 7, 'queued': 5, 'capacity': 5})
+    assert events.written == 6
+
+
+def test_drops_are_reported_once(tmp_path, slow_flush):
+    events = telemetry.Telemetry(str(tmp_path), capacity=3)
+    events.start()
+    try:
+        for tick in range(5):
+            events.emit(telemetry.KILL, tick)
+        first = events.take()
+        assert first[-1] == (telemetry.DROPPED, 2, 2, 3, 3)
+
+        events.emit(telemetry.KILL, 5)
+        assert events.take() == [(telemetry.KILL, 5, 0, 0, 0)]
+
+        # each batch only counts what was dropped since the one before
+        for tick in range(6, 10):
+            events.emit(telemetry.KILL, tick)
+        events.take()
+        assert events.take() == []
+        for tick in range(10, 14):
+            events.emit(telemetry.KILL, tick)
+        dropped = [event for event in events.take() if event[0] == telemetry.DROPPED]
+        assert dropped == [(telemetry.DROPPED, 12, 1, 3, 3)]
+        # every event emitted was either queued or counted as dropped
+        assert events.emitted + events.dropped == 14
+    finally:
+        events.close()
@@ -0,0 +1,75 @@
+## text is only rendered once - and put together from digits, it has to look the same as rendered whole
+
+import pygame as pg
+import pytest
+
+import setup as s
+import tools
+import invaders_info as info
+
+
+WHITE = (255, 255, 255)
+
+
+@pytest.fixture
+def font():
+    return s.FONT_CACHE.get('zerovelo', 20)
+
+
+def test_fonts_are_opened_once(font):
+    assert s.FONT_CACHE.get('zerovelo', 20) is font
+    assert s.FONT_CACHE.get('zerovelo', 21) is not font
+
+
+def test_same_text_is_rendered_once(font):
+    cache = tools.TextCache(4)
+    first = cache.render(font, "Score: ", True, WHITE)
+    assert cache.render(font, "Score: ", True, [255, 255, 255]) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.render(font, "Score: ", True, (255, 0, 0)) is not first
+
+
+def test_least_recently_used_goes_first(font):
+    cache = tools.TextCache(2)
+    a = cache.render(font, "a", True, WHITE)
+    cache.render(font, "b", True, WHITE)
+    # a was used more recently than b, so b goes
+    cache.render(font, "a", True, WHITE)
+    cache.render(font, "c", True, WHITE)
+    assert cache.render(font, "a", True, WHITE) is a
+    misses = cache.misses
+    cache.render(font, "b", True, WHITE)
+    assert cache.misses == misses + 1
+    assert len(cache.surfaces) == 2
+
+
+@pytest.mark.parametrize('text', ("0", "1234567890", "808", "99999"))
+def test_glyph_strip_looks_like_the_font(font, text):
+    strip = s.TEXT.glyphs(font, True, WHITE)
+    assert s.TEXT.glyphs(font, True, WHITE) is strip
+
+    built = strip.render(text)
+    whole = font.render(text, True, WHITE)
+    assert built.get_size() == whole.get_size()
+    built_mask = pg.mask.from_surface(built, 1)
+    whole_mask = pg.mask.from_surface(whole, 1)
+    assert built_mask.count() == whole_mask.count() == built_mask.overlap_area(whole_mask, (0, 0))
+
+
+def test_glyph_strip_prefix(font):
+    label = font.render("Score: ", True, WHITE)
+    strip = s.TEXT.glyphs(font, True, WHITE)
+    built = strip.render("42", prefix=label)
+    assert built.get_width() == label.get_width() + strip.render("42").get_width()
+    assert built.get_height() == max(label.get_height(), font.get_height())
+
+
+@pytest.mark.parametrize('glyph_strip', (False, True))
+def test_score_only_rerenders_when_it_changes(glyph_strip, monkeypatch):
+    monkeypatch.setattr(info.c, 'SCORE_GLYPH_STRIP', glyph_strip)
+    score = info.Score(20, 0, 0)
+    shown = score.font_surface
+    score.update(0)
+    assert score.font_surface is shown
+    score.update(20)
+    assert score.font_surface is not shown
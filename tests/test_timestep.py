@@ -0,0 +1,83 @@
+## the simulation runs in whole ticks of 1 / c.FPS seconds, however long frames take
+
+import pytest
+
+import constants as c
+import invaders
+
+
+TICK = 1000.0 / c.FPS
+
+
+class Counter:
+
+    def __init__(self):
+        self.updates = 0
+        self.saved = []
+
+    def update(self):
+        self.updates += 1
+
+    def save_positions(self):
+        self.saved.append(self.updates)
+
+
+@pytest.fixture
+def scene():
+    return Counter()
+
+
+@pytest.fixture
+def manager(scene):
+    return invaders.SceneManager(scene)
+
+
+def test_whole_ticks_are_run_and_the_rest_carried(manager, scene):
+    alpha = manager.advance(2.5 * TICK)
+    assert scene.updates == 2
+    assert alpha == pytest.approx(0.5)
+
+    # the half tick left over makes a whole one with this
+    alpha = manager.advance(0.75 * TICK)
+    assert scene.updates == 3
+    assert alpha == pytest.approx(0.25)
+    assert manager.ticks == 3
+
+
+def test_frame_rate_does_not_change_game_speed(manager, scene):
+    # a second of slow frames and a second of fast ones run the same ticks
+    for _ in range(20):
+        manager.advance(1000.0 / 20)
+    slow = scene.updates
+    for _ in range(144):
+        manager.advance(1000.0 / 144)
+    assert slow == round(c.FPS)
+    assert scene.updates - slow == pytest.approx(c.FPS, abs=1)
+
+
+def test_falling_behind_drops_time_instead_of_spiralling(manager, scene):
+    alpha = manager.advance(100 * TICK)
+    assert scene.updates == c.MAX_STEPS_PER_FRAME
+    assert 0.0 <= alpha < 1.0
+    assert manager.lag < TICK
+
+
+def test_positions_are_saved_before_the_last_tick(manager, scene):
+    manager.advance(3 * TICK)
+    assert scene.saved == [2]
+    manager.advance(0.5 * TICK)
+    assert scene.saved == [2]
+
+
+def test_hooks_run_before_every_tick(manager, scene):
+    seen = []
+    manager.tick_hooks.append(lambda manager: seen.append(scene.updates))
+    manager.advance(3 * TICK)
+    assert seen == [0, 1, 2]
+
+
+def test_a_hook_can_stop_the_game(manager, scene):
+    manager.tick_hooks.append(lambda manager: manager.quit())
+    manager.step()
+    assert scene.updates == 0
+    assert not manager.running
@@ -0,0 +1,68 @@
+## the fixed playfield mapped onto windows of other sizes
+
+import pygame as pg
+import pytest
+
+import constants as c
+import viewport
+
+
+def test_integer_scaling_is_centred_with_bars():
+    width, height = c.SCREEN_SIZE
+    view = viewport.Viewport((2 * width + 100, 2 * height + 41), smooth=False)
+    assert view.scale == 2.0
+    assert view.size == (2 * width, 2 * height)
+    assert view.area == pg.Rect(50, 20, 2 * width, 2 * height)
+    assert view.rect(pg.Rect(10, 20, 30, 40)) == pg.Rect(70, 60, 60, 80)
+
+
+def test_smooth_scaling_fills_the_window():
+    width, height = c.SCREEN_SIZE
+    view = viewport.Viewport((int(width * 1.5), height * 3), smooth=True)
+    assert view.scale == 1.5
+    assert view.area.left == 0 and view.area.width == int(width * 1.5)
+    assert view.area.centery == height * 3 // 2
+
+
+def test_too_small_window_scales_down_smoothly():
+    width, height = c.SCREEN_SIZE
+    view = viewport.Viewport((width // 2, height // 2), smooth=False)
+    assert view.smooth and view.scale == 0.5
+
+
+@pytest.mark.parametrize('scale', (0.7, 1.5, 2.3))
+def test_mapped_rects_cover_what_is_drawn(scale):
+    width, height = c.SCREEN_SIZE
+    view = viewport.Viewport((int(width * scale) + 1, int(height * scale) + 1), smooth=True)
+    for rect in (pg.Rect(0, 0, 1, 1), pg.Rect(3, 7, 11, 13), pg.Rect(width - 5, height - 9, 5, 9)):
+        mapped = view.rect(rect)
+        assert mapped.left <= view.offset[0] + rect.left * view.scale
+        assert mapped.top <= view.offset[1] + rect.top * view.scale
+        assert mapped.right >= view.offset[0] + rect.right * view.scale
+        assert mapped.bottom >= view.offset[1] + rect.bottom * view.scale
+
+
+def test_scaled_images_are_kept():
+    view = viewport.Viewport((c.SCREEN_WIDTH * 3, c.SCREEN_HEIGHT * 3), smooth=False)
+    image = pg.Surface((4, 5))
+    assert view.image(image).get_size() == (12, 15)
+    assert view.image(image) is view.image(image)
+
+
+def test_presenting_dirty_parts_matches_the_whole_frame():
+    width, height = c.SCREEN_SIZE
+    view = viewport.Viewport((width * 2 + 10, height * 2 + 10), smooth=False)
+    canvas = pg.Surface(c.SCREEN_SIZE)
+    canvas.fill((0, 0, 80))
+    whole = pg.Surface(view.window_size)
+    parts = pg.Surface(view.window_size)
+    view.present(canvas, whole)
+    view.present(canvas, parts)
+
+    dirty = [pg.Rect(10, 10, 30, 20), pg.Rect(width - 15, height - 15, 40, 40)]
+    for rect in dirty:
+        canvas.fill((200, 50, 0), rect)
+    assert view.present(canvas, whole) == [view.area]
+    changed = view.present(canvas, parts, dirty)
+    assert changed == [view.rect(dirty[0]), view.rect(dirty[1].clip(canvas.get_rect()))]
+    assert pg.image.tostring(parts, 'RGB') == pg.image.tostring(whole, 'RGB')
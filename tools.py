@@ -3,40 +3,211 @@
 
 import pygame as pg
 import os
+import random
+from collections import OrderedDict
 
-## Loads all graphics files
-def load_all_gfx(directory,accept=(".png",".jpg",".bmp")):
+
+## Converts an image to the display's format - keeping per pixel alpha if it has any
+def convert_image(img):
+    if img.get_alpha():
+        return img.convert_alpha()
+    return img.convert()
+
+
+## Decodes all sound files into memory - the mixer has to be initialised first
+def load_all_sfx(directory, accept=(".wav", ".ogg")):
+    sounds = {}
+    if not os.path.isdir(directory):
+        return sounds
+    for filename in os.listdir(directory):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() in accept:
+            sounds[name] = pg.mixer.Sound(os.path.join(directory, filename))
+    return sounds
+
+
+## Dictionary that only calls its loader the first time it is used
+class LazyResources(dict):
+
+    def __init__(self, loader):
+        dict.__init__(self)
+        self.loader = loader
+        self.loaded = False
+
+    def load(self):
+        if not self.loaded:
+            self.loaded = True
+            self.update(self.loader())
+
+    def __getitem__(self, key):
+        self.load()
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        self.load()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self.load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self.load()
+        return dict.__len__(self)
+
+    def keys(self):
+        self.load()
+        return dict.keys(self)
+
+    def items(self):
+        self.load()
+        return dict.items(self)
+
+
+## Random number generator whose state is cheap to take again and again
+class SnapshotRandom(random.Random):
     """
-    Load all graphics with extensions in the accept argument.  If alpha
-    transparency is found in the image the image will be converted using
-    convert_alpha().  If no alpha transparency is detected image will be
-    converted using convert() and colorkey will be set to colorkey.
+    random.Random that holds on to the state getstate last gave out, and hands
+    the same tuple out again until another number is drawn. getstate copies
+    the whole generator (625 numbers), which would otherwise be most of the
+    cost of a game snapshot - and a game only draws numbers when a wave starts.
+    Gives exactly the same numbers as random.Random with the same seed.
     """
-    graphics = {}
-    for pic in os.listdir(directory):
-        name,ext = os.path.splitext(pic)
-        print(name)
-        if ext.lower() in accept:
-            try:
-                img = pg.image.load(os.path.join(directory,pic))
-            except Exception as e:
-                print(e)
-
-            if img.get_alpha():
-                img = img.convert_alpha()
-            else:
-                img = img.convert()
-            graphics[name]=img
-
-    print("graphics successfully loaded")
-    return graphics
-
-def load_all_fonts(directory, accept=(".ttf", ".otf")):
-        fonts = {}
-        for font in os.listdir(directory):
-            name, ext = os.path.splitext(font)
-            if ext.lower() in accept:
-                print("font {}".format(name))
-                fonts[name] = os.path.join(directory, font)
-        print("Successfully loaded fonts")
-        return fonts
\ No newline at end of file
+
+    def __init__(self, seed=None):
+        self.saved_state = None
+        random.Random.__init__(self, seed)
+
+    def seed(self, *args, **kwargs):
+        self.saved_state = None
+        random.Random.seed(self, *args, **kwargs)
+
+    def random(self):
+        self.saved_state = None
+        return random.Random.random(self)
+
+    def getrandbits(self, k):
+        self.saved_state = None
+        return random.Random.getrandbits(self, k)
+
+    def getstate(self):
+        if self.saved_state is None:
+            self.saved_state = random.Random.getstate(self)
+        return self.saved_state
+
+    def setstate(self, state):
+        # already in that state - nothing drawn since it was given out or set
+        if state is self.saved_state:
+            return
+        random.Random.setstate(self, state)
+        self.saved_state = state
+
+
+## Font objects shared between everything using the same font at the same size
+class FontCache:
+    """
+    Opens each font file once per size and hands the same pg.font.Font to
+    everyone who asks for it, so scenes don't reopen their fonts every time
+    they are made, and text they render through TextCache is shared too.
+    """
+
+    def __init__(self, paths):
+        # font name -> path, e.g. setup.FONTS
+        self.paths = paths
+        self.fonts = {}
+
+    def get(self, name, size):
+        key = (self.paths[name], size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pg.font.Font(key[0], size)
+            self.fonts[key] = font
+        return font
+
+
+## Caches rendered text, so the same string is only ever rendered once
+class TextCache:
+    """
+    Least recently used cache of text surfaces keyed by font, string,
+    antialias and colour. Fonts are compared by object, so text rendered
+    with the same Font object shares entries. Once more than size surfaces
+    are held, the one used longest ago is thrown away.
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self.surfaces = OrderedDict()
+        self.strips = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, tuple(color))
+
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def glyphs(self, font, antialias, color):
+        """
+        the GlyphStrip of digits for this font and colour, made on first use
+        """
+        key = (font, antialias, tuple(color))
+        strip = self.strips.get(key)
+        if strip is None:
+            strip = GlyphStrip(font, antialias, color)
+            self.strips[key] = strip
+        return strip
+
+
+## Pre-rendered characters that text is put together from without touching the font again
+class GlyphStrip:
+    """
+    Every character in chars is rendered once up front. render() then lays
+    the glyphs side by side onto a new surface, so changing numbers like
+    scores never go through the font renderer. Kerning is lost, which is
+    fine for digits.
+    """
+
+    def __init__(self, font, antialias, color, chars="0123456789"):
+        self.antialias = antialias
+        self.glyphs = {}
+        # how far along to move after each glyph - less than the glyph's
+        # width for slanted fonts, where glyphs hang over their neighbours
+        self.advances = {}
+        for char, metrics in zip(chars, font.metrics(chars)):
+            self.glyphs[char] = font.render(char, antialias, color)
+            self.advances[char] = metrics[4]
+
+    def render(self, text, prefix=None):
+        """
+        :param text: string made only of the strip's characters
+        :param prefix: optional surface placed in front of the glyphs, e.g. a cached label
+        :return: new surface holding prefix followed by text
+        """
+        parts = [(self.glyphs[char], self.advances[char]) for char in text]
+        if prefix is not None:
+            parts.insert(0, (prefix, prefix.get_width()))
+
+        width = sum(advance for part, advance in parts[:-1]) + parts[-1][0].get_width()
+        height = max(part.get_height() for part, advance in parts)
+        surface = pg.Surface((width, height), pg.SRCALPHA)
+
+        # antialiased (per pixel alpha) glyphs are merged with a max blend
+        # so that where neighbours overlap neither one darkens the other
+        flags = pg.BLEND_RGBA_MAX if self.antialias else 0
+        x = 0
+        for part, advance in parts:
+            surface.blit(part, (x, 0), special_flags=flags)
+            x += advance
+        return surface
@@ -0,0 +1,98 @@
+## Scaling the playfield to the window ##
+
+## the game is always laid out and simulated at c.SCREEN_SIZE. when the
+## window is a different size, a Viewport maps that fixed playfield onto it -
+## centred, keeping its shape, with black bars filling the rest
+
+## integer scaling (the default) only ever scales by a whole number, so pixels
+## stay sharp - the playfield is as big as a whole multiple fits. smooth
+## scaling fills as much of the window as it can, and filters the images
+
+## there are two ways to get the frame onto the window:
+##   with c.SCALE_SPRITES, the renderer draws a scaled copy of each image at
+##   the scaled position. copies are made once and kept, so each frame only
+##   costs the blits - and only where something changed
+##   otherwise, scenes render at native size onto an internal surface and the
+##   parts of it that changed are scaled onto the window
+## at native size there is no viewport at all and scenes draw straight onto the display
+
+import math
+
+import pygame as pg
+import constants as c
+
+
+class Viewport:
+
+    def __init__(self, window_size, smooth=None):
+        '''
+        :param window_size: (width, height) of the window
+        :param smooth: scale by any factor with filtering, rather than by whole
+        numbers - defaults to c.SMOOTH_SCALING
+        '''
+        if smooth is None:
+            smooth = c.SMOOTH_SCALING
+        self.window_size = tuple(window_size)
+        width, height = c.SCREEN_SIZE
+        fit = min(window_size[0] / float(width), window_size[1] / float(height))
+
+        # a window too small for even 1x has to be scaled down smoothly
+        self.smooth = smooth or fit < 1
+        self.scale = fit if self.smooth else float(int(fit))
+
+        self.size = (int(width * self.scale), int(height * self.scale))
+        self.offset = ((window_size[0] - self.size[0]) // 2, (window_size[1] - self.size[1]) // 2)
+        # where the playfield is on the window
+        self.area = pg.Rect(self.offset, self.size)
+
+        # image -> its scaled copy, for this window size only
+        self.images = {}
+
+    def rect(self, rect):
+        '''
+        :return: the window rect covering a playfield rect - rounded outwards,
+        so it covers all of the scaled image drawn there
+        '''
+        scale = self.scale
+        left = int(rect.left * scale)
+        top = int(rect.top * scale)
+        right = int(math.ceil(rect.right * scale))
+        bottom = int(math.ceil(rect.bottom * scale))
+        return pg.Rect(left + self.offset[0], top + self.offset[1], right - left, bottom - top)
+
+    def image(self, image):
+        '''
+        :return: the scaled copy of image, made the first time it is asked for
+        '''
+        scaled = self.images.get(image)
+        if scaled is None:
+            width, height = image.get_size()
+            size = (max(1, int(round(width * self.scale))), max(1, int(round(height * self.scale))))
+            if self.smooth and image.get_bitsize() >= 24:
+                scaled = pg.transform.smoothscale(image, size)
+            else:
+                scaled = pg.transform.scale(image, size)
+            self.images[image] = scaled
+        return scaled
+
+    def present(self, canvas, window, dirty=None):
+        '''
+        scales a frame rendered at native size onto the window
+        :param dirty: the parts of canvas that changed, None if all of it
+        :return: the window rects that changed
+        '''
+        scale = pg.transform.smoothscale if self.smooth else pg.transform.scale
+        if dirty is None:
+            scale(canvas, self.size, window.subsurface(self.area))
+            return [self.area]
+
+        changed = []
+        bounds = canvas.get_rect()
+        for rect in dirty:
+            rect = rect.clip(bounds)
+            if not rect.w or not rect.h:
+                continue
+            target = self.rect(rect).clip(self.area)
+            scale(canvas.subsurface(rect), target.size, window.subsurface(target))
+            changed.append(target)
+        return changed